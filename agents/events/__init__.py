@@ -1,4 +1,5 @@
 from agents.events.event_types import EventType
-from agents.events.bus import EventBus, event_bus
+from agents.events.bus import EventBus, event_bus, get_event_bus
+from agents.events.publisher import BufferedPublisher
 
-__all__ = ['EventType', 'EventBus', 'event_bus']
+__all__ = ['EventType', 'EventBus', 'event_bus', 'get_event_bus', 'BufferedPublisher']
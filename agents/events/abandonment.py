@@ -0,0 +1,257 @@
+"""
+Incremental cart-abandonment detection
+
+Instead of periodically scanning db.carts for stale carts, the detector
+follows cart activity on the event bus. Every open cart lives in an
+insertion-ordered dict keyed by user, oldest activity first: activity moves
+the user to the end, so with a single fixed timeout the front of the dict is
+always the next cart to expire. Recording activity and checking for
+deadlines are O(1) per cart, so the work follows event volume and expiries,
+never the number of open carts. Activity is timed by the event's stream
+entry ID (when it was published), not when it is handled. Order is arrival
+order: a new cart whose event is older than the carts ahead of it is
+reported once it reaches the front, and a late event for a cart doesn't move
+it back.
+
+- cart.item.added / cart.updated / checkout.started: (re)arm the cart
+- cart.updated with total_qty 0, payment.completed: forget the cart
+- deadline reached: publish cart.abandoned and forget the cart until the
+  user is active again
+
+State is snapshotted to a JSON file every cart_abandonment_snapshot_interval_s
+(temp file + rename) and when run() stops, and reloaded when it starts; carts whose
+deadline passed while the process was down are reported on the first check.
+Activity between the last snapshot and a crash is lost, so keep the interval
+short relative to the timeout. Each cart remembers the entry IDs of its last
+APPLIED_EVENTS item additions, so additions redelivered after a restart are
+not counted twice.
+
+The detector needs to see every cart event, so serve() reads them through
+its own consumer group (cart_abandonment_group) rather than the group the
+workers share, and only in the process holding a Redis lease: starting it in
+more processes leaves the others idle until the holder stops or its lease
+(cart_abandonment_lease_s) runs out.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from config.settings import settings
+from core.log import get_logger
+
+log = get_logger(__name__)
+
+EVENT_CHUNK = 1000
+APPLIED_EVENTS = 20  # Item-added entry IDs remembered per cart to skip redeliveries
+LEASE_KEY = "events:cart-abandonment:owner"
+
+# Extend or drop the lease only while we still hold it
+_RENEW = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('expire', KEYS[1], ARGV[2]) end return 0"
+_RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+
+class CartAbandonmentDetector:
+    """Tracks last cart activity per user and reports carts idle past the timeout"""
+
+    def __init__(self, timeout_s: float = None, snapshot_path: str = None, clock=time.time):
+        self.timeout = timeout_s or settings.cart_abandonment_timeout_s
+        self.snapshot_path = settings.cart_abandonment_snapshot_path if snapshot_path is None else snapshot_path
+        self.clock = clock
+        # user_id -> [last_activity, total_qty, total_price, applied entry IDs], oldest activity first
+        self.carts: "OrderedDict[str, List]" = OrderedDict()
+        self.abandoned = 0
+        self._last_snapshot = 0.0
+
+    def __len__(self) -> int:
+        return len(self.carts)
+
+    # Activity
+
+    def touch(self, user_id: str, at: Optional[float] = None, total_qty: Optional[int] = None,
+              total_price: Optional[float] = None, added_qty: int = 0, added_price: float = 0.0):
+        """Record cart activity; totals are replaced when given, else incremented"""
+        at = self.clock() if at is None else at
+        cart = self.carts.get(user_id)
+        if cart is None:
+            cart = self.carts[user_id] = [at, 0, 0.0, ()]
+        elif at >= cart[0]:
+            cart[0] = at
+            self.carts.move_to_end(user_id)
+        cart[1] = cart[1] + added_qty if total_qty is None else total_qty
+        cart[2] = cart[2] + added_price if total_price is None else total_price
+
+    def forget(self, user_id: str):
+        self.carts.pop(user_id, None)
+
+    def due(self, now: Optional[float] = None) -> List[Dict]:
+        """Pop every cart idle past the timeout, as CART_ABANDONED payloads"""
+        now = self.clock() if now is None else now
+        deadline = now - self.timeout
+        abandoned = []
+        while self.carts:
+            user_id, (last_activity, total_qty, total_price, _) = next(iter(self.carts.items()))
+            if last_activity > deadline:
+                break
+            self.carts.popitem(last=False)
+            if total_qty > 0:
+                abandoned.append({"user_id": user_id, "total_qty": int(total_qty),
+                                  "total_price": round(float(total_price), 2),
+                                  "last_activity": last_activity})
+        self.abandoned += len(abandoned)
+        return abandoned
+
+    # Event handlers
+
+    async def handle_item_added(self, data: Dict):
+        user_id = data.get("user_id")
+        if not user_id:
+            return
+        from agents.events.bus import current_message_id, current_message_time
+        message_id = current_message_id()
+        cart = self.carts.get(user_id)
+        if message_id is not None and cart is not None and message_id in cart[3]:
+            return  # Redelivered event
+        qty = data.get("qty") or 1
+        self.touch(user_id, current_message_time(), added_qty=qty, added_price=(data.get("price") or 0) * qty)
+        if message_id is not None:
+            cart = self.carts[user_id]
+            cart[3] = (*cart[3], message_id)[-APPLIED_EVENTS:]
+
+    async def handle_cart_updated(self, data: Dict):
+        if not data.get("user_id"):
+            return
+        if data.get("total_qty") == 0:
+            self.forget(data["user_id"])
+        else:
+            from agents.events.bus import current_message_time
+            self.touch(data["user_id"], current_message_time(), data.get("total_qty"), data.get("total_price"))
+
+    async def handle_checkout_started(self, data: Dict):
+        if data.get("user_id"):
+            from agents.events.bus import current_message_time
+            self.touch(data["user_id"], current_message_time(), total_price=data.get("total_price"))
+
+    async def handle_payment_completed(self, data: Dict):
+        if data.get("user_id"):
+            self.forget(data["user_id"])
+
+    def subscribe(self, bus):
+        """Follow cart activity on the given bus"""
+        from agents.events.event_types import EventType
+        bus.subscribe(EventType.CART_ITEM_ADDED, self.handle_item_added)
+        bus.subscribe(EventType.CART_UPDATED, self.handle_cart_updated)
+        bus.subscribe(EventType.CHECKOUT_STARTED, self.handle_checkout_started)
+        bus.subscribe(EventType.PAYMENT_COMPLETED, self.handle_payment_completed)
+
+    # Snapshots
+
+    def _rows(self) -> List[List]:
+        # Applied IDs are tuples, replaced rather than mutated, so rows are safe to write from a thread
+        return [[user_id, *cart] for user_id, cart in self.carts.items()]
+
+    def snapshot(self, rows: Optional[List[List]] = None) -> int:
+        """Write the tracked carts to snapshot_path atomically; returns the count"""
+        if not self.snapshot_path:
+            return 0
+        rows = self._rows() if rows is None else rows
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp = self.snapshot_path + ".tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"taken_at": self.clock(), "timeout": self.timeout, "carts": rows}))
+        os.replace(temp, self.snapshot_path)
+        return len(rows)
+
+    def read_snapshot(self) -> Optional[Dict]:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return None
+        with open(self.snapshot_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def restore(self, state: Optional[Dict] = None) -> int:
+        """Load the last snapshot, if any; returns how many carts were restored"""
+        state = self.read_snapshot() if state is None else state
+        if not state:
+            return 0
+        # Snapshotted carts are older than anything seen since, so they go in
+        # front; carts already active again keep their fresher state
+        # (snapshots written before applied IDs were tracked have four columns)
+        restored = OrderedDict((user_id, [last_activity, total_qty, total_price, tuple(*applied)])
+                               for user_id, last_activity, total_qty, total_price, *applied in state["carts"]
+                               if user_id not in self.carts)
+        count = len(restored)
+        restored.update(self.carts)
+        self.carts = restored
+        return count
+
+    # Running
+
+    async def check(self, bus) -> int:
+        """Publish CART_ABANDONED for every cart past its deadline"""
+        from agents.events.event_types import EventType
+        abandoned = self.due()
+        for start in range(0, len(abandoned), EVENT_CHUNK):
+            await asyncio.to_thread(bus.publish_many, [(EventType.CART_ABANDONED, data)
+                                                       for data in abandoned[start:start + EVENT_CHUNK]])
+        return len(abandoned)
+
+    async def run(self, bus, interval: float = None, snapshot_interval: float = None):
+        """Check deadlines and snapshot periodically until cancelled"""
+        interval = interval or settings.cart_abandonment_check_interval_s
+        snapshot_interval = snapshot_interval or settings.cart_abandonment_snapshot_interval_s
+        restored = self.restore(await asyncio.to_thread(self.read_snapshot) or {})
+        if restored:
+            log.info("open carts restored", count=restored)
+        self._last_snapshot = time.monotonic()
+        try:
+            while True:
+                await self.check(bus)
+                if time.monotonic() - self._last_snapshot >= snapshot_interval:
+                    await self._snapshot_async()
+                await asyncio.sleep(interval)
+        finally:
+            await self._snapshot_async()
+
+    async def serve(self, bus=None, owner: str = None):
+        """Consume cart events on the detector's own group and run() while holding the lease.
+
+        Returns straight away (False) when another process holds the lease.
+        """
+        from agents.events.bus import EventBus, default_consumer_name
+        bus = bus or EventBus(group=settings.cart_abandonment_group,
+                              consumer_name=settings.cart_abandonment_group)
+        owner = owner or default_consumer_name()
+        lease_s = settings.cart_abandonment_lease_s
+        client = bus.get_async_redis()
+        if not await client.set(LEASE_KEY, owner, nx=True, ex=lease_s):
+            log.warning("cart abandonment detector already running", owner=await client.get(LEASE_KEY))
+            return False
+
+        self.subscribe(bus)
+        consuming = asyncio.create_task(bus.start_consuming())
+        detecting = asyncio.create_task(self.run(bus))
+        try:
+            while not (consuming.done() or detecting.done()):
+                await asyncio.sleep(lease_s / 3)
+                if not await client.eval(_RENEW, 1, LEASE_KEY, owner, lease_s):
+                    log.error("cart abandonment lease lost", owner=owner)
+                    break
+        finally:
+            bus.stop()
+            detecting.cancel()
+            await asyncio.gather(consuming, detecting, return_exceptions=True)
+            try:
+                await client.eval(_RELEASE, 1, LEASE_KEY, owner)
+            finally:
+                await bus.close_async()
+                bus.close()
+        return True
+
+    async def _snapshot_async(self):
+        # Rows are copied on the loop so handlers can keep mutating while the thread writes
+        await asyncio.to_thread(self.snapshot, self._rows())
+        self._last_snapshot = time.monotonic()
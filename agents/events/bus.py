@@ -1,110 +1,442 @@
 import redis
-import json
+import redis.asyncio
 import asyncio
-from typing import Callable, Dict, Any, Optional
-from datetime import datetime
+import os
+import socket
+import time
+import uuid
+from contextvars import ContextVar
+from itertools import count
+from typing import Callable, Dict, Any, Iterable, List, Optional, Set, Tuple
 from config.settings import settings
-from agents.events.event_types import EventType
+from core.lazy import LazySingleton
+from core.log import get_logger
+from core.metrics import SIZE_BUCKETS, counter, gauge, histogram
+from agents.events import codec
+from agents.events.event_types import stream_name
+from agents.events.retention import publish_maxlen
+
+log = get_logger(__name__)
+
+PUBLISHED = counter("events_published_total", "Events published", ("event_type",))
+PAYLOAD_BYTES = histogram("event_payload_bytes", "Encoded size of published events", ("event_type",),
+                          buckets=SIZE_BUCKETS)
+PUBLISH_SECONDS = histogram("event_publish_seconds", "Latency of publish round trips", ("op",))
+HANDLE_SECONDS = histogram("event_handle_seconds", "Latency of event handlers", ("event_type",))
+HANDLER_ERRORS = counter("event_handler_errors_total", "Event handlers that raised", ("event_type",))
+DECODE_ERRORS = counter("event_decode_errors_total", "Stream entries that couldn't be decoded", ("stream",))
+DEAD_LETTERED = counter("events_dead_lettered_total", "Events moved to a dead-letter stream", ("stream",))
+STREAM_LAG = gauge("event_stream_lag", "Entries not yet delivered to the consumer group", ("stream",))
+STREAM_PENDING = gauge("event_stream_pending", "Entries delivered to the group but not acknowledged",
+                       ("stream",))
+QUEUE_DEPTH = gauge("event_worker_queue_depth", "Messages queued for this process's handlers", ("stream",))
+
+
+# Stream entry ID of the event being handled (set per worker task)
+_message_id: ContextVar[Optional[str]] = ContextVar("event_message_id", default=None)
+
+
+def current_message_id() -> Optional[str]:
+    """Stream entry ID of the event the calling handler is processing.
+
+    Delivery is at least once, so handlers whose effect isn't idempotent
+    can use it to recognise redeliveries. None outside a handler.
+    """
+    return _message_id.get()
+
+
+def current_message_time() -> Optional[float]:
+    """Publish time (epoch seconds) of the event the calling handler is processing.
+
+    Taken from the stream entry ID, which Redis stamps with its clock in
+    milliseconds when the event is added. None outside a handler.
+    """
+    message_id = _message_id.get()
+    return int(message_id.split("-", 1)[0]) / 1000 if message_id else None
+
+
+def dead_letter_stream(stream: str) -> str:
+    """Stream that receives messages from `stream` that exhausted their retries"""
+    return f"deadletter:{stream}"
+
+
+def observe_published(event_type: str, fields: Dict[str, Any]):
+    """Count a published event and record its encoded size"""
+    PUBLISHED.labels(event_type).inc()
+    PAYLOAD_BYTES.labels(event_type).observe(
+        sum(len(value) for value in fields.values() if isinstance(value, (str, bytes))))
+
+
+def default_consumer_name() -> str:
+    """Unique consumer identity per process (host, pid and a random suffix)"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
 
 class EventBus:
-    """Redis Streams-based event bus for agent coordination"""
+    """Redis Streams-based event bus for agent coordination
+
+    Delivery is at least once. A message is acked once every handler has
+    run without raising; if one raises, the message stays pending and is
+    retried (all handlers run again) after event_claim_idle_ms, by this or
+    another consumer, until event_max_deliveries moves it to the
+    dead-letter stream. Messages whose payload can't be decoded go straight
+    to the dead-letter stream with their raw fields.
+    """
 
-    def __init__(self, redis_url: str = None):
+    def __init__(self, redis_url: str = None, batch_size: int = None,
+                 workers_per_stream: int = None, ordering_key: str = None,
+                 group: str = None, consumer_name: str = None):
         self.redis_url = redis_url or settings.redis_url
-        self.redis = redis.from_url(self.redis_url, decode_responses=True)
+        self.group = group or settings.event_consumer_group
+        self.consumer_name = consumer_name or default_consumer_name()
+        # surrogateescape lets binary (msgpack) payloads round-trip through str
+        self.redis = redis.from_url(self.redis_url, decode_responses=True,
+                                    encoding_errors="surrogateescape")
+        self.async_redis: Optional[redis.asyncio.Redis] = None
+        self.codecs = codec.CodecNegotiator()
         self.handlers: Dict[str, list] = {}
+        self.batch_size = batch_size or settings.event_batch_size
+        self.workers_per_stream = workers_per_stream or settings.event_workers_per_stream
+        self.ordering_key = ordering_key or settings.event_ordering_key
         self._running = False
+        self._queues: Dict[str, List[asyncio.Queue]] = {}
+        self._workers: List[asyncio.Task] = []
+        self._pending_acks: Dict[str, List[str]] = {}
+        # Per stream: dispatched here and not yet acked, so never reclaimed
+        self._inflight: Dict[str, Set[str]] = {}
+        self._ack_wakeup: Optional[asyncio.Event] = None
+        self._round_robin = count()
+
+    def encode_event(self, event_type: str, data: dict) -> Dict[str, Any]:
+        """Stream entry fields for an event, in the negotiated codec"""
+        fields = codec.encode_event(event_type, data, binary=self.codecs.use_binary(self.redis))
+        observe_published(event_type, fields)
+        return fields
 
-    def publish(self, event_type: str, data: dict):
+    def publish(self, event_type: str, data: dict) -> str:
         """Publish event to Redis Stream"""
-        event_data = {
-            "type": event_type,
-            "data": json.dumps(data),
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        stream_name = f"events:{event_type}"
-        self.redis.xadd(stream_name, event_data)
-        print(f"📤 Published event: {event_type}")
+        fields = self.encode_event(event_type, data)
+        start = time.perf_counter()
+        message_id = self.redis.xadd(stream_name(event_type), fields,
+                                     maxlen=publish_maxlen(event_type), approximate=True)
+        PUBLISH_SECONDS.labels("publish").observe(time.perf_counter() - start)
+        log.debug("event published", event_type=event_type, message_id=message_id)
+        return message_id
+
+    def publish_many(self, events: Iterable[Tuple[str, dict]]) -> List[str]:
+        """Publish (event_type, data) pairs in one pipelined round trip"""
+        pipe = self.redis.pipeline(transaction=False)
+        for event_type, data in events:
+            pipe.xadd(stream_name(event_type), self.encode_event(event_type, data),
+                      maxlen=publish_maxlen(event_type), approximate=True)
+        start = time.perf_counter()
+        message_ids = pipe.execute()
+        PUBLISH_SECONDS.labels("publish_many").observe(time.perf_counter() - start)
+        log.debug("events published", count=len(message_ids))
+        return message_ids
 
     def subscribe(self, event_type: str, handler: Callable):
         """Subscribe to event type"""
         if event_type not in self.handlers:
             self.handlers[event_type] = []
         self.handlers[event_type].append(handler)
-        print(f"📥 Subscribed to event: {event_type}")
+        log.debug("subscribed", event_type=event_type)
+
+    def get_async_redis(self) -> redis.asyncio.Redis:
+        """Async client for consuming and buffered publishing, created on first use"""
+        if self.async_redis is None:
+            self.async_redis = redis.asyncio.from_url(self.redis_url, decode_responses=True,
+                                                      encoding_errors="surrogateescape")
+        return self.async_redis
 
     async def start_consuming(self):
         """Start consuming events (blocking)"""
         self._running = True
-        print("🚀 Event bus started consuming...")
+        client = self.get_async_redis()
+        log.info("event bus consuming", consumer=self.consumer_name, group=self.group)
 
         # Create consumer group for each event type
-        for event_type in self.handlers.keys():
-            stream_name = f"events:{event_type}"
+        streams = {stream_name(et): ">" for et in self.handlers.keys()}
+        for stream in streams:
             try:
-                self.redis.xgroup_create(stream_name, "agents", id="0", mkstream=True)
+                await client.xgroup_create(stream, self.group, id="0", mkstream=True)
             except redis.exceptions.ResponseError:
                 # Group already exists
                 pass
 
-        # Start consuming from each stream
-        streams = {f"events:{et}": ">" for et in self.handlers.keys()}
+        await self.codecs.advertise(client, self.consumer_name)
+        self._start_workers(streams)
+        ack_task = asyncio.create_task(self._ack_loop())
+        claim_task = asyncio.create_task(self._claim_loop(list(streams)))
 
-        while self._running:
-            try:
-                # Read from multiple streams
-                events = self.redis.xreadgroup(
-                    groupname="agents",
-                    consumername="agent-consumer",
-                    streams=streams,
-                    count=10,
-                    block=1000  # Block for 1 second
-                )
+        try:
+            while self._running:
+                try:
+                    # Read a batch across all streams without blocking the loop
+                    events = await client.xreadgroup(
+                        groupname=self.group,
+                        consumername=self.consumer_name,
+                        streams=streams,
+                        count=self.batch_size,
+                        block=settings.event_block_ms
+                    )
+                except Exception as e:
+                    log.error("reading events failed", error=e)
+                    await asyncio.sleep(1)
+                    continue
 
-                if events:
-                    for stream_name, messages in events:
-                        event_type = stream_name.decode() if isinstance(stream_name, bytes) else stream_name
-                        event_type = event_type.replace("events:", "")
+                for stream, messages in events or []:
+                    stream = stream.decode() if isinstance(stream, bytes) else stream
+                    for message_id, message_data in messages:
+                        await self._dispatch(stream, message_id, message_data)
+        finally:
+            await self._drain(ack_task, claim_task)
 
-                        for message_id, message_data in messages:
-                            await self._handle_event(event_type, message_data, message_id)
+    def _start_workers(self, streams: Dict[str, str]):
+        """Create a bounded pool of worker queues per stream"""
+        self._ack_wakeup = asyncio.Event()
+        for stream in streams:
+            self._pending_acks[stream] = []
+            self._inflight[stream] = set()
+            queues = [asyncio.Queue(maxsize=self.batch_size) for _ in range(self.workers_per_stream)]
+            self._queues[stream] = queues
+            for queue in queues:
+                self._workers.append(asyncio.create_task(self._worker(stream, queue)))
 
-                await asyncio.sleep(0.1)  # Small delay to prevent tight loop
+    async def _dispatch(self, stream: str, message_id: str, message_data: Dict):
+        """Route a message to a worker; same ordering key -> same worker"""
+        try:
+            data = codec.decode_event(stream[len("events:"):], message_data)
+        except (ValueError, KeyError, TypeError) as e:
+            log.error("decoding event failed", stream=stream, message_id=message_id, error=e)
+            DECODE_ERRORS.labels(stream).inc()
+            try:
+                await self._dead_letter(stream, [(message_id, message_data)], {}, reason="undecodable")
+            except Exception as e:
+                # Left pending: the claim loop tries again
+                log.error("dead-lettering undecodable event failed", stream=stream, error=e)
+            return
+
+        self._inflight[stream].add(message_id)
+        key = data.get(self.ordering_key) if isinstance(data, dict) else None
+        queues = self._queues[stream]
+        if key is None:
+            queue = queues[next(self._round_robin) % len(queues)]
+        else:
+            queue = queues[hash(str(key)) % len(queues)]
+        # Blocks the reader (backpressure) while this worker is saturated
+        await queue.put((message_id, data))
+
+    async def _worker(self, stream: str, queue: asyncio.Queue):
+        event_type = stream[len("events:"):]
+        while True:
+            message_id, data = await queue.get()
+            _message_id.set(message_id)
+            handled = False
+            try:
+                handled = await self._handle_event(event_type, data)
+            finally:
+                if handled:
+                    acks = self._pending_acks[stream]
+                    acks.append(message_id)
+                    if len(acks) >= self.batch_size:
+                        self._ack_wakeup.set()
+                else:
+                    # Stays pending; reclaimed for a retry once idle long enough
+                    self._inflight[stream].discard(message_id)
+                queue.task_done()
 
+    async def _handle_event(self, event_type: str, data: Any) -> bool:
+        """Run every handler for a single event; False if any of them raised"""
+        handled = True
+        seconds = HANDLE_SECONDS.labels(event_type)
+        for handler in self.handlers.get(event_type, []):
+            start = time.perf_counter()
+            try:
+                if asyncio.iscoroutinefunction(handler):
+                    await handler(data)
+                else:
+                    handler(data)
             except Exception as e:
-                print(f"❌ Error consuming events: {e}")
-                await asyncio.sleep(1)
+                handled = False
+                HANDLER_ERRORS.labels(event_type).inc()
+                log.error("event handler failed", event_type=event_type,
+                          handler=getattr(handler, "__qualname__", repr(handler)), error=e)
+            finally:
+                seconds.observe(time.perf_counter() - start)
+        return handled
+
+    async def _ack_loop(self):
+        """Flush acknowledgements in bulk on a size or time threshold"""
+        interval = settings.event_ack_interval_ms / 1000
+        while True:
+            try:
+                await asyncio.wait_for(self._ack_wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._ack_wakeup.clear()
+            await self._flush_acks()
 
-    async def _handle_event(self, event_type: str, message_data: Dict, message_id: str):
-        """Handle a single event"""
+    async def _flush_acks(self):
+        """Acknowledge all handled messages with one pipelined round trip"""
+        batches = {stream: ids for stream, ids in self._pending_acks.items() if ids}
+        if not batches:
+            return
+        for stream in batches:
+            self._pending_acks[stream] = []
         try:
-            data = json.loads(message_data.get("data", "{}"))
-            handlers = self.handlers.get(event_type, [])
+            pipe = self.async_redis.pipeline(transaction=False)
+            for stream, ids in batches.items():
+                pipe.xack(stream, self.group, *ids)
+            await pipe.execute()
+        except Exception as e:
+            log.error("acknowledging events failed", error=e)
+            # Unacked messages stay pending and are redelivered
+            for stream, ids in batches.items():
+                self._pending_acks[stream][:0] = ids
+            return
+        for stream, ids in batches.items():
+            self._inflight[stream].difference_update(ids)
 
-            for handler in handlers:
+    async def _claim_loop(self, streams: List[str]):
+        """Periodically take over messages left pending by dead consumers"""
+        interval = settings.event_claim_interval_ms / 1000
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.codecs.advertise(self.async_redis, self.consumer_name)
+            except Exception as e:
+                log.error("advertising codecs failed", error=e)
+            for stream in streams:
                 try:
-                    if asyncio.iscoroutinefunction(handler):
-                        await handler(data)
-                    else:
-                        handler(data)
+                    await self._claim_stale(stream)
+                    await self._expire_consumers(stream)
                 except Exception as e:
-                    print(f"❌ Error in handler for {event_type}: {e}")
+                    log.error("reclaiming pending events failed", stream=stream, error=e)
+
+    async def _claim_stale(self, stream: str):
+        """XCLAIM messages pending longer than event_claim_idle_ms; retry them or dead-letter them.
+
+        Candidates come from XPENDING rather than XAUTOCLAIM so that messages
+        still queued or being handled in this process are left alone: they
+        are idle in Redis until acked, but not abandoned. Messages a handler
+        failed on are no longer in flight here and are retried like any other.
+        """
+        client = self.async_redis
+        idle_ms = settings.event_claim_idle_ms
+        start_id = "-"
+        while True:
+            pending = await client.xpending_range(stream, self.group, min=start_id, max="+",
+                                                  count=self.batch_size, idle=idle_ms)
+            if not pending:
+                break
+            inflight = self._inflight.get(stream, ())
+            deliveries = {entry["message_id"]: entry["times_delivered"] + 1 for entry in pending
+                          if entry["message_id"] not in inflight}
+            if deliveries:
+                claimed = await client.xclaim(stream, self.group, self.consumer_name,
+                                              min_idle_time=idle_ms, message_ids=list(deliveries))
+                claimed = [(message_id, fields) for message_id, fields in claimed if message_id in deliveries]
+                # Entries trimmed from the stream while pending can only be acked
+                deleted = [message_id for message_id, fields in claimed if not fields]
+                messages = [(message_id, fields) for message_id, fields in claimed if fields]
+                if deleted:
+                    await client.xack(stream, self.group, *deleted)
+                dead = [(message_id, fields) for message_id, fields in messages
+                        if deliveries[message_id] > settings.event_max_deliveries]
+                if dead:
+                    await self._dead_letter(stream, dead, deliveries)
+                dead_ids = {message_id for message_id, _ in dead}
+                for message_id, fields in messages:
+                    if message_id not in dead_ids:
+                        await self._dispatch(stream, message_id, fields)
 
-            # Acknowledge the message
-            stream_name = f"events:{event_type}"
-            self.redis.xack(stream_name, "agents", message_id)
+            if len(pending) < self.batch_size:
+                break
+            start_id = "(" + pending[-1]["message_id"]
 
+    async def _dead_letter(self, stream: str, messages, deliveries: Dict[str, int],
+                           reason: str = "max_deliveries"):
+        """Move poison messages to the dead-letter stream and ack the originals"""
+        pipe = self.async_redis.pipeline(transaction=True)
+        for message_id, fields in messages:
+            pipe.xadd(dead_letter_stream(stream), {
+                **fields,
+                "source_id": message_id,
+                "reason": reason,
+                "deliveries": deliveries.get(message_id, 0),
+                "consumer": self.consumer_name,
+            })
+        pipe.xack(stream, self.group, *[message_id for message_id, _ in messages])
+        await pipe.execute()
+        DEAD_LETTERED.labels(stream).inc(len(messages))
+        log.warning("events dead-lettered", stream=stream, count=len(messages), reason=reason)
+
+    async def _expire_consumers(self, stream: str):
+        """Remove long-idle consumers that hold no pending messages"""
+        for consumer in await self.async_redis.xinfo_consumers(stream, self.group):
+            if (consumer["name"] != self.consumer_name and consumer["pending"] == 0
+                    and consumer["idle"] > settings.event_consumer_expiry_ms):
+                await self.async_redis.xgroup_delconsumer(stream, self.group, consumer["name"])
+
+    async def _drain(self, *background: asyncio.Task):
+        """Finish queued messages, stop workers and flush outstanding acks"""
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        for queues in self._queues.values():
+            for queue in queues:
+                await queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        self._queues.clear()
+        await self._flush_acks()
+        self._inflight.clear()
+        try:
+            await self.codecs.withdraw(self.async_redis, self.consumer_name)
         except Exception as e:
-            print(f"❌ Error handling event {event_type}: {e}")
+            log.error("withdrawing codecs failed", error=e)
 
     def stop(self):
         """Stop consuming events"""
         self._running = False
-        print("🛑 Event bus stopped")
+        log.info("event bus stopped")
+
+    async def collect_metrics(self):
+        """Refresh stream lag, pending and local queue depth gauges"""
+        for stream, queues in list(self._queues.items()):
+            QUEUE_DEPTH.labels(stream).set(sum(queue.qsize() for queue in queues))
+        if self.async_redis is None:
+            return
+        for event_type in list(self.handlers):
+            stream = stream_name(event_type)
+            try:
+                groups = await self.async_redis.xinfo_groups(stream)
+            except redis.exceptions.ResponseError:
+                continue  # Stream doesn't exist yet
+            for group in groups:
+                if group["name"] == self.group:
+                    STREAM_PENDING.labels(stream).set(group.get("pending") or 0)
+                    # lag is reported by Redis 7+ and is None when unknown
+                    if group.get("lag") is not None:
+                        STREAM_LAG.labels(stream).set(group["lag"])
 
     def close(self):
         """Close Redis connection"""
         self.redis.close()
 
-# Global event bus instance
-event_bus = EventBus()
+    async def close_async(self):
+        """Close the async Redis connection used for consuming"""
+        if self.async_redis is not None:
+            await self.async_redis.aclose()
+            self.async_redis = None
+
+def get_event_bus() -> EventBus:
+    """The process-wide event bus, created on first use"""
+    return event_bus.get()
+
+
+# Global event bus instance (created lazily)
+event_bus: EventBus = LazySingleton(EventBus)
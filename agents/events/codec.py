@@ -0,0 +1,177 @@
+"""
+Event payload codecs
+
+Two wire formats are understood by every consumer:
+
+- json: {"type", "data": <json>, "timestamp"} - the original format
+- msgpack: {"codec": "msgpack", "v": <schema version>, "payload": <bytes>}
+  where payload is a msgpack array of the schema's field values in order,
+  followed by a map of any keys the schema doesn't declare. The entry ID
+  already carries the publish time, so no timestamp is stored.
+
+Publishers pick a format through CodecNegotiator: consumers advertise what
+they can decode in the events:codecs hash, and in "auto" mode msgpack is only
+used once at least one live consumer has advertised and every live consumer
+supports it; with no fresh advertisement publishers stay on JSON. Consumers
+older than the negotiation never advertise, so while any are still running
+set event_codec to "json".
+
+Payloads of event types with a schema are checked against it before they
+are encoded in either format: a missing field or one of the wrong type
+raises ValueError at the publisher instead of decoding wrong downstream.
+"""
+
+import json
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+from config.settings import settings
+from agents.events.event_types import EVENT_SCHEMAS, EventSchema, EventType
+
+try:
+    import msgpack
+except ImportError:  # Optional dependency: fall back to JSON only
+    msgpack = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+CODECS_KEY = "events:codecs"
+
+
+def _schema_versions(event_type: str) -> Dict[int, EventSchema]:
+    try:
+        return {schema.version: schema for schema in EVENT_SCHEMAS[EventType(event_type)]}
+    except (ValueError, KeyError):
+        return {}
+
+
+def _current_schema(event_type: str) -> Optional[EventSchema]:
+    try:
+        return EventType(event_type).schema
+    except (ValueError, KeyError):
+        return None
+
+
+def validate_event(event_type: str, data: Any):
+    """Raise ValueError unless data matches the event type's current schema"""
+    if isinstance(event_type, EventType):
+        event_type = event_type.value
+    schema = _current_schema(event_type)
+    if schema is None:
+        return
+    if not isinstance(data, dict):
+        raise ValueError(f"Invalid {event_type} payload: expected a dict, got {type(data).__name__}")
+    errors = schema.errors(data)
+    if errors:
+        raise ValueError(f"Invalid {event_type} payload: " + "; ".join(errors))
+
+
+def encode_event(event_type: str, data: Any, binary: bool = False, validate: bool = True) -> Dict[str, Any]:
+    """Stream entry fields for an event; validate=False skips the schema check"""
+    if isinstance(event_type, EventType):
+        event_type = event_type.value
+    if validate:
+        validate_event(event_type, data)
+    if binary and msgpack is not None and isinstance(data, dict):
+        schema = _current_schema(event_type)
+        if schema is None:
+            return {"codec": MSGPACK, "v": 0, "payload": msgpack.packb(data, use_bin_type=True)}
+        values = [data.get(name) for name in schema.names]
+        extra = {key: value for key, value in data.items() if key not in schema.name_set}
+        if extra:
+            values.append(extra)
+        return {"codec": MSGPACK, "v": schema.version, "payload": msgpack.packb(values, use_bin_type=True)}
+    return {
+        "type": event_type,
+        "data": json.dumps(data),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+def decode_event(event_type: str, fields: Dict[str, Any]) -> Any:
+    """Payload of a stream entry in either format.
+
+    With msgpack, schema fields that were absent or None both decode as absent.
+    """
+    if fields.get("codec") != MSGPACK:
+        return json.loads(fields.get("data", "{}"))
+
+    if msgpack is None:
+        raise ValueError("msgpack-encoded event received but msgpack is not installed")
+    payload = fields["payload"]
+    if isinstance(payload, str):
+        # Binary values survive decode_responses via surrogateescape
+        payload = payload.encode("utf-8", "surrogateescape")
+    values = msgpack.unpackb(payload, raw=False)
+
+    version = int(fields.get("v", 0))
+    if version == 0:
+        return values
+    schema = _schema_versions(event_type).get(version)
+    if schema is None:
+        raise ValueError(f"Unknown schema version {version} for {event_type}")
+    data = {name: value for name, value in zip(schema.names, values) if value is not None}
+    if len(values) > len(schema.names):
+        data.update(values[-1])
+    return data
+
+
+def supported_codecs() -> str:
+    return f"{MSGPACK},{JSON}" if msgpack is not None else JSON
+
+
+class CodecNegotiator:
+    """Decides whether publishers may use the binary codec"""
+
+    def __init__(self, mode: str = None):
+        self.mode = mode or settings.event_codec  # "auto", "json" or "msgpack"
+        self._binary: Optional[bool] = None
+        self._checked_at = 0.0
+
+    async def advertise(self, client, consumer_name: str):
+        """Record (or refresh) what this consumer can decode"""
+        await client.hset(CODECS_KEY, consumer_name, f"{supported_codecs()};{int(time.time())}")
+
+    async def withdraw(self, client, consumer_name: str):
+        await client.hdel(CODECS_KEY, consumer_name)
+
+    def _fixed(self) -> Optional[bool]:
+        if msgpack is None or self.mode == JSON:
+            return False
+        if self.mode == MSGPACK:
+            return True
+        if self._binary is not None and time.monotonic() - self._checked_at < settings.event_codec_refresh_s:
+            return self._binary
+        return None
+
+    def _decide(self, advertised: Dict[str, str]) -> bool:
+        now = time.time()
+        live = []
+        for value in advertised.values():
+            codecs, _, seen_at = value.rpartition(";")
+            if now - float(seen_at or 0) < settings.event_codec_ttl_s:
+                live.append(MSGPACK in codecs.split(","))
+        # Nobody listening (or nobody advertising yet) decodes JSON for sure
+        self._binary = bool(live) and all(live)
+        self._checked_at = time.monotonic()
+        return self._binary
+
+    def use_binary(self, client) -> bool:
+        """Negotiate with a sync Redis client (cached between refreshes)"""
+        fixed = self._fixed()
+        if fixed is not None:
+            return fixed
+        try:
+            return self._decide(client.hgetall(CODECS_KEY))
+        except Exception:
+            return False
+
+    async def use_binary_async(self, client) -> bool:
+        """Negotiate with an async Redis client (cached between refreshes)"""
+        fixed = self._fixed()
+        if fixed is not None:
+            return fixed
+        try:
+            return self._decide(await client.hgetall(CODECS_KEY))
+        except Exception:
+            return False
@@ -1,4 +1,44 @@
+from dataclasses import dataclass, field
 from enum import Enum
+from typing import Dict, FrozenSet, List, Tuple
+
+
+@dataclass(frozen=True)
+class EventSchema:
+    """Ordered, typed payload fields; the binary codec encodes values by position.
+
+    Append new fields and bump the version rather than reordering, so that
+    entries written with an older version still decode.
+    """
+    version: int
+    fields: Tuple[Tuple[str, type], ...]
+    names: Tuple[str, ...] = field(init=False)
+    name_set: FrozenSet[str] = field(init=False)
+
+    def __post_init__(self):
+        names = tuple(name for name, _ in self.fields)
+        object.__setattr__(self, "names", names)
+        object.__setattr__(self, "name_set", frozenset(names))
+
+    def errors(self, data: dict) -> List[str]:
+        """What is wrong with a payload: missing (or None) fields and fields of the wrong type"""
+        errors = []
+        for name, kind in self.fields:
+            value = data.get(name)
+            if value is None:
+                errors.append(f"{name} is missing")
+            elif not isinstance(value, kind) or (isinstance(value, bool) and kind is not bool):
+                errors.append(f"{name} is {type(value).__name__}, not {_type_name(kind)}")
+        return errors
+
+    def validate(self, data: dict) -> bool:
+        """True if every schema field is present with the declared type"""
+        return not self.errors(data)
+
+
+def _type_name(kind) -> str:
+    return " or ".join(k.__name__ for k in kind) if isinstance(kind, tuple) else kind.__name__
+
 
 class EventType(str, Enum):
     # Cart events
@@ -13,6 +53,7 @@ class EventType(str, Enum):
     # Product events
     PRODUCT_VIEWED = "product.viewed"
     PRODUCT_SEARCHED = "product.searched"
+    PRODUCT_UPDATED = "product.updated"
 
     # Checkout events
     CHECKOUT_STARTED = "checkout.started"
@@ -26,3 +67,37 @@ class EventType(str, Enum):
     PRICE_CHANGED = "price.changed"
     PROMOTION_CREATED = "promotion.created"
     PROMOTION_EXPIRED = "promotion.expired"
+
+    @property
+    def schema(self) -> EventSchema:
+        """Current payload schema for this event type"""
+        return EVENT_SCHEMAS[self][-1]
+
+
+Number = (int, float)
+
+# Every schema version per event type, oldest first; the last one is current
+EVENT_SCHEMAS: Dict[EventType, Tuple[EventSchema, ...]] = {
+    EventType.CART_ITEM_ADDED: (EventSchema(1, (("user_id", str), ("product_id", str), ("qty", int), ("price", Number))),),
+    EventType.CART_UPDATED: (EventSchema(1, (("user_id", str), ("total_qty", int), ("total_price", Number))),),
+    EventType.CART_ABANDONED: (EventSchema(1, (("user_id", str), ("total_qty", int), ("total_price", Number), ("last_activity", Number))),),
+    EventType.USER_REGISTERED: (EventSchema(1, (("user_id", str), ("email", str))),),
+    EventType.USER_LOGIN: (EventSchema(1, (("user_id", str),)),),
+    EventType.PRODUCT_VIEWED: (EventSchema(1, (("user_id", str), ("product_id", str))),),
+    EventType.PRODUCT_SEARCHED: (EventSchema(1, (("user_id", str), ("query", str), ("results", int))),),
+    EventType.PRODUCT_UPDATED: (EventSchema(1, (("product_id", str),)),),
+    EventType.CHECKOUT_STARTED: (EventSchema(1, (("user_id", str), ("total_price", Number))),),
+    EventType.PAYMENT_COMPLETED: (EventSchema(1, (("user_id", str), ("order_id", str), ("amount", Number))),),
+    EventType.AGENT_QUERY: (EventSchema(1, (("user_id", str), ("query", str))),),
+    EventType.RECOMMENDATION_REQUESTED: (EventSchema(1, (("user_id", str), ("product_id", str))),),
+    EventType.PRICE_CHANGED: (EventSchema(1, (("product_id", str), ("old_price", Number), ("new_price", Number))),),
+    EventType.PROMOTION_CREATED: (EventSchema(1, (("promotion_id", str),)),),
+    EventType.PROMOTION_EXPIRED: (EventSchema(1, (("promotion_id", str),)),),
+}
+
+
+def stream_name(event_type: str) -> str:
+    """Redis stream key for an event type (accepts EventType members or strings)"""
+    if isinstance(event_type, EventType):
+        event_type = event_type.value
+    return f"events:{event_type}"
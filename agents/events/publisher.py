@@ -0,0 +1,114 @@
+import asyncio
+import time
+from typing import List, Optional, Tuple
+from config.settings import settings
+from agents.events import codec
+from agents.events.bus import PUBLISH_SECONDS, EventBus, observe_published
+from agents.events.event_types import stream_name
+from agents.events.retention import publish_maxlen
+
+
+class BufferedPublisher:
+    """Collects events and flushes them to Redis as pipelined XADD batches.
+
+    A batch is flushed when it reaches ``batch_size`` events or when the
+    oldest buffered event has waited ``max_delay_ms``. ``publish`` waits for
+    buffer space once ``max_buffer`` events are outstanding (backpressure) and
+    resolves to the message ID once the event is written.
+    """
+
+    def __init__(self, bus: EventBus, batch_size: int = None, max_delay_ms: int = None,
+                 max_buffer: int = None):
+        self.bus = bus
+        self.batch_size = batch_size or settings.event_publish_batch_size
+        self.max_delay = (max_delay_ms or settings.event_publish_max_delay_ms) / 1000
+        self._slots = asyncio.Semaphore(max_buffer or settings.event_publish_buffer_size)
+        self._buffer: List[Tuple[str, dict, asyncio.Future]] = []
+        self._has_items = asyncio.Event()
+        self._full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def publish(self, event_type: str, data: dict) -> str:
+        """Buffer one event and wait for its message ID"""
+        future = await self.enqueue(event_type, data)
+        return await future
+
+    async def enqueue(self, event_type: str, data: dict) -> asyncio.Future:
+        """Buffer one event; returns a future for its message ID.
+
+        Raises ValueError right away if the payload doesn't match its schema.
+        """
+        codec.validate_event(event_type, data)
+        await self._slots.acquire()
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._buffer.append((event_type, data, future))
+        self._has_items.set()
+        if len(self._buffer) >= self.batch_size:
+            self._full.set()
+        return future
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._has_items.wait()
+            if len(self._buffer) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+            await self.flush()
+
+    async def flush(self):
+        """Write everything currently buffered"""
+        async with self._flush_lock:
+            await self._drain()
+
+    async def _drain(self):
+        while self._buffer:
+            batch = self._buffer[:self.batch_size]
+            del self._buffer[:self.batch_size]
+            if len(self._buffer) < self.batch_size:
+                self._full.clear()
+            if not self._buffer:
+                self._has_items.clear()
+            await self._write(batch)
+
+    async def _write(self, batch: List[Tuple[str, dict, asyncio.Future]]):
+        try:
+            client = self.bus.get_async_redis()
+            binary = await self.bus.codecs.use_binary_async(client)
+            pipe = client.pipeline(transaction=False)
+            for event_type, data, _ in batch:
+                fields = codec.encode_event(event_type, data, binary, validate=False)  # Checked at enqueue
+                observe_published(event_type, fields)
+                pipe.xadd(stream_name(event_type), fields,
+                          maxlen=publish_maxlen(event_type), approximate=True)
+            start = time.perf_counter()
+            message_ids = await pipe.execute()
+            PUBLISH_SECONDS.labels("buffered").observe(time.perf_counter() - start)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, _, future), message_id in zip(batch, message_ids):
+                if not future.done():
+                    future.set_result(message_id)
+        finally:
+            for _ in batch:
+                self._slots.release()
+
+    async def close(self):
+        """Flush remaining events and stop the background flusher"""
+        async with self._flush_lock:
+            # Holding the lock guarantees the flusher isn't mid-write
+            if self._task is not None:
+                self._task.cancel()
+                await asyncio.gather(self._task, return_exceptions=True)
+                self._task = None
+            await self._drain()
@@ -0,0 +1,249 @@
+"""
+Stream retention, archival and replay for events:* streams
+
+Each EventType has a RetentionPolicy (approximate max length and/or max
+age). The StreamCompactor moves entries that fall outside the policy into
+gzip'd JSON-lines segment files under settings.event_archive_dir and then
+trims them from Redis. Entries that a consumer group has not yet delivered
+or acknowledged are never trimmed by the compactor.
+
+replay() reads archived segments followed by the live stream in batches, so
+backfills stream through history without loading it into memory.
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from config.settings import settings
+from core.log import get_logger
+from agents.events.event_types import EventType, stream_name
+
+log = get_logger(__name__)
+
+StreamEntry = Tuple[str, Dict[str, str]]
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """How much of a stream to keep in Redis"""
+    max_len: Optional[int] = None
+    max_age_seconds: Optional[int] = None
+
+
+DAY = 24 * 3600
+
+# High-volume tracking streams keep less; business events keep more history
+RETENTION_POLICIES: Dict[EventType, RetentionPolicy] = {
+    EventType.PRODUCT_VIEWED: RetentionPolicy(max_len=200_000, max_age_seconds=2 * DAY),
+    EventType.PRODUCT_SEARCHED: RetentionPolicy(max_len=200_000, max_age_seconds=2 * DAY),
+    EventType.CART_ITEM_ADDED: RetentionPolicy(max_len=100_000, max_age_seconds=7 * DAY),
+    EventType.CART_UPDATED: RetentionPolicy(max_len=100_000, max_age_seconds=7 * DAY),
+    EventType.AGENT_QUERY: RetentionPolicy(max_len=50_000, max_age_seconds=7 * DAY),
+    EventType.PAYMENT_COMPLETED: RetentionPolicy(max_age_seconds=30 * DAY),
+    EventType.PRICE_CHANGED: RetentionPolicy(max_age_seconds=30 * DAY),
+}
+
+
+def retention_policy(event_type: str) -> RetentionPolicy:
+    """Policy for an event type, falling back to the default max length"""
+    try:
+        return RETENTION_POLICIES[EventType(event_type)]
+    except (ValueError, KeyError):
+        return RetentionPolicy(max_len=settings.event_stream_max_len)
+
+
+def publish_maxlen(event_type: str) -> Optional[int]:
+    """MAXLEN applied on XADD, None for age-only policies.
+
+    An age-only policy (e.g. payments) must not lose entries to a count
+    limit inside its retention window, so only the compactor trims it. With
+    archiving enabled the compactor does the trimming for every stream, so
+    XADD only enforces a hard cap that protects Redis memory if compaction
+    falls behind.
+    """
+    max_len = retention_policy(event_type).max_len
+    if max_len is None:
+        return None
+    if settings.event_archive_dir:
+        return max_len * settings.event_stream_hard_cap_factor
+    return max_len
+
+
+def parse_id(message_id: str) -> Tuple[int, int]:
+    if isinstance(message_id, bytes):
+        message_id = message_id.decode()
+    ms, _, seq = message_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def format_id(parsed: Tuple[int, int]) -> str:
+    return f"{parsed[0]}-{parsed[1]}"
+
+
+def next_id(message_id: str) -> str:
+    ms, seq = parse_id(message_id)
+    return format_id((ms, seq + 1))
+
+
+class SegmentArchive:
+    """Gzip'd JSON-lines segment files, one directory per stream"""
+
+    def __init__(self, root: str = None):
+        self.root = root or settings.event_archive_dir
+
+    def _directory(self, stream: str) -> str:
+        return os.path.join(self.root, stream.replace(":", "_"))
+
+    def segments(self, stream: str) -> List[Tuple[Tuple[int, int], Tuple[int, int], str]]:
+        """(first_id, last_id, path) of every segment, oldest first"""
+        directory = self._directory(stream)
+        if not os.path.isdir(directory):
+            return []
+        found = []
+        for name in os.listdir(directory):
+            if not name.endswith(".jsonl.gz"):
+                continue
+            first, last = name[:-len(".jsonl.gz")].split("_")
+            found.append((parse_id(first), parse_id(last), os.path.join(directory, name)))
+        return sorted(found)
+
+    def last_archived_id(self, stream: str) -> Optional[str]:
+        segments = self.segments(stream)
+        return format_id(segments[-1][1]) if segments else None
+
+    def write(self, stream: str, entries: List[StreamEntry]):
+        """Write one segment atomically (temp file + rename)"""
+        directory = self._directory(stream)
+        os.makedirs(directory, exist_ok=True)
+        first, last = parse_id(entries[0][0]), parse_id(entries[-1][0])
+        name = f"{first[0]:013d}-{first[1]}_{last[0]:013d}-{last[1]}.jsonl.gz"
+        path = os.path.join(directory, name)
+        with gzip.open(path + ".tmp", "wt", encoding="utf-8") as f:
+            for message_id, fields in entries:
+                f.write(json.dumps([message_id, fields]) + "\n")
+        os.replace(path + ".tmp", path)
+
+    def read(self, stream: str, start: Tuple[int, int], end: Tuple[int, int],
+             batch_size: int):
+        """Yield batches of archived entries with start <= id <= end"""
+        batch: List[StreamEntry] = []
+        for first, last, path in self.segments(stream):
+            if last < start or first > end:
+                continue
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    message_id, fields = json.loads(line)
+                    if start <= parse_id(message_id) <= end:
+                        batch.append((message_id, fields))
+                        if len(batch) >= batch_size:
+                            yield batch
+                            batch = []
+        if batch:
+            yield batch
+
+
+class StreamCompactor:
+    """Archives and trims stream entries that fall outside their retention policy"""
+
+    def __init__(self, client, archive: SegmentArchive = None, batch_size: int = 1000):
+        self.client = client
+        self.archive = archive or SegmentArchive()
+        self.batch_size = batch_size
+
+    async def _safe_boundary(self, stream: str) -> Optional[Tuple[int, int]]:
+        """Oldest id some consumer group still needs (None: nothing in use)"""
+        boundary = None
+        for group in await self.client.xinfo_groups(stream):
+            needed = next_id(group["last-delivered-id"])
+            if group["pending"]:
+                summary = await self.client.xpending(stream, group["name"])
+                needed = summary["min"]
+            parsed = parse_id(needed)
+            boundary = parsed if boundary is None else min(boundary, parsed)
+        return boundary
+
+    async def compact(self, event_type: str) -> int:
+        """Archive and trim one stream; returns the number of entries removed"""
+        stream = stream_name(event_type)
+        policy = retention_policy(event_type)
+        length = await self.client.xlen(stream)
+        if length == 0:
+            return 0
+        excess = max(0, length - policy.max_len) if policy.max_len else 0
+        min_age_id = (int(time.time() * 1000) - policy.max_age_seconds * 1000, 0) \
+            if policy.max_age_seconds else (0, 0)
+        safe = await self._safe_boundary(stream)
+
+        start = self.archive.last_archived_id(stream)
+        start = next_id(start) if start else "-"
+        removed = 0
+        while True:
+            entries = await self.client.xrange(stream, start, "+", count=self.batch_size)
+            expired = []
+            for message_id, fields in entries:
+                parsed = parse_id(message_id)
+                if safe is not None and parsed >= safe:
+                    break
+                if removed + len(expired) >= excess and parsed >= min_age_id:
+                    break
+                expired.append((message_id, fields))
+            if expired:
+                self.archive.write(stream, expired)
+                # Approximate trim: leftovers below the id are skipped by replay
+                await self.client.xtrim(stream, minid=next_id(expired[-1][0]), approximate=True)
+                removed += len(expired)
+            if len(expired) < len(entries) or len(entries) < self.batch_size:
+                return removed
+            start = next_id(entries[-1][0])
+
+    async def compact_all(self) -> Dict[str, int]:
+        results = {}
+        for event_type in EventType:
+            try:
+                results[event_type.value] = await self.compact(event_type)
+            except Exception as e:
+                log.error("compacting stream failed", event_type=event_type.value, error=e)
+        return results
+
+    async def run(self, interval: float = None):
+        """Compact every stream periodically until cancelled"""
+        interval = interval or settings.event_compaction_interval_s
+        while True:
+            results = await self.compact_all()
+            archived = sum(results.values())
+            if archived:
+                log.info("events archived", count=archived)
+            await asyncio.sleep(interval)
+
+
+async def replay(client, event_type: str, start_id: str = "-", end_id: str = "+",
+                 batch_size: int = 500, archive: SegmentArchive = None) -> AsyncIterator[List[StreamEntry]]:
+    """Yield batches of (message_id, fields), archived history first, then live.
+
+    Decode payloads with agents.events.codec.decode_event.
+    """
+    archive = archive or SegmentArchive()
+    stream = stream_name(event_type)
+    start = (0, 0) if start_id == "-" else parse_id(start_id)
+    end = (2 ** 63, 0) if end_id == "+" else parse_id(end_id)
+
+    for batch in archive.read(stream, start, end, batch_size):
+        yield batch
+
+    # Live entries the archive already covers may linger after approximate trims
+    last_archived = archive.last_archived_id(stream)
+    if last_archived and parse_id(last_archived) >= start:
+        start = parse_id(next_id(last_archived))
+    cursor = format_id(start)
+    while True:
+        entries = await client.xrange(stream, cursor, end_id, count=batch_size)
+        if not entries:
+            return
+        yield entries
+        if len(entries) < batch_size:
+            return
+        cursor = next_id(entries[-1][0])
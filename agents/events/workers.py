@@ -0,0 +1,102 @@
+"""
+Multi-process event consumers
+
+Starts N worker processes that each run their own EventBus consumer with a
+unique consumer name in the shared consumer group, so Redis spreads stream
+entries across them. Dead workers are restarted; whatever they left pending
+is reclaimed by the surviving consumers (XPENDING + XCLAIM).
+
+    uv run python -m agents.events.workers myapp.handlers:register --processes 4
+
+`register` is any importable function taking the EventBus and subscribing
+handlers on it.
+"""
+
+import argparse
+import asyncio
+import importlib
+import multiprocessing
+import os
+import signal
+import time
+from typing import Callable, List
+from config.settings import settings
+from core.log import get_logger
+from agents.events.bus import EventBus
+
+log = get_logger(__name__)
+
+
+def load_setup(path: str) -> Callable[[EventBus], None]:
+    """Resolve a 'package.module:function' reference"""
+    module_name, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module_name), attr or "register")
+
+
+async def _consume(bus: EventBus):
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, bus.stop)
+    try:
+        await bus.start_consuming()
+    finally:
+        await bus.close_async()
+        bus.close()
+
+
+def _worker_main(setup_path: str):
+    bus = EventBus()
+    load_setup(setup_path)(bus)
+    log.info("event worker consuming", pid=os.getpid(), consumer=bus.consumer_name)
+    asyncio.run(_consume(bus))
+
+
+def run_workers(setup_path: str, processes: int = None, restart: bool = True):
+    """Run consumer processes until interrupted, restarting any that die"""
+    processes = processes or settings.event_worker_processes or os.cpu_count()
+    context = multiprocessing.get_context("spawn")
+    stopping = False
+
+    def start() -> multiprocessing.Process:
+        process = context.Process(target=_worker_main, args=(setup_path,), daemon=False)
+        process.start()
+        return process
+
+    def request_stop(*_):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    workers: List[multiprocessing.Process] = [start() for _ in range(processes)]
+    log.info("event workers started", processes=processes)
+
+    while not stopping:
+        time.sleep(1)
+        for i, process in enumerate(workers):
+            if not process.is_alive() and restart and not stopping:
+                log.warning("event worker exited, restarting", pid=process.pid, exitcode=process.exitcode)
+                workers[i] = start()
+
+    # Graceful shutdown: each worker drains its queues and flushes acks
+    for process in workers:
+        if process.is_alive():
+            process.terminate()
+    for process in workers:
+        process.join(timeout=30)
+        if process.is_alive():
+            process.kill()
+    log.info("event workers stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run event consumers across processes")
+    parser.add_argument("setup", help="module:function that subscribes handlers on an EventBus")
+    parser.add_argument("-n", "--processes", type=int, default=None)
+    args = parser.parse_args()
+    run_workers(args.setup, args.processes)
+
+
+if __name__ == "__main__":
+    main()
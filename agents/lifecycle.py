@@ -0,0 +1,134 @@
+"""
+Process lifecycle
+
+Importing the platform has no side effects: settings, the MongoDB client, the
+event bus and the Node.js API client are created on first use. Long-running
+services call startup() to load settings, configure logging, verify
+connections up front and wire event subscriptions, and shutdown() to close
+whatever was opened. startup(serve_metrics=True) also exposes /metrics and
+/metrics.json on settings.metrics_port.
+
+    await startup()
+    try:
+        ...
+    finally:
+        await shutdown()
+"""
+
+import asyncio
+import contextlib
+import os
+import sys
+from typing import Optional
+from config.mongodb import db, get_db
+from config.settings import get_settings, settings
+from core import metrics
+from core.log import configure_logging, get_logger, shutdown_logging
+from agents.events.bus import event_bus, get_event_bus
+
+log = get_logger(__name__)
+
+_started = False
+_compactor: Optional[asyncio.Task] = None
+_abandonment: Optional[asyncio.Task] = None
+_reservations: Optional[asyncio.Task] = None
+_metrics_server: Optional[metrics.MetricsServer] = None
+
+
+async def startup(subscribe_events: bool = True, compact_streams: bool = False,
+                  detect_abandoned_carts: bool = False, expire_reservations: bool = False,
+                  serve_metrics: bool = False):
+    """Load settings, open connections and subscribe event handlers"""
+    global _started, _compactor, _abandonment, _reservations, _metrics_server
+    if _started:
+        return
+    get_settings()
+    configure_logging()
+
+    await get_db().ping()
+    log.info("connected to MongoDB")
+
+    bus = get_event_bus()
+    await bus.get_async_redis().ping()
+    log.info("connected to Redis")
+    metrics.add_collector(bus.collect_metrics)
+
+    # Writes spilled while MongoDB was unreachable during the last run
+    if os.path.exists(settings.write_behind_spill_path or ""):
+        from tools.write_behind import get_write_sink
+        await get_write_sink().recover_spill()
+
+    from tools.price_history import price_history
+    await price_history.ensure_indexes()
+    from tools.inventory_reservations import inventory_reservations
+    await inventory_reservations.ensure_indexes()
+
+    if subscribe_events:
+        from tools.catalog_tools import subscribe_catalog_events
+        subscribe_catalog_events(bus)
+        from agents.response_cache import get_agent_response_cache
+        get_agent_response_cache().subscribe(bus)
+        from tools.customer_context import get_customer_context_store
+        get_customer_context_store().subscribe(bus)
+
+    if compact_streams:
+        from agents.events.retention import StreamCompactor
+        _compactor = asyncio.create_task(StreamCompactor(bus.get_async_redis()).run())
+
+    if detect_abandoned_carts:
+        from agents.events.abandonment import CartAbandonmentDetector
+        # Reads cart events through its own consumer group, in one process only
+        _abandonment = asyncio.create_task(CartAbandonmentDetector().serve())
+
+    if expire_reservations:
+        _reservations = asyncio.create_task(inventory_reservations.run())
+
+    if serve_metrics:
+        _metrics_server = await metrics.serve_metrics(settings.metrics_host, settings.metrics_port)
+        log.info("serving metrics", host=settings.metrics_host, port=settings.metrics_port)
+
+    _started = True
+
+
+async def shutdown():
+    """Close every connection that was opened, in reverse dependency order"""
+    global _started, _compactor, _abandonment, _reservations, _metrics_server
+    if _metrics_server is not None:
+        await _metrics_server.close()
+        _metrics_server = None
+
+    for task in (_compactor, _abandonment, _reservations):
+        if task is not None:
+            # The abandonment detector snapshots its carts as it stops
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+    _compactor = _abandonment = _reservations = None
+
+    # Queued writes go out before the database connection closes
+    sink_module = sys.modules.get("tools.write_behind")
+    sink = sink_module.write_sink.reset() if sink_module else None
+    if sink is not None:
+        await sink.close()
+
+    bus = event_bus.reset()
+    if bus is not None:
+        metrics.registry.remove_collector(bus.collect_metrics)
+        bus.stop()
+        await bus.close_async()
+        bus.close()
+
+    # Only close the API client if something imported and used it
+    api_module = sys.modules.get("tools.api_client")
+    client = api_module.api_client.reset() if api_module else None
+    if client is not None:
+        await client.close()
+
+    database = db.reset()
+    if database is not None:
+        await database.close_async()
+        database.close()
+
+    _started = False
+    log.info("shut down connections")
+    shutdown_logging()
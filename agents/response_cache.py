@@ -0,0 +1,285 @@
+"""
+Response cache in front of agent invocations
+
+Agent calls are the slowest and most expensive step of an AGENT_QUERY, and
+many customers ask nearly the same thing. get_or_call() answers from cache
+when it can:
+
+1. exact:    the normalised query (NFKC, lowercase, word tokens) for the same
+             model and scope was answered at the current catalog version
+2. near:     a cached query has exactly the same content words (ignoring
+             stopwords and plurals, so numbers must match too) and shares
+             enough character trigrams (Jaccard >= agent_cache_similarity).
+             "show me the shoes under 1000" answers "shoes under 1000", but
+             "shoes under 2000", "womens shoes" for "mens shoes" and "blue
+             skirt" for "blue shirt" never match
+3. in-flight: an identical query is already running; wait for its answer
+             instead of calling the agent again
+
+Otherwise the agent is called once and the answer stored with how long it
+took. The cache is versioned by catalog state: every PRICE_CHANGED,
+PRODUCT_UPDATED and PROMOTION_* event bumps the version, entries are only
+served at the version they were stored at, and calls that started before a
+bump don't store their answers. Bumping is O(1), so a repricing run that
+publishes one event per product costs little; the entries themselves are
+cleared at most every agent_cache_clear_interval_s. Like the catalog caches,
+invalidation is per process; agent_cache_ttl_s bounds staleness in processes
+that didn't see the event.
+
+Hit ratio, agent time saved and size are exported as agent_cache_* gauges.
+
+scope separates answers that depend on who asked (pass the user id for
+questions about "my cart"); None shares answers between everyone.
+"""
+
+import heapq
+import math
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Hashable, Optional, Set, Tuple
+from config.settings import settings
+from core.lazy import LazySingleton
+from core.metrics import add_collector, gauge
+from core.singleflight import SingleFlight
+from tools.cache import AsyncTTLCache, _MISSING
+from tools.search_index import tokenize
+
+Key = Tuple[Optional[str], Optional[str], str]  # (model, scope, normalised query)
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form used for exact matching"""
+    return " ".join(tokenize(unicodedata.normalize("NFKC", query)))
+
+
+def trigrams(normalized: str) -> FrozenSet[str]:
+    padded = f"  {normalized} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+# Words that don't change what a shopping query asks for. Comparisons
+# ("under", "over") and qualifiers ("not", "without") are deliberately kept.
+STOPWORDS = frozenset({
+    "a", "an", "the", "me", "my", "i", "you", "your", "we", "us", "show", "find", "get", "give",
+    "list", "see", "want", "need", "looking", "please", "some", "any", "for", "of", "to", "in",
+    "on", "is", "are", "do", "does", "there", "have", "has", "what", "which", "can", "could",
+    "and", "that", "this", "these", "those",
+})
+
+
+def singular(token: str) -> str:
+    """Crude English singular: shoes -> shoe, dresses -> dress, batteries -> battery"""
+    if len(token) <= 3 or token.endswith("ss") or token[-1] != "s" or token[0].isdigit():
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith(("sses", "shes", "ches", "xes", "zes")):
+        return token[:-2]
+    return token[:-1]
+
+
+def terms(normalized: str) -> FrozenSet[str]:
+    """Content words of a query; near-duplicates must have exactly the same set"""
+    return frozenset(singular(token) for token in normalized.split() if token not in STOPWORDS)
+
+
+def _partition(key: Key) -> Tuple:
+    return key[0], key[1], terms(key[2])
+
+
+class AgentResponseCache:
+    """Exact and near-duplicate response cache with single-flight agent calls"""
+
+    def __init__(self, ttl_s: float = None, maxsize: int = None, similarity: float = None):
+        self.similarity = settings.agent_cache_similarity if similarity is None else similarity
+        self.entries = AsyncTTLCache("agent_responses", ttl=ttl_s or (lambda: settings.agent_cache_ttl_s),
+                                     maxsize=maxsize or settings.agent_cache_max_entries)
+        # (model, scope, terms) -> trigram -> keys of cached queries containing it;
+        # near-duplicates are only looked for within the same partition
+        self.postings: Dict[Tuple, Dict[str, Set[Key]]] = defaultdict(lambda: defaultdict(set))
+        self.shingles: Dict[Key, FrozenSet[str]] = {}
+        self._flight = SingleFlight()
+        self.version = 0
+        self._cleared_at = float("-inf")
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        self.catalog_changes = 0
+        self.saved_seconds = 0.0
+        self.call_seconds = 0.0
+
+    # Lookup
+
+    def lookup(self, query: str, model: Optional[str] = None, scope: Optional[Hashable] = None) -> Any:
+        """Cached response for a query (exact, then near-duplicate) or _MISSING"""
+        key = (model, scope, normalize_query(query))
+        entry = self.entries.get(key)
+        if entry is not _MISSING and entry[2] == self.version:
+            self.hits += 1
+            self.saved_seconds += entry[1]
+            return entry[0]
+        entry = self._nearest(key)
+        if entry is not _MISSING:
+            self.near_hits += 1
+            self.saved_seconds += entry[1]
+            return entry[0]
+        return _MISSING
+
+    def _nearest(self, key: Key) -> Any:
+        shingles = trigrams(key[2])
+        if not shingles or self.similarity > 1:
+            return _MISSING
+        # Prefix filter: a query at Jaccard >= t shares at least t*|A| of
+        # A's trigrams, so it must contain one of any |A| - ceil(t*|A|) + 1
+        # of them. Probing only the rarest keeps the candidate set small.
+        probes = len(shingles) - math.ceil(self.similarity * len(shingles)) + 1
+        postings = self.postings.get(_partition(key))
+        if not postings:
+            return _MISSING
+        rarest = heapq.nsmallest(probes, shingles, key=lambda shingle: len(postings.get(shingle, ())))
+        candidates = set()
+        for shingle in rarest:
+            candidates.update(postings.get(shingle, ()))
+        best, best_score = None, self.similarity
+        for candidate in candidates:
+            if candidate == key:
+                continue  # Its exact entry was already found stale
+            other = self.shingles[candidate]
+            overlap = len(shingles & other)
+            score = overlap / (len(shingles) + len(other) - overlap)
+            if score >= best_score:
+                best, best_score = candidate, score
+        if best is None:
+            return _MISSING
+        entry = self.entries.get(best)
+        if entry is _MISSING:
+            self._forget(best)  # Expired or evicted since it was indexed
+        elif entry[2] != self.version:
+            return _MISSING  # Stored before a catalog change; replaced on the next miss
+        return entry
+
+    # Calling
+
+    async def get_or_call(self, query: str, call: Callable[[], Awaitable[Any]],
+                          model: Optional[str] = None, scope: Optional[Hashable] = None) -> Any:
+        """Cached response, a concurrent identical call's response, or call()'s"""
+        response = self.lookup(query, model, scope)
+        if response is not _MISSING:
+            return response
+
+        key = (model, scope, normalize_query(query))
+        if key in self._flight:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+
+        async def answer():
+            version = self.version
+            start = time.perf_counter()
+            response = await call()
+            elapsed = time.perf_counter() - start
+            self.call_seconds += elapsed
+            if version == self.version:
+                self._store(key, response, elapsed)
+            return response
+
+        return await self._flight.do(key, answer)
+
+    def _store(self, key: Key, response: Any, elapsed: float):
+        self.entries.set(key, (response, elapsed, self.version))
+        if key not in self.shingles:
+            self.shingles[key] = trigrams(key[2])
+            postings = self.postings[_partition(key)]
+            for shingle in self.shingles[key]:
+                postings[shingle].add(key)
+        # Evicted entries leave postings behind; prune once they dominate
+        if len(self.shingles) > 2 * self.entries.maxsize:
+            for stale in [k for k in self.shingles if self.entries.get(k) is _MISSING]:
+                self._forget(stale)
+
+    def _forget(self, key: Key):
+        partition = _partition(key)
+        postings = self.postings.get(partition, {})
+        for shingle in self.shingles.pop(key, ()):
+            keys = postings.get(shingle)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del postings[shingle]
+        if not postings:
+            self.postings.pop(partition, None)
+
+    # Invalidation
+
+    def invalidate(self):
+        """Start a new version with no entries"""
+        self.version += 1
+        self.invalidations += 1
+        self._cleared_at = time.monotonic()
+        self.entries.clear()
+        self.postings.clear()
+        self.shingles.clear()
+
+    def catalog_changed(self):
+        """Catalog or prices changed: bump the version, clearing at most every agent_cache_clear_interval_s.
+
+        Entries stored before the bump are never served again either way;
+        clearing only frees them, so a burst of changes clears once.
+        """
+        self.catalog_changes += 1
+        if time.monotonic() - self._cleared_at >= settings.agent_cache_clear_interval_s:
+            self.invalidate()
+        else:
+            self.version += 1
+
+    async def handle_catalog_changed(self, data: Dict):
+        """Event bus handler for price, product and promotion changes"""
+        self.catalog_changed()
+
+    def subscribe(self, bus):
+        """Drop cached answers whenever prices, products or promotions change"""
+        from agents.events.event_types import EventType
+        for event_type in (EventType.PRICE_CHANGED, EventType.PRODUCT_UPDATED,
+                           EventType.PROMOTION_CREATED, EventType.PROMOTION_EXPIRED):
+            bus.subscribe(event_type, self.handle_catalog_changed)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit ratio (coalesced calls count as answered), agent time saved by hits, size"""
+        lookups = self.hits + self.near_hits + self.misses + self.coalesced
+        answered = self.hits + self.near_hits + self.coalesced
+        return {
+            "lookups": lookups,
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_ratio": answered / lookups if lookups else 0.0,
+            "latency_saved_ms": round(self.saved_seconds * 1000, 1),
+            "avg_call_ms": round(self.call_seconds / self.misses * 1000, 1) if self.misses else 0.0,
+            "size": self.entries.stats()["size"],
+            "version": self.version,
+            "invalidations": self.invalidations,
+            "catalog_changes": self.catalog_changes,
+        }
+
+
+def get_agent_response_cache() -> AgentResponseCache:
+    """The process-wide agent response cache, created on first use"""
+    return agent_response_cache.get()
+
+
+def _collect_response_cache_metrics():
+    """Export stats() as agent_cache_<stat> gauges once the cache exists"""
+    if not agent_response_cache.initialized:
+        return
+    for stat, value in agent_response_cache.stats().items():
+        gauge(f"agent_cache_{stat}", f"Agent response cache {stat.replace('_', ' ')}").labels().set(value)
+
+
+# Global agent response cache (created lazily)
+agent_response_cache: AgentResponseCache = LazySingleton(AgentResponseCache)
+
+add_collector(_collect_response_cache_metrics)
@@ -0,0 +1,284 @@
+"""
+Scheduler for agent and sub-agent calls
+
+Every model invocation goes through AgentScheduler.run(), which admits it
+against the limits of that model's pool:
+
+- concurrency: at most N calls in flight per model
+- tokens:      a token bucket refilled at tokens_per_minute, holding up to
+               agent_token_burst_s worth. Each call reserves its estimated
+               tokens (prompt + max_tokens); once the real usage is known the
+               difference is refunded or charged.
+- priority:    CHECKOUT before SUPPORT before BROWSING before BACKGROUND.
+               Within a class, waiting users are served round-robin, so one
+               user's burst can't starve everyone else.
+
+Latency stays bounded by shedding instead of queueing forever: a call is
+shed when the queue at or ahead of its priority is deeper than that class's
+agent_queue_max_depth, or when it has waited agent_queue_timeout_ms. A shed
+call runs its fallback (a cached answer, a cheaper model, a canned reply) if
+one was given, and otherwise raises AgentOverloadedError. Checkout's limits
+are set high enough that in practice only browsing and background work is
+shed.
+
+Compose with the response cache so cache hits never take a slot:
+
+    await get_agent_response_cache().get_or_call(
+        query, lambda: get_agent_scheduler().run(model, call, user_id=user_id))
+"""
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+from config.settings import settings
+from core.lazy import LazySingleton
+
+CHARS_PER_TOKEN = 4
+
+
+class Priority(IntEnum):
+    CHECKOUT = 0
+    SUPPORT = 1
+    BROWSING = 2
+    BACKGROUND = 3
+
+    @property
+    def label(self) -> str:
+        return self.name.lower()
+
+
+def estimate_tokens(prompt: str, max_tokens: int = None) -> int:
+    """Rough reservation for a call: prompt tokens plus the completion budget"""
+    return len(prompt) // CHARS_PER_TOKEN + (max_tokens or settings.agent_max_tokens)
+
+
+class _Waiter:
+    __slots__ = ("future", "user_id", "priority", "tokens", "enqueued")
+
+    def __init__(self, future: asyncio.Future, user_id: str, priority: Priority, tokens: float):
+        self.future = future
+        self.user_id = user_id
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+
+
+class _ModelPool:
+    """Concurrency slots, token bucket and fair priority queues for one model"""
+
+    def __init__(self, model: str, concurrency: int, tokens_per_minute: int, burst_s: float):
+        self.model = model
+        self.concurrency = concurrency
+        self.rate = tokens_per_minute / 60.0
+        self.capacity = max(self.rate * burst_s, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        # Per priority: user -> their waiters, users in round-robin order
+        self.queues: List["OrderedDict[str, Deque[_Waiter]]"] = [OrderedDict() for _ in Priority]
+        self.depth = [0] * len(Priority)
+        self.in_flight = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.admitted = [0] * len(Priority)
+        self.shed = [0] * len(Priority)
+        self.completed = 0
+        self.failed = 0
+        self.tokens_used = 0.0
+        self.waits: List[Deque[float]] = [deque(maxlen=512) for _ in Priority]
+
+    def ahead_of(self, priority: Priority) -> int:
+        """Waiters that would be admitted before a new one at this priority"""
+        return sum(self.depth[:priority + 1])
+
+    def enqueue(self, waiter: _Waiter):
+        queue = self.queues[waiter.priority]
+        waiters = queue.get(waiter.user_id)
+        if waiters is None:
+            waiters = queue[waiter.user_id] = deque()
+        waiters.append(waiter)
+        self.depth[waiter.priority] += 1
+        self.dispatch()
+
+    def discard(self, waiter: _Waiter):
+        """Remove a waiter that gave up (timed out or cancelled)"""
+        queue = self.queues[waiter.priority]
+        waiters = queue.get(waiter.user_id)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            self.depth[waiter.priority] -= 1
+            if not waiters:
+                del queue[waiter.user_id]
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _head(self) -> Optional[_Waiter]:
+        for queue in self.queues:
+            if queue:
+                return next(iter(queue.values()))[0]
+        return None
+
+    def _pop(self, waiter: _Waiter):
+        queue = self.queues[waiter.priority]
+        waiters = queue[waiter.user_id]
+        waiters.popleft()
+        self.depth[waiter.priority] -= 1
+        if waiters:
+            queue.move_to_end(waiter.user_id)  # Next user's turn
+        else:
+            del queue[waiter.user_id]
+
+    def dispatch(self):
+        """Admit waiters while slots and tokens allow"""
+        now = time.monotonic()
+        self._refill(now)
+        while self.in_flight < self.concurrency:
+            waiter = self._head()
+            if waiter is None:
+                return
+            need = min(waiter.tokens, self.capacity)
+            if self.tokens < need:
+                self._wake_in((need - self.tokens) / self.rate)
+                return
+            self._pop(waiter)
+            self.tokens -= need
+            self.in_flight += 1
+            self.admitted[waiter.priority] += 1
+            self.waits[waiter.priority].append(now - waiter.enqueued)
+            waiter.future.set_result(need)
+
+    def _wake_in(self, delay: float):
+        if self._timer is None:
+            def wake():
+                self._timer = None
+                self.dispatch()
+            self._timer = asyncio.get_running_loop().call_later(delay, wake)
+
+    def release(self, reserved: float, used: Optional[float], failed: bool):
+        """A call finished: free its slot and settle its token reservation"""
+        self.in_flight -= 1
+        if failed:
+            self.failed += 1
+        else:
+            self.completed += 1
+        if used is not None:
+            # Over-estimates are refunded; under-estimates leave the bucket in debt
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + reserved - used)
+        self.tokens_used += reserved if used is None else used
+        self.dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        classes = {}
+        for priority in Priority:
+            waits = sorted(self.waits[priority])
+            classes[priority.label] = {
+                "queued": self.depth[priority],
+                "admitted": self.admitted[priority],
+                "shed": self.shed[priority],
+                "wait_p50_ms": round(waits[len(waits) // 2] * 1000, 1) if waits else 0.0,
+                "wait_p99_ms": round(waits[int(len(waits) * 0.99)] * 1000, 1) if waits else 0.0,
+            }
+        return {
+            "in_flight": self.in_flight,
+            "concurrency": self.concurrency,
+            "tokens_available": round(self.tokens),
+            "tokens_used": round(self.tokens_used),
+            "completed": self.completed,
+            "failed": self.failed,
+            "priorities": classes,
+        }
+
+
+class AgentScheduler:
+    """Per-model admission control for agent calls"""
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None,
+                 queue_timeout_ms: Optional[Dict[str, int]] = None,
+                 queue_max_depth: Optional[Dict[str, int]] = None):
+        self.limits = settings.agent_model_limits if limits is None else limits
+        self.queue_timeout_ms = queue_timeout_ms or settings.agent_queue_timeout_ms
+        self.queue_max_depth = queue_max_depth or settings.agent_queue_max_depth
+        self.pools: Dict[str, _ModelPool] = {}
+        # Imported now rather than on the first shed: importing agentica takes
+        # seconds and would stall the event loop in the middle of a spike
+        from core.exceptions import AgentOverloadedError
+        self._overloaded = AgentOverloadedError
+
+    def pool(self, model: str) -> _ModelPool:
+        pool = self.pools.get(model)
+        if pool is None:
+            limits = self.limits.get(model, {})
+            pool = self.pools[model] = _ModelPool(
+                model,
+                int(limits.get("concurrency", settings.agent_concurrency)),
+                int(limits.get("tokens_per_minute", settings.agent_tokens_per_minute)),
+                float(limits.get("burst_s", settings.agent_token_burst_s)),
+            )
+        return pool
+
+    async def run(self, model: Optional[str], call: Callable[[], Awaitable[Any]], user_id: str = "",
+                  priority: Priority = Priority.BROWSING, estimated_tokens: Optional[int] = None,
+                  fallback: Optional[Callable[[], Awaitable[Any]]] = None,
+                  tokens_used: Optional[Callable[[Any], Optional[int]]] = None) -> Any:
+        """Run call() once the model's pool admits it, or shed it.
+
+        tokens_used maps the call's result to the real token count, so the
+        reservation can be settled.
+        """
+        pool = self.pool(model or settings.default_agent_model)
+        priority = Priority(priority)
+        if pool.ahead_of(priority) >= self.queue_max_depth.get(priority.label, 1000):
+            return await self._shed(pool, priority, fallback, "queue full")
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), user_id or "", priority,
+                         estimated_tokens or settings.agent_max_tokens)
+        pool.enqueue(waiter)
+        timeout = self.queue_timeout_ms.get(priority.label, 30000) / 1000
+        try:
+            reserved = await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                pool.discard(waiter)
+                waiter.future.cancel()
+                return await self._shed(pool, priority, fallback, "queue timeout")
+            reserved = waiter.future.result()  # Admitted as the timeout fired
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                pool.release(waiter.future.result(), 0, failed=True)
+            else:
+                pool.discard(waiter)
+                waiter.future.cancel()
+            raise
+
+        failed, used = True, None
+        try:
+            result = await call()
+            failed = False
+            if tokens_used is not None:
+                used = tokens_used(result)
+            return result
+        finally:
+            pool.release(reserved, used, failed)
+
+    async def _shed(self, pool: _ModelPool, priority: Priority,
+                    fallback: Optional[Callable[[], Awaitable[Any]]], reason: str) -> Any:
+        pool.shed[priority] += 1
+        if fallback is not None:
+            return await fallback()
+        raise self._overloaded(f"{pool.model} is overloaded ({reason}) for {priority.label} work")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth, wait times, shed counts and token usage per model"""
+        return {model: pool.stats() for model, pool in self.pools.items()}
+
+
+def get_agent_scheduler() -> AgentScheduler:
+    """The process-wide agent scheduler, created on first use"""
+    return agent_scheduler.get()
+
+
+# Global agent scheduler (created lazily)
+agent_scheduler: AgentScheduler = LazySingleton(AgentScheduler)
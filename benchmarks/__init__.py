@@ -0,0 +1,2 @@
+# Performance benchmarks
+# Run with: uv run python -m benchmarks.<name>
@@ -0,0 +1,134 @@
+"""
+Benchmark: a traffic spike against a rate-limited model, with and without the scheduler
+
+A stub provider allows PROVIDER_CONCURRENCY calls at once and answers
+anything beyond that with a rate-limit error; clients retry with backoff.
+A spike of SPIKE requests (10% checkout, 60% browsing, 30% background) from
+many users arrives at once.
+
+- unscheduled: every request calls the provider immediately and retries
+- scheduled:   requests go through AgentScheduler with the same concurrency;
+               background work falls back to a canned answer when shed
+
+Reports provider calls and rate-limit errors, per-class latency and shed
+counts. No database, Redis or model needed.
+
+    uv run python -m benchmarks.agent_scheduler
+"""
+
+import asyncio
+import random
+import time
+from collections import defaultdict
+from agents.scheduler import AgentScheduler, Priority
+from benchmarks.common import percentile
+
+SPIKE = 1_000
+PROVIDER_CONCURRENCY = 20
+CALL_MS = 50
+MODEL = "stub:model"
+MIX = [(Priority.CHECKOUT, 0.1), (Priority.BROWSING, 0.6), (Priority.BACKGROUND, 0.3)]
+
+
+class RateLimited(Exception):
+    pass
+
+
+class StubProvider:
+    def __init__(self):
+        self.active = 0
+        self.calls = 0
+        self.rate_limited = 0
+
+    async def complete(self):
+        self.calls += 1
+        if self.active >= PROVIDER_CONCURRENCY:
+            self.rate_limited += 1
+            raise RateLimited()
+        self.active += 1
+        try:
+            await asyncio.sleep(CALL_MS / 1000)
+            return "answer"
+        finally:
+            self.active -= 1
+
+
+async def with_retries(provider: StubProvider, retries: int = 5):
+    for attempt in range(retries + 1):
+        try:
+            return await provider.complete()
+        except RateLimited:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+
+
+def make_requests():
+    priorities, weights = zip(*MIX)
+    return [(random.choices(priorities, weights)[0], f"user-{random.randrange(300)}") for _ in range(SPIKE)]
+
+
+def report(label: str, provider: StubProvider, latencies, failures, shed=None):
+    print(f"\n{label}: {provider.calls:,} provider calls, {provider.rate_limited:,} rate-limited")
+    for priority, _ in MIX:
+        samples = latencies[priority]
+        extra = f"  shed {shed[priority]:>4}" if shed is not None else ""
+        print(f"  {priority.label:<11} ok {len(samples):>4}  failed {failures[priority]:>4}{extra}  "
+              f"p50 {percentile(samples, 50) * 1000:>7.0f} ms  p99 {percentile(samples, 99) * 1000:>7.0f} ms")
+
+
+async def unscheduled(requests):
+    provider = StubProvider()
+    latencies, failures = defaultdict(list), defaultdict(int)
+
+    async def one(priority, _user):
+        start = time.perf_counter()
+        try:
+            await with_retries(provider)
+            latencies[priority].append(time.perf_counter() - start)
+        except RateLimited:
+            failures[priority] += 1
+
+    await asyncio.gather(*(one(*request) for request in requests))
+    report("unscheduled", provider, latencies, failures)
+
+
+async def scheduled(requests):
+    provider = StubProvider()
+    scheduler = AgentScheduler(
+        limits={MODEL: {"concurrency": PROVIDER_CONCURRENCY, "tokens_per_minute": 10_000_000}},
+        queue_timeout_ms={"checkout": 30000, "browsing": 2000, "background": 500},
+        queue_max_depth={"checkout": 1000, "browsing": 400, "background": 50})
+    latencies, failures = defaultdict(list), defaultdict(int)
+
+    async def canned():
+        return "try again shortly"
+
+    async def one(priority, user):
+        start = time.perf_counter()
+        try:
+            result = await scheduler.run(MODEL, lambda: with_retries(provider), user_id=user,
+                                         priority=priority, estimated_tokens=1000,
+                                         fallback=canned if priority == Priority.BACKGROUND else None)
+            if result != "try again shortly":
+                latencies[priority].append(time.perf_counter() - start)
+        except Exception:
+            failures[priority] += 1
+
+    await asyncio.gather(*(one(*request) for request in requests))
+    pool = scheduler.pools[MODEL]
+    report("scheduled", provider, latencies, failures, pool.shed)
+
+
+async def main():
+    random.seed(22)
+    requests = make_requests()
+    print("=" * 72)
+    print(f"spike of {SPIKE:,} agent calls, provider allows {PROVIDER_CONCURRENCY} concurrent, {CALL_MS} ms each")
+    print("=" * 72)
+    await unscheduled(requests)
+    await scheduled(requests)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
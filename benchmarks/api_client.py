@@ -0,0 +1,146 @@
+"""
+Benchmark: NodeJSClient against a local stub of the Express API
+
+Starts a threaded HTTP/1.1 stub server with per-request latency and checks
+what the client sends it:
+
+- identical concurrent GETs are coalesced into one request
+- GETs are retried through 503s and succeed
+- connections are kept alive and reused (within nodejs_api_max_keepalive)
+- get_products_bulk fans out with bounded concurrency
+
+    uv run python -m benchmarks.api_client
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+from tools.api_client import NodeJSClient
+
+LATENCY = 0.02
+PRODUCTS = 200
+
+
+class StubState:
+    def __init__(self):
+        self.hits = Counter()
+        self.connections = set()
+        self.fail_next = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+    disable_nagle_algorithm = True
+    state: StubState
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        with self.state.lock:
+            self.state.hits[path] += 1
+            self.state.connections.add(self.client_address)
+            failing = self.state.fail_next > 0
+            self.state.fail_next -= failing
+            self.state.in_flight += 1
+            self.state.peak_in_flight = max(self.state.peak_in_flight, self.state.in_flight)
+        time.sleep(LATENCY)
+        with self.state.lock:
+            self.state.in_flight -= 1
+        if failing:
+            return self._reply(503, {"error": "unavailable"})
+        if path.startswith("/products/missing"):
+            return self._reply(404, {"error": "not found"})
+        if path.startswith("/products/"):
+            product_id = path.rsplit("/", 1)[1]
+            return self._reply(200, {"product": {"_id": product_id, "price": 10}})
+        if path in ("/search", "/products"):
+            return self._reply(200, {"products": [{"_id": "p1"}]})
+        self._reply(404, {"error": "not found"})
+
+
+def start_stub() -> tuple:
+    state = StubState()
+    handler = type("Handler", (StubHandler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return f"http://{host}:{port}", state, server
+
+
+def check(label: str, ok: bool, detail: str):
+    print(f"{'✅' if ok else '❌'} {label:<34} {detail}")
+    return ok
+
+
+async def main():
+    url, state, server = start_stub()
+    client = NodeJSClient(base_url=url)
+    results = []
+
+    print("=" * 60)
+    print(f"NodeJSClient against a stub API ({LATENCY * 1000:.0f} ms per request)")
+    print("=" * 60)
+
+    # Coalescing: 100 agents ask for the same product and search at once
+    await asyncio.gather(*(client.get_product("p1") for _ in range(100)),
+                         *(client.search_products("shirt") for _ in range(100)))
+    sent = state.hits["/products/p1"] + state.hits["/search"]
+    results.append(check("coalescing (200 calls)", sent == 2, f"{sent} requests sent"))
+
+    # Retries: two 503s, then success
+    state.fail_next = 2
+    product = await client.get_product("p2")
+    results.append(check("retry through 503s", product.get("_id") == "p2",
+                         f"{state.hits['/products/p2']} attempts, {client.retried} retries"))
+
+    # Bulk fetch: sequential vs bounded fan-out
+    import core.exceptions  # noqa: F401 - keep the one-off agentica import out of the timings
+    ids = [f"b{i}" for i in range(PRODUCTS)] + ["missing-1"]
+    start = time.perf_counter()
+    for product_id in ids[:20]:
+        await client.get_product(product_id)
+    sequential = (time.perf_counter() - start) / 20 * len(ids)
+
+    for concurrency in (10, 50):
+        state.hits.clear()
+        state.connections.clear()
+        requests = client.requests
+        start = time.perf_counter()
+        products = await client.get_products_bulk(ids, concurrency=concurrency)
+        elapsed = time.perf_counter() - start
+        results.append(check(f"bulk fetch (concurrency={concurrency})", len(products) == PRODUCTS,
+                             f"{elapsed * 1000:,.0f} ms vs ~{sequential * 1000:,.0f} ms sequential, "
+                             f"{len(state.connections)} connections for {client.requests - requests} requests"))
+
+    # Within the keep-alive limit every request reuses a pooled connection
+    state.connections.clear()
+    await client.get_products_bulk(ids, concurrency=10)
+    results.append(check("keep-alive (concurrency=10)", len(state.connections) <= 10,
+                         f"{len(state.connections)} connections"))
+
+    await client.close()
+    server.shutdown()
+    if not all(results):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
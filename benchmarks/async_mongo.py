@@ -0,0 +1,58 @@
+"""
+Benchmark: event-loop lag and tool latency for the MongoDB data layer
+
+Compares the old blocking pattern (sync pymongo inside a coroutine) with the
+native async driver and the thread-pool fallback at 1, 50 and 500 concurrent
+callers. Requires a running MongoDB with the fashion-cube catalog loaded.
+
+    uv run python -m benchmarks.async_mongo
+"""
+
+import asyncio
+from config.mongodb import MongoDB, db
+from tools.catalog_tools import get_product_by_id
+from benchmarks.common import LoopLagMonitor, run_concurrent, summarize, print_row
+
+CONCURRENCY = [1, 50, 500]
+CALLS_PER_CALLER = 20
+
+
+async def blocking_get_product(product_id: str):
+    """The pre-async pattern: a sync driver call inside a coroutine"""
+    return db.products.find_one({"_id": product_id})
+
+
+async def bench_mode(label: str, fn):
+    for callers in CONCURRENCY:
+        with LoopLagMonitor() as lag:
+            latencies = await run_concurrent(fn, callers, CALLS_PER_CALLER)
+        row = summarize(latencies)
+        row["lag_p99_ms"] = summarize(lag.samples)["p99_ms"]
+        print_row(f"{label} x{callers}", row)
+
+
+async def main():
+    sample = db.products.find_one({}, {"_id": 1})
+    if not sample:
+        print("❌ No products found - load the catalog first")
+        return
+    product_id = str(sample["_id"])
+
+    print("=" * 60)
+    print("MongoDB data layer: latency and event-loop lag")
+    print("=" * 60)
+
+    await bench_mode("blocking", lambda: blocking_get_product(sample["_id"]))
+
+    default_view = db.aio
+    for mode in ("native", "threads"):
+        instance = MongoDB(async_mode=mode)
+        db.aio = instance.aio
+        await bench_mode(mode, lambda: get_product_by_id(product_id))
+        await instance.close_async()
+        instance.close()
+    db.aio = default_view
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
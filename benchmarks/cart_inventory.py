@@ -0,0 +1,68 @@
+"""
+Benchmark: batched cart inventory validation vs the per-item loop
+
+Builds synthetic carts of 1, 10 and 30 line items from real product ids and
+times one projected $in query against one find_one per item. Requires a
+running MongoDB with the fashion-cube catalog loaded.
+
+    uv run python -m benchmarks.cart_inventory
+"""
+
+import asyncio
+import time
+from bson import ObjectId
+from config.mongodb import db
+from tools.cart_tools import validate_cart_inventory, validate_carts_inventory
+from benchmarks.common import summarize, print_row
+
+CART_SIZES = [1, 10, 30]
+ROUNDS = 50
+
+
+async def per_item_validate(cart):
+    """The previous implementation: one round trip per line item"""
+    results = {"valid": True, "out_of_stock": []}
+    for item_id, cart_item in cart.get("items", {}).items():
+        product = await db.aio.products.find_one({"_id": ObjectId(item_id)})
+        if not product or product.get("quantity", 0) < cart_item.get("qty", 0):
+            results["valid"] = False
+            results["out_of_stock"].append({
+                "product_id": item_id,
+                "requested": cart_item.get("qty", 0),
+                "available": product.get("quantity", 0) if product else 0
+            })
+    return results
+
+
+async def timed(fn, rounds: int):
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def main():
+    docs = await db.aio.products.find({}, {"_id": 1}).limit(max(CART_SIZES) * 10).to_list()
+    ids = [str(doc["_id"]) for doc in docs]
+    if len(ids) < max(CART_SIZES):
+        print("❌ Not enough products - load the catalog first")
+        return
+
+    print("=" * 60)
+    print("Cart inventory validation")
+    print("=" * 60)
+
+    for size in CART_SIZES:
+        cart = {"items": {pid: {"qty": 1} for pid in ids[:size]}}
+        assert await per_item_validate(cart) == await validate_cart_inventory(cart)
+        print_row(f"per-item  {size:>2} items", summarize(await timed(lambda: per_item_validate(cart), ROUNDS)))
+        print_row(f"batched   {size:>2} items", summarize(await timed(lambda: validate_cart_inventory(cart), ROUNDS)))
+
+    carts = [{"items": {pid: {"qty": 1} for pid in ids[i:i + 10]}} for i in range(0, len(ids) - 10, 10)]
+    print_row(f"multi-cart {len(carts)} carts", summarize(await timed(lambda: validate_carts_inventory(carts), 10)))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""
+Benchmark: in-memory product search index vs an unanchored regex scan
+
+Builds the index from a synthetic catalog (no database needed) and compares
+query latency with a Python-side regex scan over the same documents, which
+is the work MongoDB does for the old $regex/$or query.
+
+    uv run python -m benchmarks.catalog_search
+"""
+
+import random
+import re
+import time
+from bson import ObjectId
+from tools.search_index import ProductSearchIndex
+from benchmarks.common import summarize, print_row
+
+CATALOG_SIZES = [1_000, 50_000]
+QUERIES = ["shirt", "blue sh", "leather", "running shoes", "watch", "women dress red"]
+ROUNDS = 200
+
+WORDS = ["blue", "red", "green", "black", "cotton", "leather", "slim", "classic",
+         "running", "casual", "formal", "summer", "winter", "vintage", "sports"]
+ITEMS = ["shirt", "dress", "shoes", "bag", "watch", "jacket", "jeans", "cap", "scarf"]
+DEPARTMENTS = ["Men", "Women", "Shoes", "Accessories"]
+
+
+def synthetic_catalog(size: int):
+    rng = random.Random(42)
+    vocabulary = WORDS + ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(4, 9)))
+                          for _ in range(2000)]
+    for _ in range(size):
+        item = rng.choice(ITEMS)
+        yield {
+            "_id": ObjectId(),
+            "title": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {item}",
+            "description": " ".join(rng.choices(vocabulary, k=20)),
+            "category": item,
+            "department": rng.choice(DEPARTMENTS),
+            "price": rng.randint(199, 4999),
+        }
+
+
+def regex_scan(docs, query: str, limit: int):
+    pattern = re.compile(re.escape(query), re.IGNORECASE)
+    results = []
+    for doc in docs:
+        if any(pattern.search(doc[field]) for field in ("title", "description", "category", "department")):
+            results.append(doc)
+            if len(results) == limit:
+                break
+    return results
+
+
+def timed(fn, rounds: int):
+    latencies = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    print("=" * 60)
+    print("Catalog search: inverted index vs regex scan (latency in ms)")
+    print("=" * 60)
+
+    for size in CATALOG_SIZES:
+        docs = list(synthetic_catalog(size))
+        index = ProductSearchIndex()
+        start = time.perf_counter()
+        index.add_many(docs)
+        print(f"\n{size} products - index built in {time.perf_counter() - start:.2f}s")
+
+        for query in QUERIES:
+            print_row(f"index '{query}'", summarize(timed(lambda: index.search(query, 10), ROUNDS)))
+            print_row(f"regex '{query}'", summarize(timed(lambda: regex_scan(docs, query, 10), 20)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark: sequential vs concurrent checkout context assembly
+
+Times awaiting cart, inventory, tier and pricing one after another against
+get_checkout_context for users that have a cart, then shows the degraded
+result under a deadline too short to meet. Requires a running MongoDB with
+the fashion-cube data loaded.
+
+    uv run python -m benchmarks.checkout_context
+"""
+
+import asyncio
+import time
+from config.mongodb import db
+from tools.cart_tools import calculate_cart_total, get_user_cart_items, validate_cart_inventory
+from tools.checkout_tools import get_checkout_context
+from tools.user_tools import get_user_tier
+from benchmarks.common import summarize, print_row
+
+ROUNDS = 50
+
+
+async def sequential_context(user_id: str):
+    cart = await get_user_cart_items(user_id, view="items")
+    inventory = await validate_cart_inventory(cart)
+    tier = await get_user_tier(user_id)
+    total = await calculate_cart_total(cart, tier)
+    return cart, inventory, tier, total
+
+
+async def timed(fn, user_ids):
+    latencies = []
+    for i in range(ROUNDS):
+        start = time.perf_counter()
+        await fn(user_ids[i % len(user_ids)])
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def main():
+    carts = await db.aio.carts.find({}, {"userId": 1}).limit(20).to_list()
+    user_ids = [cart["userId"] for cart in carts if cart.get("userId")]
+    if not user_ids:
+        print("❌ No carts found - load the data first")
+        return
+
+    print("=" * 60)
+    print(f"Checkout context ({len(user_ids)} users, {ROUNDS} rounds)")
+    print("=" * 60)
+    print_row("sequential stages", summarize(await timed(sequential_context, user_ids)))
+    print_row("get_checkout_context", summarize(await timed(get_checkout_context, user_ids)))
+
+    context = await get_checkout_context(user_ids[0], deadline_ms=1)
+    print(f"deadline=1ms -> complete={context['complete']} degraded={context['degraded']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """p50/p99/max of latency samples, in milliseconds"""
+    return {
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": max(samples, default=0.0) * 1000,
+    }
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up a periodic ticker"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _tick(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+
+async def run_concurrent(fn: Callable[[], Awaitable], callers: int,
+                         calls_per_caller: int) -> List[float]:
+    """Run `callers` coroutines that each await `fn` repeatedly; return latencies"""
+    latencies: List[float] = []
+
+    async def caller():
+        for _ in range(calls_per_caller):
+            start = time.perf_counter()
+            await fn()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(caller() for _ in range(callers)))
+    return latencies
+
+
+def print_row(label: str, values: Dict[str, float]):
+    """Print one aligned result row"""
+    cells = "  ".join(f"{key}={value:10.2f}" for key, value in values.items())
+    print(f"{label:<32} {cells}")
@@ -0,0 +1,83 @@
+"""
+Benchmark: customer context per agent turn, assembled every turn vs the context store
+
+Simulates conversations of TURNS agent turns each. Without the store every
+turn reads profile, cart and orders (the reads stubbed with READ_MS of
+latency, run concurrently); with it only the first turn does, and cart and
+payment events between turns are applied as deltas. Also times delta
+application. No database or Redis needed.
+
+    uv run python -m benchmarks.customer_context
+"""
+
+import asyncio
+import random
+import time
+from tools.customer_context import CustomerContextStore
+from tools.user_tools import tier_for_spend
+from benchmarks.common import summarize, print_row
+
+CUSTOMERS = 500
+TURNS = 20
+READ_MS = 2
+DELTAS = 100_000
+
+
+class StubMongo:
+    def __init__(self):
+        self.reads = 0
+
+    async def assemble(self, customer_id: str):
+        self.reads += 3
+        await asyncio.sleep(READ_MS / 1000)
+        spent = random.uniform(0, 2000)
+        return {"customer_id": customer_id, "profile": {"_id": customer_id, "total_spent": spent},
+                "tier": tier_for_spend(spent), "cart": {"items": {}, "totalQty": 0, "totalPrice": 0},
+                "orders": [], "loaded_at": time.time()}
+
+
+async def conversations(get_context, store=None):
+    latencies = []
+
+    async def conversation(customer_id):
+        for _ in range(TURNS):
+            start = time.perf_counter()
+            await get_context(customer_id)
+            latencies.append(time.perf_counter() - start)
+            if store is not None and random.random() < 0.3:
+                await store.handle_cart_item_added({"user_id": customer_id, "product_id": "p1",
+                                                    "qty": 1, "price": 10.0})
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(conversation(f"customer-{i}") for i in range(CUSTOMERS)))
+    return latencies
+
+
+async def main():
+    random.seed(23)
+    print("=" * 64)
+    print(f"{CUSTOMERS} conversations x {TURNS} turns, {READ_MS} ms per MongoDB read")
+    print("=" * 64)
+
+    mongo = StubMongo()
+    latencies = await conversations(mongo.assemble)
+    print_row("assembled every turn", summarize(latencies))
+    print(f"    {mongo.reads:,} MongoDB reads")
+
+    mongo = StubMongo()
+    store = CustomerContextStore(loader=mongo.assemble, shared=False)
+    latencies = await conversations(store.get, store)
+    print_row("context store", summarize(latencies))
+    print(f"    {mongo.reads:,} MongoDB reads, {store.deltas:,} deltas applied")
+
+    events = [{"user_id": f"customer-{random.randrange(CUSTOMERS)}", "product_id": f"p{random.randrange(50)}",
+               "qty": 1, "price": 10.0} for _ in range(DELTAS)]
+    start = time.perf_counter()
+    for event in events:
+        await store.handle_cart_item_added(event)
+    elapsed = time.perf_counter() - start
+    print(f"cart deltas: {DELTAS / elapsed:,.0f}/s ({elapsed / DELTAS * 1e6:.1f} us each)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
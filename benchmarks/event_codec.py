@@ -0,0 +1,62 @@
+"""
+Benchmark: JSON vs schema-based msgpack event encoding
+
+Reports encode/decode throughput and the bytes each event adds to a stream
+entry (field names plus values) for high-volume event types. No Redis needed.
+
+    uv run python -m benchmarks.event_codec
+"""
+
+import time
+from agents.events import codec
+from agents.events.event_types import EventType
+
+EVENTS = 100_000
+SAMPLES = {
+    EventType.PRODUCT_VIEWED: {"user_id": "64f1c0a9b3e2d14a8c9e7f21", "product_id": "64f1c0a9b3e2d14a8c9e7f55"},
+    EventType.CART_ITEM_ADDED: {"user_id": "64f1c0a9b3e2d14a8c9e7f21", "product_id": "64f1c0a9b3e2d14a8c9e7f55",
+                                "qty": 2, "price": 1299.0},
+}
+
+
+def entry_bytes(fields) -> int:
+    total = 0
+    for key, value in fields.items():
+        if isinstance(value, str):
+            value = value.encode("utf-8", "surrogateescape")
+        elif not isinstance(value, bytes):
+            value = str(value).encode()
+        total += len(key) + len(value)
+    return total
+
+
+def main():
+    if codec.msgpack is None:
+        print("❌ msgpack is not installed - uv sync --extra msgpack")
+        return
+
+    print("=" * 60)
+    print(f"Event codecs ({EVENTS} events each)")
+    print("=" * 60)
+
+    for event_type, data in SAMPLES.items():
+        for binary in (False, True):
+            label = f"{event_type.value} {'msgpack' if binary else 'json'}"
+
+            start = time.perf_counter()
+            for _ in range(EVENTS):
+                fields = codec.encode_event(event_type, data, binary)
+            encode_rate = EVENTS / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for _ in range(EVENTS):
+                codec.decode_event(event_type.value, fields)
+            decode_rate = EVENTS / (time.perf_counter() - start)
+
+            assert codec.decode_event(event_type.value, fields) == data
+            print(f"{label:<28} encode {encode_rate:>10,.0f}/s  decode {decode_rate:>10,.0f}/s  "
+                  f"{entry_bytes(fields):>4} bytes/event")
+
+
+if __name__ == "__main__":
+    main()
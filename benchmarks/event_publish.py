@@ -0,0 +1,75 @@
+"""
+Benchmark: single vs pipelined event publishing (events/s)
+
+By default runs against an in-process fakeredis TCP server as a local Redis
+stand-in (pip install fakeredis); pass a URL to benchmark a real Redis. The
+stand-in executes commands in Python, so it understates what pipelining saves
+against a real server where network round trips dominate.
+
+    uv run python -m benchmarks.event_publish [redis://localhost:6379]
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from agents.events.bus import EventBus
+from agents.events.event_types import EventType
+from agents.events.publisher import BufferedPublisher
+
+EVENTS = 5000
+PAYLOAD = {"user_id": "5f1c0a9b", "product_id": "60a7f3", "qty": 2, "price": 1299}
+
+
+def start_stand_in() -> str:
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        sys.exit("❌ fakeredis is not installed - pip install fakeredis or pass a Redis URL")
+    server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return f"redis://{host}:{port}"
+
+
+def report(label: str, elapsed: float):
+    print(f"{label:<32} {EVENTS / elapsed:>12,.0f} events/s")
+
+
+async def bench_buffered(bus: EventBus):
+    publisher = BufferedPublisher(bus)
+    start = time.perf_counter()
+    futures = [await publisher.enqueue(EventType.PRODUCT_VIEWED, PAYLOAD) for _ in range(EVENTS)]
+    await publisher.close()
+    await asyncio.gather(*futures)
+    report("buffered publisher", time.perf_counter() - start)
+    await bus.close_async()
+
+
+def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else start_stand_in()
+    bus = EventBus(redis_url=url)
+
+    print("=" * 60)
+    print(f"Event publishing: {EVENTS} events against {url}")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    for _ in range(EVENTS):
+        bus.publish(EventType.PRODUCT_VIEWED, PAYLOAD)
+    single = time.perf_counter() - start
+    report("publish (one XADD per event)", single)
+
+    for batch in (10, 100, 1000):
+        start = time.perf_counter()
+        for _ in range(0, EVENTS, batch):
+            bus.publish_many([(EventType.PRODUCT_VIEWED, PAYLOAD)] * batch)
+        elapsed = time.perf_counter() - start
+        report(f"publish_many (batch={batch})", elapsed)
+
+    asyncio.run(bench_buffered(bus))
+    bus.close()
+
+
+if __name__ == "__main__":
+    main()
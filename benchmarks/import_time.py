@@ -0,0 +1,98 @@
+"""
+Benchmark: import-time budget for the platform packages
+
+Imports the tool and agent packages in a fresh interpreter under
+`python -X importtime` and fails if they take longer than the budget, or if
+importing them had side effects (settings loaded, connections created). The
+child runs without AGENTICA_API_KEY, which Settings() requires, so an eager
+settings load fails the check as well.
+
+    uv run python -m benchmarks.import_time [--budget-ms 500] [--runs 5]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+MODULES = [
+    "config",
+    "core",
+    "tools",
+    "tools.catalog_tools",
+    "tools.cart_tools",
+    "tools.user_tools",
+    "agents.events",
+    "agents.lifecycle",
+]
+
+# Run after the imports: nothing may have been created yet
+SIDE_EFFECT_CHECK = """
+import sys
+from config.settings import settings
+from config.mongodb import db
+from agents.events.bus import event_bus
+created = [name for name, lazy in (("settings", settings), ("db", db), ("event_bus", event_bus))
+           if lazy.initialized]
+for heavy in ("agentica", "httpx", "pymongo"):
+    if heavy in sys.modules:
+        created.append(heavy)
+if created:
+    sys.exit("created at import time: " + ", ".join(created))
+"""
+
+
+def import_times(code: str) -> Dict[str, int]:
+    """Cumulative microseconds of each top-level import in a fresh interpreter"""
+    env = {key: value for key, value in os.environ.items() if key != "AGENTICA_API_KEY"}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, env=env,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    times: Dict[str, int] = {}
+    errors: List[str] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            times[name.strip()] = int(cumulative)
+    if result.returncode != 0:
+        sys.exit("❌ Import failed:\n" + "\n".join(errors))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the import-time budget")
+    parser.add_argument("--budget-ms", type=float, default=500.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    code = "\n".join(f"import {module}" for module in MODULES) + "\n" + SIDE_EFFECT_CHECK
+    interpreter = import_times("pass")
+
+    best: Dict[str, int] = {}
+    best_total = None
+    for _ in range(args.runs):  # The first run also writes bytecode caches
+        times = import_times(code)
+        ours = {name: us for name, us in times.items() if name not in interpreter}
+        total = sum(ours.values())
+        if best_total is None or total < best_total:
+            best, best_total = ours, total
+
+    print("=" * 60)
+    print(f"Import time of {', '.join(MODULES)}")
+    print("=" * 60)
+    for name, us in sorted(best.items(), key=lambda item: -item[1])[:10]:
+        print(f"{name:<40} {us / 1000:>8.1f} ms")
+    total_ms = best_total / 1000
+    print(f"{'total (best of %d)' % args.runs:<40} {total_ms:>8.1f} ms  (budget {args.budget_ms:.0f} ms)")
+
+    if total_ms > args.budget_ms:
+        sys.exit(f"❌ Import time {total_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+    print("✅ No side effects at import time, within budget")
+
+
+if __name__ == "__main__":
+    main()
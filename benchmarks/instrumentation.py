@@ -0,0 +1,84 @@
+"""
+Benchmark: cost of metrics and structured logging on the hot path
+
+- @instrument on an async tool vs the bare coroutine
+- a labelled counter increment and histogram observation
+- log.debug below the configured level, and log.info through the queue
+- render_prometheus() with every tool family populated
+
+Logging goes to an in-memory stream so the terminal isn't measured.
+
+    uv run python -m benchmarks.instrumentation
+"""
+
+import asyncio
+import io
+import time
+from core import metrics
+from core.log import configure_logging, get_logger, shutdown_logging
+
+CALLS = 100_000
+
+
+async def bare(x):
+    return x
+
+
+instrumented = metrics.instrument("bench_tool", "bare")(bare)
+
+
+def per_call_us(elapsed: float, calls: int = CALLS) -> float:
+    return elapsed / calls * 1e6
+
+
+async def time_async(fn) -> float:
+    start = time.perf_counter()
+    for i in range(CALLS):
+        await fn(i)
+    return per_call_us(time.perf_counter() - start)
+
+
+def time_sync(fn) -> float:
+    start = time.perf_counter()
+    for i in range(CALLS):
+        fn(i)
+    return per_call_us(time.perf_counter() - start)
+
+
+async def main():
+    print("=" * 64)
+    print(f"Instrumentation overhead, {CALLS:,} calls each")
+    print("=" * 64)
+
+    raw = await time_async(bare)
+    wrapped = await time_async(instrumented)
+    print(f"{'bare coroutine':<32} {raw:>7.2f} µs/call")
+    print(f"{'@instrument coroutine':<32} {wrapped:>7.2f} µs/call  (+{wrapped - raw:.2f})")
+
+    counter = metrics.counter("bench_events_total", "Benchmark events", ("event_type",))
+    histogram = metrics.histogram("bench_seconds", "Benchmark latency", ("op",))
+    print(f"{'counter.labels().inc()':<32} {time_sync(lambda i: counter.labels('cart.updated').inc()):>7.2f} µs/call")
+    print(f"{'histogram.labels().observe()':<32} "
+          f"{time_sync(lambda i: histogram.labels('publish').observe(i * 1e-6)):>7.2f} µs/call")
+
+    stream = io.StringIO()
+    configure_logging("INFO", "json", stream=stream)
+    log = get_logger("benchmarks.instrumentation")
+    print(f"{'log.debug (filtered)':<32} {time_sync(lambda i: log.debug('event', n=i)):>7.2f} µs/call")
+    print(f"{'log.info (queued)':<32} {time_sync(lambda i: log.info('event', n=i)):>7.2f} µs/call")
+    shutdown_logging()
+    dropped = metrics.counter("log_records_dropped_total", "Log records dropped because the queue was full").labels().value
+    print(f"{'lines written / dropped':<32} {stream.getvalue().count(chr(10)):>7,} / {dropped:,.0f}")
+
+    for name in range(50):
+        tool = metrics.instrument("tool", f"tool_{name}")(bare)
+        for i in range(100):
+            await tool(i)
+    start = time.perf_counter()
+    text = metrics.render_prometheus()
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{'render_prometheus()':<32} {elapsed:>7.2f} ms  ({len(text.splitlines()):,} lines)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Benchmark: concurrent checkouts on hot SKUs, read-then-write vs atomic reservations
+
+CHECKOUTS concurrent checkouts each buy 1-3 units of one to three of a few
+hot products whose total stock is far below demand. Compared:
+
+- read-then-write: validate quantities, then $inc them down (the old flow)
+- reserve():       conditional bulk decrement per cart
+
+Reports throughput, how many checkouts succeeded, units sold vs stock and
+the lowest quantity reached (negative means oversold). A second run retries
+every checkout with the same idempotency key to show nothing is taken twice.
+Requires a running MongoDB; uses scratch collections that are dropped
+afterwards.
+
+    uv run python -m benchmarks.inventory_reservations
+"""
+
+import asyncio
+import random
+import time
+from bson import ObjectId
+from config.mongodb import db
+from core.exceptions import InventoryUnavailableError
+from tools.inventory_reservations import InventoryReservations
+
+CHECKOUTS = 500
+HOT_SKUS = 5
+STOCK = 40
+PRODUCTS = "bench_reservation_products"
+RESERVATIONS = "bench_reservations"
+
+
+async def reset_stock():
+    products = db.aio.db[PRODUCTS]
+    await products.delete_many({})
+    ids = [ObjectId() for _ in range(HOT_SKUS)]
+    await products.insert_many([{"_id": pid, "quantity": STOCK} for pid in ids])
+    await db.aio.db[RESERVATIONS].delete_many({})
+    return [str(pid) for pid in ids]
+
+
+def make_carts(product_ids):
+    return [{pid: random.randint(1, 3) for pid in random.sample(product_ids, random.randint(1, 3))}
+            for _ in range(CHECKOUTS)]
+
+
+async def read_then_write(items):
+    products = db.aio.db[PRODUCTS]
+    docs = await products.find({"_id": {"$in": [ObjectId(pid) for pid in items]}}, {"quantity": 1}).to_list()
+    if any(doc["quantity"] < items[str(doc["_id"])] for doc in docs):
+        return False
+    for pid, qty in items.items():
+        await products.update_one({"_id": ObjectId(pid)}, {"$inc": {"quantity": -qty}})
+    return True
+
+
+async def run(label, checkout, carts):
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(checkout(i, items) for i, items in enumerate(carts)))
+    elapsed = time.perf_counter() - start
+    docs = await db.aio.db[PRODUCTS].find({}, {"quantity": 1}).to_list()
+    remaining = [doc["quantity"] for doc in docs]
+    sold = HOT_SKUS * STOCK - sum(remaining)
+    print(f"{label:<26} {len(carts) / elapsed:>7,.0f} checkouts/s  ok {sum(outcomes):>4}  "
+          f"sold {sold:>4}/{HOT_SKUS * STOCK}  min quantity {min(remaining):>4}")
+
+
+async def main():
+    random.seed(24)
+    print("=" * 84)
+    print(f"{CHECKOUTS} concurrent checkouts, {HOT_SKUS} hot SKUs with {STOCK} units each")
+    print("=" * 84)
+
+    product_ids = await reset_stock()
+    carts = make_carts(product_ids)
+    await run("read-then-write", lambda i, items: read_then_write(items), carts)
+
+    reservations = InventoryReservations(products=PRODUCTS, reservations=RESERVATIONS)
+
+    async def reserve(i, items):
+        try:
+            await reservations.reserve(f"checkout-{i}", items)
+            return True
+        except InventoryUnavailableError:
+            return False
+
+    product_ids = await reset_stock()
+    carts = make_carts(product_ids)
+    await run("reserve()", reserve, carts)
+    await run("reserve() retried", reserve, carts)
+
+    held = await db.aio.db[RESERVATIONS].find({"status": "held"}, {"items": 1}).to_list()
+    print(f"held reservations: {len(held)}, units {sum(sum(r['items'].values()) for r in held)}")
+    start = time.perf_counter()
+    released = sum([await reservations.release(r["_id"]) for r in held])
+    print(f"released {released} in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    await db.aio.db[PRODUCTS].drop()
+    await db.aio.db[RESERVATIONS].drop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""
+Benchmark: to_list listings vs keyset streaming and pagination
+
+Fills a scratch collection with catalog-shaped products, then compares:
+
+- peak memory of loading a whole listing with to_list() vs streaming it
+  in batches through tools.pagination.stream
+- latency of fetching a deep page with skip/limit vs a continuation token
+
+Requires a running MongoDB; the scratch collection is dropped afterwards.
+
+    uv run python -m benchmarks.listing_stream
+"""
+
+import asyncio
+import time
+import tracemalloc
+from config.mongodb import db
+from tools import pagination
+
+SIZES = [1_000, 10_000, 50_000]
+PAGE_SIZE = 50
+COLLECTION = "benchmark_listing"
+
+
+def product(i: int) -> dict:
+    return {"title": f"Slim fit cotton shirt {i}", "category": "Shirts", "price": 20 + i % 80,
+            "description": "Breathable cotton shirt with a tailored slim fit. " * 6, "quantity": i % 40}
+
+
+async def peak_memory(fn) -> int:
+    tracemalloc.start()
+    await fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+async def main():
+    collection = db.aio.db[COLLECTION]
+    await collection.drop()
+    query = {"category": "Shirts"}
+
+    print("=" * 60)
+    print("Listing memory: to_list vs streaming (batch 100)")
+    print("=" * 60)
+    try:
+        inserted = 0
+        for size in SIZES:
+            await collection.insert_many([product(i) for i in range(inserted, size)])
+            inserted = size
+
+            async def load_all():
+                docs = await collection.find(query).to_list()
+                return len(docs)
+
+            async def stream_all():
+                count = 0
+                async for _ in pagination.stream(collection, query, batch_size=100):
+                    count += 1
+                return count
+
+            print(f"{size:>7} products  to_list {await peak_memory(load_all) / 1e6:>8.1f} MB   "
+                  f"stream {await peak_memory(stream_all) / 1e6:>6.1f} MB")
+
+        print("=" * 60)
+        print(f"Deep page latency ({PAGE_SIZE} per page)")
+        print("=" * 60)
+        token = None
+        for page_number in range(1, SIZES[-1] // PAGE_SIZE + 1):
+            start = time.perf_counter()
+            result = await pagination.page(collection, query, page_size=PAGE_SIZE, token=token)
+            keyset_ms = (time.perf_counter() - start) * 1000
+            token = result["next_token"]
+            if page_number in (1, 10, 100, 900):
+                start = time.perf_counter()
+                await collection.find(query).sort("_id", 1).skip((page_number - 1) * PAGE_SIZE) \
+                    .limit(PAGE_SIZE).to_list()
+                skip_ms = (time.perf_counter() - start) * 1000
+                print(f"page {page_number:>4}  skip/limit {skip_ms:>7.2f} ms   keyset {keyset_ms:>6.2f} ms")
+    finally:
+        await collection.drop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
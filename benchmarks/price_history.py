@@ -0,0 +1,120 @@
+"""
+Benchmark: windowed price aggregates over raw ticks vs bucketed rollups
+
+Loads the same synthetic ticks into a one-document-per-tick collection and
+into the bucketed layout of tools.price_history, then times a 7-day
+min/max/mean/last window for every product from each. Also times queueing
+ticks through PriceHistoryStore.record. Requires a running MongoDB; the
+scratch collections are dropped afterwards.
+
+    uv run python -m benchmarks.price_history
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from config.mongodb import db
+from tools.price_history import PriceHistoryStore, RESOLUTIONS, POINTS_RESOLUTION, bucket_id, bucket_start
+from tools.write_behind import get_write_sink
+
+PRODUCTS = 1000
+DAYS = 14
+TICKS_PER_DAY = 48
+RAW = "benchmark_price_ticks"
+BUCKETED = "benchmark_price_buckets"
+
+
+def make_ticks(now: datetime):
+    for p in range(PRODUCTS):
+        price = random.uniform(10, 500)
+        for i in range(DAYS * TICKS_PER_DAY):
+            price = max(1.0, price * random.uniform(0.98, 1.02))
+            yield f"product-{p}", round(price, 2), now - timedelta(minutes=i * 1440 // TICKS_PER_DAY)
+
+
+def build_buckets(ticks):
+    """The documents PriceHistoryStore.record would produce, built in memory"""
+    buckets = {}
+    for product_id, price, at in ticks:
+        for resolution in RESOLUTIONS:
+            start = bucket_start(at, resolution)
+            key = bucket_id(product_id, resolution, start)
+            doc = buckets.get(key)
+            if doc is None:
+                doc = buckets[key] = {"_id": key, "product_id": product_id, "resolution": resolution,
+                                      "bucket": start, "min": price, "max": price, "sum": 0.0,
+                                      "count": 0, "last": {"t": at, "p": price}}
+                if resolution == POINTS_RESOLUTION:
+                    doc["points"] = []
+            doc["min"] = min(doc["min"], price)
+            doc["max"] = max(doc["max"], price)
+            doc["sum"] += price
+            doc["count"] += 1
+            if at > doc["last"]["t"]:
+                doc["last"] = {"t": at, "p": price}
+            if resolution == POINTS_RESOLUTION:
+                doc["points"].append({"t": at, "p": price})
+    return list(buckets.values())
+
+
+async def raw_windows(collection, product_ids, start):
+    cursor = await collection.aggregate([
+        {"$match": {"product_id": {"$in": product_ids}, "t": {"$gte": start}}},
+        {"$sort": {"t": 1}},
+        {"$group": {"_id": "$product_id", "min": {"$min": "$p"}, "max": {"$max": "$p"},
+                    "mean": {"$avg": "$p"}, "last": {"$last": "$p"}}},
+    ])
+    return await cursor.to_list()
+
+
+async def insert_chunked(collection, docs, chunk=10_000):
+    for i in range(0, len(docs), chunk):
+        await collection.insert_many(docs[i:i + chunk], ordered=False)
+
+
+async def main():
+    raw, bucketed = db.aio.db[RAW], db.aio.db[BUCKETED]
+    await raw.drop()
+    await bucketed.drop()
+    store = PriceHistoryStore(BUCKETED)
+    now = datetime.now(timezone.utc)
+
+    try:
+        ticks = list(make_ticks(now))
+        await insert_chunked(raw, [{"product_id": pid, "p": price, "t": at} for pid, price, at in ticks])
+        await raw.create_index([("product_id", 1), ("t", 1)])
+        buckets = build_buckets(ticks)
+        await insert_chunked(bucketed, buckets)
+        await store.ensure_indexes()
+
+        print("=" * 60)
+        print(f"{PRODUCTS} products x {DAYS} days x {TICKS_PER_DAY} ticks/day: "
+              f"{len(ticks):,} ticks, {len(buckets):,} bucket documents")
+        print("=" * 60)
+
+        product_ids = [f"product-{p}" for p in range(PRODUCTS)]
+        start = now - timedelta(days=7)
+        for label, query in (("raw ticks ($group)", lambda: raw_windows(raw, product_ids, start)),
+                             ("day rollups", lambda: store.windows(product_ids, start)),
+                             ("hour rollups", lambda: store.windows(product_ids, start, resolution="hour"))):
+            begin = time.perf_counter()
+            results = await query()
+            print(f"{label:<20} 7-day window, {len(results)} products: "
+                  f"{(time.perf_counter() - begin) * 1000:>8.1f} ms")
+
+        begin = time.perf_counter()
+        for i in range(10_000):
+            await store.record(f"product-{i % PRODUCTS}", 99.0)
+        queued = time.perf_counter() - begin
+        await get_write_sink().flush()
+        print(f"record(): {10_000 / queued:,.0f} ticks/s queued, "
+              f"{10_000 / (time.perf_counter() - begin):,.0f} ticks/s written")
+    finally:
+        await get_write_sink().close()
+        await raw.drop()
+        await bucketed.drop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
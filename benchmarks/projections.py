@@ -0,0 +1,80 @@
+"""
+Benchmark: full product documents vs projected views
+
+For catalog-shaped product documents, measures what each view saves in the
+three places projection matters: BSON bytes the server sends, time to
+decode them, and memory held by the decoded results. Uses BSON encoding
+directly, so no MongoDB is needed.
+
+    uv run python -m benchmarks.projections
+"""
+
+import time
+import tracemalloc
+import bson
+from bson import ObjectId
+from tools.views import PRODUCT_VIEWS
+
+DOCS = 20_000
+ROUNDS = 5
+
+
+def make_product(i: int) -> dict:
+    return {
+        "_id": ObjectId(),
+        "imagePath": f"https://cdn.example.com/images/products/{i:06d}-front-large.jpg",
+        "title": f"Slim fit cotton shirt {i}",
+        "description": "Breathable cotton shirt with a tailored slim fit, button-down collar "
+                       "and a curved hem. Machine washable. " * 4,
+        "department": "Men",
+        "category": "Shirts",
+        "price": 29.99 + i % 50,
+        "color": "Navy",
+        "size": "M",
+        "quantity": i % 40,
+        "date": 1700000000000 + i,
+    }
+
+
+def encode(docs, view) -> bytes:
+    """The reply payload for a find() with the view's projection"""
+    projection = PRODUCT_VIEWS.projection(view)
+    if projection is not None:
+        docs = [{key: doc[key] for key in projection if key in doc} for doc in docs]
+    return b"".join(bson.encode(doc) for doc in docs)
+
+
+def measure(payload: bytes):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        bson.decode_all(payload)
+    decode_ms = (time.perf_counter() - start) / ROUNDS * 1000
+
+    tracemalloc.start()
+    decoded = bson.decode_all(payload)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del decoded
+    return decode_ms, memory
+
+
+def main():
+    docs = [make_product(i) for i in range(DOCS)]
+
+    print("=" * 60)
+    print(f"Product views ({DOCS} documents)")
+    print("=" * 60)
+    baseline = None
+    for view in (None, "summary", "pricing", "inventory"):
+        payload = encode(docs, view)
+        decode_ms, memory = measure(payload)
+        if baseline is None:
+            baseline = (len(payload), decode_ms, memory)
+        label = view or "full document"
+        print(f"{label:<14} {len(payload) / DOCS:>6.0f} B/doc ({len(payload) / baseline[0]:>4.0%})  "
+              f"decode {decode_ms:>7.1f} ms ({decode_ms / baseline[1]:>4.0%})  "
+              f"{memory / DOCS:>6.0f} B/result ({memory / baseline[2]:>4.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: agent response cache on a realistic query mix
+
+Simulates customers sending AGENT_QUERY traffic drawn from a few hundred
+intents, with casing, punctuation, filler words and currency symbols varied,
+in concurrent bursts. The agent is a stub that sleeps AGENT_MS. Reports how
+many agent calls were made with and without the cache, the hit breakdown and
+the lookup overhead. No database or Redis needed.
+
+    uv run python -m benchmarks.response_cache
+"""
+
+import asyncio
+import random
+import time
+from agents.response_cache import AgentResponseCache
+
+QUERIES = 5_000
+CONCURRENCY = 50
+AGENT_MS = 20
+PRODUCTS = ["shoes", "sneakers", "dresses", "jeans", "jackets", "shirts", "boots", "bags"]
+COLORS = ["red", "black", "blue", "white", "green"]
+PRICES = [500, 1000, 1500, 2000, 5000]
+FILLERS = ["", "please", "can you", "i want to", "hey,"]
+
+
+def make_intents():
+    intents = []
+    for product in PRODUCTS:
+        for color in COLORS:
+            for price in PRICES:
+                intents.append((color, product, price))
+    return intents
+
+
+def phrase(color: str, product: str, price: int) -> str:
+    filler = random.choice(FILLERS)
+    currency = random.choice(["₹", "Rs ", "", "₹ "])
+    template = random.choice([
+        "{f} show me {c} {p} under {cur}{n}",
+        "{f} Show me {c} {p} under {cur}{n}!",
+        "{f} show me the {c} {p} under {cur}{n}?",
+        "{f} SHOW ME {c} {p} UNDER {cur}{n}",
+    ])
+    return template.format(f=filler, c=color, p=product, cur=currency, n=price).strip()
+
+
+async def run(cache: AgentResponseCache, queries):
+    calls = 0
+
+    async def agent():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(AGENT_MS / 1000)
+        return "answer"
+
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def ask(query):
+        async with semaphore:
+            return await cache.get_or_call(query, agent)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(ask(query) for query in queries))
+    return calls, time.perf_counter() - start
+
+
+async def main():
+    random.seed(21)
+    intents = make_intents()
+    # Popular intents are asked far more often than the long tail
+    weights = [1 / (rank + 1) for rank in range(len(intents))]
+    queries = [phrase(*random.choices(intents, weights)[0]) for _ in range(QUERIES)]
+
+    print("=" * 64)
+    print(f"{QUERIES:,} queries over {len(intents)} intents, agent {AGENT_MS} ms, concurrency {CONCURRENCY}")
+    print("=" * 64)
+    print(f"{'no cache':<26} {QUERIES:>7,} agent calls   {QUERIES * AGENT_MS / CONCURRENCY / 1000:>6.2f} s (ideal)")
+
+    cache = AgentResponseCache(ttl_s=3600, maxsize=5000)
+    calls, elapsed = await run(cache, queries)
+    print(f"{'cache':<26} {calls:>7,} agent calls   {elapsed:>6.2f} s")
+    for name, value in cache.stats().items():
+        print(f"    {name:<20} {value}")
+
+    start = time.perf_counter()
+    for query in queries:
+        cache.lookup(query)
+    print(f"lookup overhead: {(time.perf_counter() - start) / QUERIES * 1e6:.1f} us/query")
+
+    exact = AgentResponseCache(ttl_s=3600, maxsize=5000, similarity=1.01)
+    calls, _ = await run(exact, queries)
+    print(f"{'exact matching only':<26} {calls:>7,} agent calls")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""
+Benchmark: similar-product and recommendation queries on the NumPy index
+
+Builds a SimilarityIndex over synthetic products, then times:
+
+- build, save and opening the saved matrix memory-mapped
+- top-10 similar products for 1,000 products, one query at a time vs
+  batched through similar_many
+- affinity updates and recommendation queries
+
+No database needed; the index is written to a temp directory.
+
+    uv run python -m benchmarks.similarity_index
+"""
+
+import os
+import random
+import tempfile
+import time
+from tools.similarity_index import SimilarityIndex
+
+PRODUCTS = 50_000
+QUERIES = 1_000
+WORDS = [f"word{i}" for i in range(5_000)]
+COLORS = ["black", "white", "blue", "red", "green", "beige", "navy", "grey"]
+CATEGORIES = [f"category-{i}" for i in range(60)]
+DEPARTMENTS = [f"department-{i}" for i in range(6)]
+
+
+def make_catalog():
+    products, variants = [], []
+    for i in range(PRODUCTS):
+        products.append({"_id": f"product-{i}",
+                         "title": " ".join(random.choices(WORDS, k=4)),
+                         "description": " ".join(random.choices(WORDS, k=20)),
+                         "category": random.choice(CATEGORIES),
+                         "department": random.choice(DEPARTMENTS),
+                         "price": round(random.lognormvariate(3.5, 0.8), 2)})
+        for size in random.sample(["xs", "s", "m", "l", "xl"], 2):
+            variants.append({"productID": f"product-{i}", "color": random.choice(COLORS), "size": size})
+    return products, variants
+
+
+def timed(label: str, fn, per: int = 0):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    rate = f"   ({per / elapsed:,.0f}/s)" if per else ""
+    print(f"{label:<34} {elapsed * 1000:>10.1f} ms{rate}")
+    return result
+
+
+def main():
+    random.seed(20)
+    products, variants = make_catalog()
+    path = os.path.join(tempfile.mkdtemp(), "similarity")
+    index = SimilarityIndex(path=path)
+
+    print("=" * 64)
+    print(f"{PRODUCTS:,} products, {len(variants):,} variants")
+    print("=" * 64)
+    timed("build", lambda: index.build(products, variants))
+    print(f"{'feature matrix':<34} {index.features.shape[0]:,} x {index.features.shape[1]} float32 "
+          f"({index.features.nbytes / 1e6:.0f} MB)")
+    timed("save", index.save)
+    mapped = SimilarityIndex(path=path)
+    timed("open (memory-mapped)", mapped.open)
+
+    query_ids = [f"product-{random.randrange(PRODUCTS)}" for _ in range(QUERIES)]
+    single = timed(f"similar x{QUERIES}, one at a time", lambda: [mapped.similar(pid, 10) for pid in query_ids],
+                   QUERIES)
+    batched = timed(f"similar_many x{QUERIES}, batched", lambda: mapped.similar_many(query_ids, 10), QUERIES)
+    assert all([r["product_id"] for r in single[i]] == [r["product_id"] for r in batched[pid]]
+               for i, pid in enumerate(query_ids))
+
+    events = [(f"user-{random.randrange(10_000)}", f"product-{random.randrange(PRODUCTS)}")
+              for _ in range(100_000)]
+    timed("affinity updates x100,000", lambda: [mapped.record(user, pid) for user, pid in events], len(events))
+    users = [f"user-{i}" for i in range(QUERIES)]
+    timed(f"recommend x{QUERIES}", lambda: [mapped.recommend(user, 10) for user in users], QUERIES)
+    timed(f"recommend x{QUERIES}, in a department",
+          lambda: [mapped.recommend(user, 10, department=DEPARTMENTS[0]) for user in users], QUERIES)
+
+    for suffix in (".npy", ".json"):
+        os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
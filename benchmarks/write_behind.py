@@ -0,0 +1,69 @@
+"""
+Benchmark: awaited insert_one per write vs the write-behind sink
+
+Simulates agents logging one document per step. Compares how long callers
+wait per write and the end-to-end throughput, and prints the sink's flush
+metrics. Requires a running MongoDB; writes to a scratch collection that is
+dropped afterwards.
+
+    uv run python -m benchmarks.write_behind
+"""
+
+import asyncio
+import time
+from config.mongodb import db
+from tools.write_behind import WriteBehindSink
+from benchmarks.common import print_row, summarize
+
+WRITES = 20_000
+COLLECTION = "benchmark_agent_logs"
+
+
+def log_entry(i: int) -> dict:
+    return {"agent": "customer_service", "step": i, "tool": "search_products_mongodb",
+            "latency_ms": 12.5, "user_id": f"user-{i % 500}"}
+
+
+async def direct(collection) -> list:
+    latencies = []
+    for i in range(WRITES):
+        start = time.perf_counter()
+        await collection.insert_one(log_entry(i))
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def write_behind(sink: WriteBehindSink) -> list:
+    latencies = []
+    for i in range(WRITES):
+        start = time.perf_counter()
+        await sink.insert(COLLECTION, log_entry(i))
+        latencies.append(time.perf_counter() - start)
+    await sink.flush()
+    return latencies
+
+
+async def main():
+    collection = db.aio.db[COLLECTION]
+    await collection.drop()
+
+    print("=" * 60)
+    print(f"{WRITES} log writes")
+    print("=" * 60)
+    try:
+        start = time.perf_counter()
+        latencies = await direct(collection)
+        print_row(f"insert_one ({WRITES / (time.perf_counter() - start):,.0f}/s)", summarize(latencies))
+
+        sink = WriteBehindSink(spill_path="")
+        start = time.perf_counter()
+        latencies = await write_behind(sink)
+        print_row(f"write-behind ({WRITES / (time.perf_counter() - start):,.0f}/s)", summarize(latencies))
+        await sink.close()
+        print(sink.stats()[COLLECTION])
+    finally:
+        await collection.drop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
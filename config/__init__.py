@@ -1,4 +1,4 @@
-from config.settings import settings
-from config.mongodb import MongoDB, db
+from config.settings import settings, get_settings
+from config.mongodb import MongoDB, db, get_db
 
-__all__ = ['settings', 'MongoDB', 'db']
+__all__ = ['settings', 'get_settings', 'MongoDB', 'db', 'get_db']
@@ -1,24 +1,22 @@
-from pymongo import MongoClient
-from pymongo.database import Database
-from typing import Optional
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import TYPE_CHECKING, Any, List, Optional
 from config.settings import settings
+from core.lazy import LazySingleton
 
-class MongoDB:
-    """MongoDB connection manager for fashion-cube database"""
+if TYPE_CHECKING:
+    from pymongo.database import Database
 
-    _instance: Optional['MongoDB'] = None
+# pymongo itself is imported when the first connection is made: it accounts
+# for most of the import time of anything that touches the database.
 
-    def __init__(self, uri: str = None):
-        self.uri = uri or settings.mongodb_uri
-        self.client = MongoClient(self.uri)
-        self.db: Database = self.client["fashion-cube"]
 
-    @classmethod
-    def get_instance(cls) -> 'MongoDB':
-        """Singleton pattern for database connection"""
-        if cls._instance is None:
-            cls._instance = cls()
-        return cls._instance
+class _Collections:
+    """Named collection accessors shared by the sync and async views"""
+
+    db: Any
 
     @property
     def products(self):
@@ -57,5 +55,170 @@ class MongoDB:
     def promotions(self):
         return self.db["promotions"]
 
-# Global database instance
-db = MongoDB.get_instance()
+
+class MongoDB(_Collections):
+    """MongoDB connection manager for fashion-cube database"""
+
+    def __init__(self, uri: str = None, max_pool_size: int = None, async_mode: str = None):
+        from pymongo import MongoClient
+        from core.metrics import mongo_command_listener
+
+        self.listener = mongo_command_listener()
+        self.uri = uri or settings.mongodb_uri
+        self.max_pool_size = max_pool_size or settings.mongodb_max_pool_size
+        self.async_mode = async_mode or settings.mongodb_async_mode
+        self.client = MongoClient(
+            self.uri,
+            maxPoolSize=self.max_pool_size,
+            minPoolSize=settings.mongodb_min_pool_size,
+            event_listeners=[self.listener]
+        )
+        self.db: 'Database' = self.client["fashion-cube"]
+        self.aio = self._create_async_view()
+
+    def _create_async_view(self) -> 'AsyncMongoDB':
+        """Build the awaitable view used by the tools package"""
+        try:
+            from pymongo import AsyncMongoClient
+        except ImportError:  # pymongo < 4.13 has no native async client
+            AsyncMongoClient = None
+
+        if self.async_mode == "native" and AsyncMongoClient is not None:
+            self.async_client = AsyncMongoClient(
+                self.uri,
+                maxPoolSize=self.max_pool_size,
+                minPoolSize=settings.mongodb_min_pool_size,
+                event_listeners=[self.listener]
+            )
+            return AsyncMongoDB(self.async_client["fashion-cube"])
+
+        # Fallback: run the sync driver on a bounded thread pool
+        self.async_client = None
+        executor = ThreadPoolExecutor(
+            max_workers=settings.mongodb_executor_workers,
+            thread_name_prefix="mongodb"
+        )
+        return AsyncMongoDB(ThreadedDatabase(self.db, executor))
+
+    @classmethod
+    def get_instance(cls) -> 'MongoDB':
+        """Singleton pattern for database connection"""
+        return db.get()
+
+    async def ping(self):
+        """Round trip to the server; raises if it is unreachable"""
+        if self.async_client is not None:
+            await self.async_client.admin.command("ping")
+        else:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.aio.db.executor, self.client.admin.command, "ping")
+
+    async def close_async(self):
+        """Close the async client or thread pool"""
+        if self.async_client is not None:
+            await self.async_client.close()
+        else:
+            self.aio.db.executor.shutdown(wait=False)
+
+    def close(self):
+        """Close the sync client"""
+        self.client.close()
+
+
+class AsyncMongoDB(_Collections):
+    """Awaitable collection view backed by the async driver or a thread pool"""
+
+    def __init__(self, database):
+        self.db = database
+
+
+class ThreadedDatabase:
+    """Database wrapper that dispatches sync pymongo calls to an executor"""
+
+    def __init__(self, database: 'Database', executor: ThreadPoolExecutor):
+        self.database = database
+        self.executor = executor
+
+    def __getitem__(self, name: str) -> 'ThreadedCollection':
+        return ThreadedCollection(self.database[name], self.executor)
+
+
+class ThreadedCollection:
+    """Mirrors the AsyncCollection API on top of a sync collection"""
+
+    def __init__(self, collection, executor: ThreadPoolExecutor):
+        self.collection = collection
+        self.executor = executor
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(fn, *args, **kwargs))
+
+    def find(self, *args, **kwargs) -> 'ThreadedCursor':
+        return ThreadedCursor(self.collection.find(*args, **kwargs), self.executor)
+
+    async def aggregate(self, *args, **kwargs) -> 'ThreadedCursor':
+        cursor = await self._run(self.collection.aggregate, *args, **kwargs)
+        return ThreadedCursor(cursor, self.executor)
+
+    def __getattr__(self, name: str):
+        method = getattr(self.collection, name)
+
+        async def call(*args, **kwargs):
+            return await self._run(method, *args, **kwargs)
+
+        return call
+
+
+class ThreadedCursor:
+    """Mirrors the AsyncCursor API on top of a sync cursor"""
+
+    def __init__(self, cursor, executor: ThreadPoolExecutor, batch_size: int = 100):
+        self.cursor = cursor
+        self.executor = executor
+        self._batch_size = batch_size
+        self._buffer: List[dict] = []
+
+    def limit(self, limit: int) -> 'ThreadedCursor':
+        self.cursor.limit(limit)
+        return self
+
+    def skip(self, skip: int) -> 'ThreadedCursor':
+        self.cursor.skip(skip)
+        return self
+
+    def sort(self, *args, **kwargs) -> 'ThreadedCursor':
+        self.cursor.sort(*args, **kwargs)
+        return self
+
+    def batch_size(self, batch_size: int) -> 'ThreadedCursor':
+        self.cursor.batch_size(batch_size)
+        self._batch_size = batch_size
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, lambda: list(islice(self.cursor, length)))
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> dict:
+        if not self._buffer:
+            self._buffer = await self.to_list(self._batch_size)
+            self._buffer.reverse()
+            if not self._buffer:
+                raise StopAsyncIteration
+        return self._buffer.pop()
+
+    async def close(self):
+        self.cursor.close()
+
+
+def get_db() -> MongoDB:
+    """The process-wide database connection, opened on first use"""
+    return db.get()
+
+
+# Global database instance (connects lazily)
+db: MongoDB = LazySingleton(MongoDB)
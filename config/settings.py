@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Dict, Optional
+from core.lazy import LazySingleton
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables"""
@@ -16,21 +17,130 @@ class Settings(BaseSettings):
     # Database
     mongodb_uri: str = "mongodb://127.0.0.1:27017/fashion-cube"
     redis_url: str = "redis://localhost:6379"
+    mongodb_max_pool_size: int = 100
+    mongodb_min_pool_size: int = 0
+    mongodb_async_mode: str = "native"  # "native" (async driver) or "threads"
+    mongodb_executor_workers: int = 32  # Thread pool size for "threads" mode
 
     # Node.js Integration
     nodejs_api_url: str = "http://localhost:3000"
+    nodejs_api_timeout_s: float = 30.0
+    nodejs_api_connect_timeout_s: float = 5.0
+    nodejs_api_max_connections: int = 100
+    nodejs_api_max_keepalive: int = 20  # Idle connections kept open for reuse
+    nodejs_api_keepalive_expiry_s: float = 30.0
+    nodejs_api_http2: bool = True  # Used when the h2 package is installed
+    nodejs_api_retries: int = 3  # Extra attempts for idempotent GETs
+    nodejs_api_retry_backoff_ms: int = 100  # Base of the jittered exponential backoff
+    nodejs_api_retry_max_backoff_ms: int = 2000
+    nodejs_api_bulk_concurrency: int = 10  # Parallel requests in get_products_bulk
 
     # Agent Configuration
     default_agent_model: str = "anthropic:claude-sonnet-4.5"
     sub_agent_model: str = "openai:gpt-4.1"
+    agent_cache_ttl_s: int = 600  # Cached agent responses, dropped sooner on catalog changes
+    agent_cache_max_entries: int = 5000
+    agent_cache_similarity: float = 0.8  # Trigram Jaccard for near-duplicate queries
+    agent_cache_clear_interval_s: float = 1.0  # Bursts of catalog changes clear the entries once
     agent_max_tokens: int = 4000
+    agent_concurrency: int = 8  # Calls in flight per model
+    agent_tokens_per_minute: int = 200000  # Estimated tokens admitted per model per minute
+    agent_token_burst_s: float = 10.0  # Token bucket holds this many seconds of refill
+    agent_model_limits: Dict[str, Dict[str, float]] = {}  # Per-model overrides of the three above
+    agent_queue_timeout_ms: Dict[str, int] = {"checkout": 30000, "support": 15000,
+                                              "browsing": 5000, "background": 2000}
+    agent_queue_max_depth: Dict[str, int] = {"checkout": 1000, "support": 200,
+                                             "browsing": 100, "background": 20}
+
+    # Inventory reservations
+    inventory_reservation_ttl_s: int = 900  # Unpaid reservations go back into stock after this
+    inventory_sweep_interval_s: int = 30
+    inventory_reserve_wait_ms: int = 5000  # A retry waits this long for the first attempt to settle
+
+    # Customer context for agent turns
+    customer_context_ttl_s: int = 1800  # A session (Redis copies); event deltas keep it current meanwhile
+    customer_context_max_entries: int = 10000
+    customer_context_orders: int = 10  # Recent orders kept in the context
+    customer_context_redis: bool = False  # Share assembled contexts between workers
+    customer_context_local_ttl_s: int = 30  # In-process copies: deltas are applied by one worker only
+
+    # Event bus
+    event_batch_size: int = 100  # Messages per XREADGROUP call
+    event_block_ms: int = 1000
+    event_workers_per_stream: int = 8
+    event_ordering_key: str = "user_id"  # Events sharing this payload field are handled in order
+    event_ack_interval_ms: int = 50
+    event_consumer_group: str = "agents"
+    event_claim_interval_ms: int = 5000  # How often to reclaim stale pending messages
+    event_claim_idle_ms: int = 60000  # Pending this long without ack -> consumer presumed dead
+    event_max_deliveries: int = 5  # Then the message goes to the dead-letter stream
+    event_consumer_expiry_ms: int = 3600000  # Idle consumers with nothing pending are removed
+    event_worker_processes: int = 0  # 0 -> one per CPU core
+    event_stream_max_len: int = 100000  # Default retention for types without a policy
+    event_stream_hard_cap_factor: int = 2  # XADD MAXLEN = policy x factor while archiving
+    event_archive_dir: str = "data/event_archive"  # Empty disables archiving
+    event_compaction_interval_s: int = 300
+    event_codec: str = "auto"  # "auto" negotiates msgpack with consumers; or "json"/"msgpack"
+    event_codec_refresh_s: int = 30  # How long publishers cache the negotiation result
+    event_codec_ttl_s: int = 120  # Consumer codec advertisements older than this are ignored
+    event_publish_batch_size: int = 500  # Buffered publisher flush thresholds
+    event_publish_max_delay_ms: int = 10
+    event_publish_buffer_size: int = 10000
+
+    # Write-behind sink for agent_logs, price_history and promotions
+    write_behind_batch_size: int = 500  # Documents per insert_many/bulk_write
+    write_behind_max_delay_ms: int = 200  # Oldest queued write waits at most this long
+    write_behind_queue_size: int = 10000  # Per collection; writers wait when full
+    write_behind_retries: int = 3  # Then the batch is spilled (or dropped)
+    write_behind_spill_path: str = "data/write_behind_spill.jsonl"  # Empty disables spilling
+
+    # Listings
+    listing_batch_size: int = 100  # Documents per query when streaming a listing
+    listing_page_size: int = 50
+
+    # Similar products and recommendations
+    similarity_index_path: str = "data/similarity_index"  # .npy (memory-mapped) + .json; empty keeps it in memory
+    similarity_text_dims: int = 256  # Wider TF-IDF vocabularies are randomly projected to this
+    similarity_price_bands: int = 8
+    similarity_affinity_half_life_s: int = 7 * 24 * 3600
+    similarity_rebuild_interval_s: int = 300  # Minimum age before a stale index is rebuilt
+
+    # Cart abandonment
+    cart_abandonment_timeout_s: int = 1800  # Idle time after the last cart activity
+    cart_abandonment_check_interval_s: float = 5.0
+    cart_abandonment_snapshot_path: str = "data/cart_abandonment.json"  # Empty disables snapshots
+    cart_abandonment_snapshot_interval_s: int = 60
+    cart_abandonment_group: str = "cart-abandonment"  # Own consumer group: sees every cart event
+    cart_abandonment_lease_s: int = 30  # Only the lease holder runs the detector
+
+    # Dynamic pricing
+    pricing_demand_sensitivity: float = 0.1  # Price change per unit of demand above/below 1.0
+    pricing_low_stock_threshold: int = 10  # Below this quantity a scarcity premium applies
+    pricing_scarcity_premium: float = 0.1  # Premium at zero stock, scaled linearly
+    pricing_floor_ratio: float = 0.8  # Bounds relative to base price when a product sets none
+    pricing_ceiling_ratio: float = 1.25
+    pricing_change_threshold: float = 0.01  # Relative change below which prices are left alone
+
+    # Checkout
+    checkout_deadline_ms: int = 2000  # Total budget for assembling the checkout context
+    checkout_stage_timeout_ms: int = 1000  # Default per-stage timeout within the deadline
 
     # Caching
     cache_ttl_seconds: int = 300  # 5 minutes
+    taxonomy_cache_ttl_seconds: int = 3600  # Departments/categories rarely change
+    cache_max_entries: int = 1024
 
     # Optional
     fastapi_port: int = 8000
     log_level: str = "INFO"
+    log_format: str = "json"  # "json" (one object per line) or "text"
+    metrics_host: str = "0.0.0.0"
+    metrics_port: int = 9100  # /metrics (Prometheus) and /metrics.json when served
+
+def get_settings() -> Settings:
+    """The process-wide settings, read from the environment on first use"""
+    return settings.get()
+
 
-# Global settings instance
-settings = Settings()
+# Global settings instance (loaded lazily)
+settings: Settings = LazySingleton(Settings)
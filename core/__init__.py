@@ -1,17 +1,19 @@
-from core.exceptions import (
-    EcommerceAgentError,
-    PricingConflictError,
-    InventoryUnavailableError,
-    InvalidPromotionError,
-    CustomerNotFoundError,
-    NodeJSAPIError
-)
+import importlib
 
+# Exceptions subclass agentica's AgenticaError; importing agentica is slow,
+# so they are only loaded when first referenced.
 __all__ = [
     'EcommerceAgentError',
     'PricingConflictError',
     'InventoryUnavailableError',
     'InvalidPromotionError',
     'CustomerNotFoundError',
+    'AgentOverloadedError',
     'NodeJSAPIError'
 ]
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        return getattr(importlib.import_module("core.exceptions"), name)
+    raise AttributeError(f"module 'core' has no attribute {name!r}")
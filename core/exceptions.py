@@ -10,7 +10,9 @@ class PricingConflictError(EcommerceAgentError):
 
 class InventoryUnavailableError(EcommerceAgentError):
     """Raised when product is out of stock"""
-    pass
+    def __init__(self, message: str, items: list = None):
+        self.items = items or []
+        super().__init__(message)
 
 class InvalidPromotionError(EcommerceAgentError):
     """Raised when promotion code is invalid"""
@@ -20,6 +22,10 @@ class CustomerNotFoundError(EcommerceAgentError):
     """Raised when customer doesn't exist"""
     pass
 
+class AgentOverloadedError(EcommerceAgentError):
+    """Raised when an agent call is shed under load"""
+    pass
+
 class NodeJSAPIError(EcommerceAgentError):
     """Raised when Node.js API call fails"""
     def __init__(self, status_code: int, message: str):
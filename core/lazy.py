@@ -0,0 +1,52 @@
+import threading
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LazySingleton(Generic[T]):
+    """Module-level stand-in that builds the real object on first use.
+
+    Attribute access (and assignment) is forwarded to the instance, so
+    `from config.mongodb import db` stays side-effect free and `db.aio`
+    opens the connection the first time it is actually needed.
+    """
+
+    __slots__ = ("_factory", "_instance", "_lock")
+
+    def __init__(self, factory: Callable[[], T]):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def get(self) -> T:
+        """The instance, created on the first call"""
+        instance = self._instance
+        if instance is None:
+            with self._lock:
+                instance = self._instance
+                if instance is None:
+                    instance = self._factory()
+                    object.__setattr__(self, "_instance", instance)
+        return instance
+
+    @property
+    def initialized(self) -> bool:
+        return self._instance is not None
+
+    def reset(self) -> Optional[T]:
+        """Forget the instance (the caller closes it); returns it if there was one"""
+        with self._lock:
+            instance = self._instance
+            object.__setattr__(self, "_instance", None)
+        return instance
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(self.get(), name, value)
+
+    def __repr__(self) -> str:
+        state = repr(self._instance) if self._instance is not None else "not initialized"
+        return f"<lazy {state}>"
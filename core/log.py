@@ -0,0 +1,160 @@
+"""
+Structured, non-blocking logging
+
+Platform modules log through get_logger(__name__) with the event's fields as
+keyword arguments instead of formatting them into the message:
+
+    log.info("events published", count=len(message_ids))
+    log.error("handler failed", event_type=event_type, error=e)
+
+Records are put on a bounded in-memory queue and written by a background
+thread (logging's QueueListener), so a slow terminal or log file never
+stalls the event loop; when the queue is full the record is dropped and
+counted in log_records_dropped_total. Output is one JSON object per line
+(log_format "json") or "level logger message key=value" ("text").
+
+Nothing is configured at import: the first record emitted, or an explicit
+configure_logging() from lifecycle.startup(), installs the handler.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+ROOT = "multiagentsym"
+QUEUE_SIZE = 10000
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+
+def _fields(record: logging.LogRecord) -> Dict[str, Any]:
+    fields = getattr(record, "fields", {})
+    if any(isinstance(value, BaseException) for value in fields.values()):
+        fields = {key: f"{type(value).__name__}: {value}" if isinstance(value, BaseException) else value
+                  for key, value in fields.items()}
+    return fields
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, msg, then the fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """level logger message key=value ..."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{key}={value}" for key, value in _fields(record).items())
+        line = f"{record.levelname.lower():<7} {record.name} {record.getMessage()}"
+        if fields:
+            line += " " + fields
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the caller: a full queue drops the record"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Records stay in-process, so formatting is left to the writer thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            from core.metrics import counter
+            counter("log_records_dropped_total", "Log records dropped because the queue was full").inc()
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None, stream=None):
+    """Route platform logs through the background writer (idempotent)"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        if level is None or fmt is None:
+            try:
+                from config.settings import settings
+                level = level or settings.log_level
+                fmt = fmt or settings.log_format
+            except Exception:  # Settings unavailable (e.g. no API key in a script)
+                level, fmt = level or "INFO", fmt or "json"
+        handler = logging.StreamHandler(stream or sys.stderr)
+        handler.setFormatter(TextFormatter() if fmt == "text" else JsonFormatter())
+        records: queue.Queue = queue.Queue(QUEUE_SIZE)
+        root = logging.getLogger(ROOT)
+        root.addHandler(_DroppingQueueHandler(records))
+        root.setLevel(level.upper())
+        root.propagate = False
+        _listener = logging.handlers.QueueListener(records, handler)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Write out queued records and stop the writer thread"""
+    global _listener
+    with _lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        root = logging.getLogger(ROOT)
+        for handler in list(root.handlers):
+            if isinstance(handler, _DroppingQueueHandler):
+                root.removeHandler(handler)
+
+
+class StructuredLogger:
+    """Logger taking event fields as keyword arguments"""
+
+    __slots__ = ("logger",)
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+
+    def _log(self, level: int, msg: str, exc_info: Any, fields: Dict[str, Any]):
+        if _listener is None:
+            configure_logging()
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, msg, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, msg: str, **fields):
+        self._log(logging.DEBUG, msg, None, fields)
+
+    def info(self, msg: str, **fields):
+        self._log(logging.INFO, msg, None, fields)
+
+    def warning(self, msg: str, **fields):
+        self._log(logging.WARNING, msg, None, fields)
+
+    def error(self, msg: str, exc_info: Any = None, **fields):
+        self._log(logging.ERROR, msg, exc_info, fields)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    """Logger for a platform module (under the multiagentsym logger)"""
+    return StructuredLogger(logging.getLogger(f"{ROOT}.{name}"))
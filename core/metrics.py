@@ -0,0 +1,381 @@
+"""
+In-process metrics: counters, gauges and latency histograms
+
+Tool functions, NodeJSClient methods, MongoDB commands and the event bus's
+publish and handle paths record into one registry:
+
+- @instrument("tool") times every call into tool_seconds{name} and counts
+  exceptions in tool_errors_total{name, error}
+- histograms use fixed buckets, so recording is a bisect and three adds; the
+  child for a label set is created once and reused
+- collectors (sync or async callables) refresh gauges that have to be
+  queried, such as stream lag and pending counts, before each export
+
+Read the data in process with snapshot() (after `await collect()` for fresh
+gauges), or over HTTP from serve_metrics(): /metrics in the Prometheus text
+format and /metrics.json as the snapshot.
+"""
+
+import asyncio
+import bisect
+import functools
+import inspect
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _label_value(value: Any) -> str:
+    return str(getattr(value, "value", value))  # EventType members -> their value
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate from the buckets, interpolating linearly inside one"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            if seen + bucket >= rank and bucket:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket
+            seen += bucket
+        return self.bounds[-1]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[Tuple, Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """The child for one set of label values (cache it on hot paths)"""
+        child = self.children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+            key = tuple(_label_value(value) for value in values)
+            with self._lock:
+                child = self.children.get(key)
+                if child is None:
+                    child = self.children[key] = self._new_child()
+        return child
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Registry:
+    """Named metrics plus the collectors that refresh queried gauges"""
+
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+        self.collectors: List[Callable] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help: str, labelnames: Sequence[str], **kwargs) -> Any:
+        metric = self.metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.get(name)
+                if metric is None:
+                    metric = self.metrics[name] = cls(name, help, labelnames, **kwargs)
+        if not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+            raise ValueError(f"Metric {name} is already registered differently")
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    def add_collector(self, collector: Callable):
+        """Run collector() (or await it) before every export"""
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def remove_collector(self, collector: Callable):
+        if collector in self.collectors:
+            self.collectors.remove(collector)
+
+    async def collect(self):
+        """Refresh collected gauges; a failing collector is counted, not raised"""
+        for collector in list(self.collectors):
+            try:
+                result = collector()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                self.counter("metrics_collector_errors_total", "Collectors that raised",
+                             ("error",)).labels(type(e).__name__).inc()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Every metric's current samples, with p50/p99 estimates for histograms"""
+        snapshot = {}
+        for name, metric in list(self.metrics.items()):
+            samples = []
+            for values, child in list(metric.children.items()):
+                sample: Dict[str, Any] = {"labels": dict(zip(metric.labelnames, values))}
+                if metric.kind == "histogram":
+                    sample.update(count=child.count, sum=child.sum,
+                                  mean=child.sum / child.count if child.count else 0.0,
+                                  p50=child.quantile(0.5), p99=child.quantile(0.99))
+                else:
+                    sample["value"] = child.value
+                samples.append(sample)
+            snapshot[name] = {"type": metric.kind, "help": metric.help, "samples": samples}
+        return snapshot
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for values, child in sorted(metric.children.items()):
+                if metric.kind != "histogram":
+                    lines.append(f"{name}{_format_labels(metric.labelnames, values)} {_number(child.value)}")
+                    continue
+                cumulative = 0
+                for bound, bucket in zip((*child.bounds, float("inf")), child.counts):
+                    cumulative += bucket
+                    le = "+Inf" if bound == float("inf") else _number(bound)
+                    bucket_labels = _format_labels(metric.labelnames, values, f'le="{le}"')
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                labels = _format_labels(metric.labelnames, values)
+                lines.append(f"{name}_sum{labels} {_number(child.sum)}")
+                lines.append(f"{name}_count{labels} {child.count}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry
+registry = Registry()
+counter = registry.counter
+gauge = registry.gauge
+histogram = registry.histogram
+add_collector = registry.add_collector
+collect = registry.collect
+snapshot = registry.snapshot
+render_prometheus = registry.render
+
+
+def instrument(family: str, name: Optional[str] = None):
+    """Record latency into <family>_seconds{name} and exceptions into <family>_errors_total.
+
+    Works on coroutine functions and plain functions; the wrapper keeps the
+    wrapped function's attributes (e.g. .cache from @cached).
+    """
+    def decorator(fn):
+        label = name or fn.__name__
+        seconds = histogram(f"{family}_seconds", f"Latency of {family} calls", ("name",)).labels(label)
+        errors = counter(f"{family}_errors_total", f"{family} calls that raised", ("name", "error"))
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                except Exception as e:
+                    errors.labels(label, type(e).__name__).inc()
+                    raise
+                finally:
+                    seconds.observe(time.perf_counter() - start)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                except Exception as e:
+                    errors.labels(label, type(e).__name__).inc()
+                    raise
+                finally:
+                    seconds.observe(time.perf_counter() - start)
+        return wrapper
+
+    return decorator
+
+
+def mongo_command_listener():
+    """pymongo CommandListener recording mongo_command_seconds{command, collection}"""
+    from pymongo import monitoring
+
+    seconds = histogram("mongo_command_seconds", "Latency of MongoDB commands", ("command", "collection"))
+    failures = counter("mongo_command_errors_total", "MongoDB commands that failed", ("command", "collection"))
+
+    class MongoCommandMetrics(monitoring.CommandListener):
+        def __init__(self):
+            self.commands: Dict[Tuple, Tuple[str, str]] = {}
+
+        def started(self, event):
+            collection = event.command.get(event.command_name)
+            self.commands[(event.connection_id, event.request_id)] = (
+                event.command_name, collection if isinstance(collection, str) else "")
+
+        def _finish(self, event, metric):
+            labels = self.commands.pop((event.connection_id, event.request_id), (event.command_name, ""))
+            seconds.labels(*labels).observe(event.duration_micros / 1e6)
+            if metric is not None:
+                metric.labels(*labels).inc()
+
+        def succeeded(self, event):
+            self._finish(event, None)
+
+        def failed(self, event):
+            self._finish(event, failures)
+
+    return MongoCommandMetrics()
+
+
+class MetricsServer:
+    """Minimal HTTP endpoint: GET /metrics (Prometheus) and /metrics.json (snapshot)"""
+
+    def __init__(self, registry: Registry = registry):
+        self.registry = registry
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str, port: int):
+        self.server = await asyncio.start_server(self._handle, host, port)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5)
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass  # Headers are not needed
+            parts = request.decode("latin-1").split()
+            path = parts[1].split("?", 1)[0] if len(parts) > 1 else ""
+            if path == "/metrics":
+                await self.registry.collect()
+                status, content_type = "200 OK", "text/plain; version=0.0.4; charset=utf-8"
+                body = self.registry.render().encode()
+            elif path == "/metrics.json":
+                await self.registry.collect()
+                status, content_type = "200 OK", "application/json"
+                body = json.dumps(self.registry.snapshot()).encode()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", b"not found\n"
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+
+async def serve_metrics(host: str = "0.0.0.0", port: int = 9100) -> MetricsServer:
+    """Start the metrics endpoint on the running loop"""
+    server = MetricsServer()
+    await server.start(host, port)
+    return server
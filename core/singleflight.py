@@ -0,0 +1,62 @@
+"""
+Single-flight loading
+
+Concurrent callers asking for the same key share one load: the first caller
+(the leader) runs it and everyone arriving meanwhile awaits its outcome.
+
+If the leader is cancelled, its waiters are not: the first of them to wake
+up runs the load itself and the rest share that attempt instead. A waiter
+that is cancelled only stops waiting. Errors raised by the load are
+shared like results.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _LeaderCancelled(Exception):
+    """Set on a flight whose leader was cancelled: a waiter takes over"""
+
+
+class SingleFlight:
+    """One load per key at a time; callers arriving meanwhile share it"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        """load()'s result, run once for all concurrent callers of this key"""
+        while True:
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            try:
+                return await asyncio.shield(inflight)
+            except _LeaderCancelled:
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await load()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an un-awaited future doesn't log a warning
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
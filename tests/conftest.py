@@ -0,0 +1,4 @@
+import os
+
+# Settings require an API key; tests never call the agent service
+os.environ.setdefault("AGENTICA_API_KEY", "test")
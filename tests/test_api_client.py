@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+from benchmarks.api_client import start_stub
+from config.settings import settings
+from core.exceptions import NodeJSAPIError
+from tools.api_client import NodeJSClient
+
+
+@pytest.fixture
+async def stub(monkeypatch):
+    monkeypatch.setattr(settings, "nodejs_api_retry_backoff_ms", 1)
+    url, state, server = start_stub()
+    client = NodeJSClient(base_url=url)
+    yield client, state
+    await client.close()
+    server.shutdown()
+
+
+async def test_identical_gets_are_coalesced(stub):
+    client, state = stub
+    products = await asyncio.gather(*(client.get_product("p1") for _ in range(50)),
+                                    *(client.search_products("shirt") for _ in range(50)))
+    assert all(product == {"_id": "p1", "price": 10} for product in products[:50])
+    assert state.hits["/products/p1"] == 1
+    assert state.hits["/search"] == 1
+    assert client.coalesced == 98
+
+
+async def test_different_params_are_not_coalesced(stub):
+    client, state = stub
+    await asyncio.gather(client.search_products("shirt"), client.search_products("shoes"))
+    assert state.hits["/search"] == 2
+
+
+async def test_list_filters_are_coalesced(stub):
+    client, state = stub
+    await asyncio.gather(*(client.get_products(category=["tops", "shoes"], max_price=50) for _ in range(5)),
+                         client.get_products(max_price=50, category=["tops", "shoes"]),
+                         client.get_products(category=["shoes", "tops"], max_price=50))
+    assert state.hits["/products"] == 2
+    assert client.coalesced == 5
+
+
+async def test_gets_are_retried_through_503s(stub):
+    client, state = stub
+    state.fail_next = 2
+    assert (await client.get_product("p2"))["_id"] == "p2"
+    assert state.hits["/products/p2"] == 3
+    assert client.retried == 2
+
+
+async def test_retries_give_up_with_the_last_status(stub):
+    client, state = stub
+    state.fail_next = client.retries + 1
+    with pytest.raises(NodeJSAPIError) as raised:
+        await client.get_product("p3")
+    assert raised.value.status_code == 503
+    assert state.hits["/products/p3"] == client.retries + 1
+
+
+async def test_client_errors_are_not_retried(stub):
+    client, state = stub
+    with pytest.raises(NodeJSAPIError) as raised:
+        await client.get_product("missing-1")
+    assert raised.value.status_code == 404
+    assert state.hits["/products/missing-1"] == 1
+
+
+async def test_bulk_fetch_fans_out_with_bounded_concurrency(stub):
+    client, state = stub
+    ids = [f"b{i}" for i in range(40)]
+    products = await client.get_products_bulk(ids + ids[:5] + ["missing-1"], concurrency=8)
+    assert list(products) == ids
+    assert sum(state.hits[f"/products/{product_id}"] for product_id in ids) == 40
+    assert 1 < state.peak_in_flight <= 8
@@ -0,0 +1,43 @@
+import json
+from agents.events import bus
+from agents.events.abandonment import CartAbandonmentDetector
+
+ITEM = {"user_id": "u1", "product_id": "p1", "qty": 1, "price": 10.0}
+
+
+async def deliver(handler, message_id, data):
+    token = bus._message_id.set(message_id)
+    try:
+        await handler(data)
+    finally:
+        bus._message_id.reset(token)
+
+
+async def test_activity_is_timed_by_the_stream_entry_id():
+    detector = CartAbandonmentDetector(timeout_s=60, snapshot_path="", clock=lambda: 10_000.0)
+    await deliver(detector.handle_item_added, "1000000-0", ITEM)
+    assert detector.carts["u1"][0] == 1000.0
+
+    await deliver(detector.handle_cart_updated, "900000-0",
+                  {"user_id": "u1", "total_qty": 2, "total_price": 20.0})
+    assert detector.carts["u1"][0] == 1000.0  # Late event doesn't make the cart older or newer
+    assert [cart["user_id"] for cart in detector.due(now=1061.0)] == ["u1"]
+
+
+async def test_item_added_redelivered_after_restore_is_counted_once():
+    detector = CartAbandonmentDetector(timeout_s=60, snapshot_path="")
+    await deliver(detector.handle_item_added, "1000000-0", ITEM)
+    await deliver(detector.handle_item_added, "1000001-0", ITEM)
+    state = json.loads(json.dumps({"carts": detector._rows()}))  # As snapshotted
+
+    restarted = CartAbandonmentDetector(timeout_s=60, snapshot_path="")
+    assert restarted.restore(state) == 1
+    await deliver(restarted.handle_item_added, "1000001-0", ITEM)  # Never acked before the crash
+    await deliver(restarted.handle_item_added, "1000002-0", ITEM)
+    assert restarted.carts["u1"][1:3] == [3, 30.0]
+
+
+def test_restores_snapshots_without_applied_ids():
+    detector = CartAbandonmentDetector(timeout_s=60, snapshot_path="")
+    assert detector.restore({"carts": [["u1", 1000.0, 2, 20.0]]}) == 1
+    assert detector.carts["u1"] == [1000.0, 2, 20.0, ()]
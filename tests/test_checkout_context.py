@@ -0,0 +1,108 @@
+import asyncio
+from tools import checkout_tools
+
+CART = {"items": {"p1": {"qty": 1, "price": 100.0}}, "totalQty": 1, "totalPrice": 100.0}
+
+
+async def test_pricing_uses_the_customers_tier(monkeypatch):
+    priced_with = []
+
+    async def cart(user_id, view=None):
+        assert view == "items"  # Only the fields checkout reads
+        return CART
+
+    async def tier(user_id):
+        await asyncio.sleep(0.01)  # Arrives after the cart
+        return "gold"
+
+    async def inventory(cart):
+        return {"valid": True, "out_of_stock": []}
+
+    async def total(cart, tier=None):
+        priced_with.append(tier)
+        return 90.0
+
+    monkeypatch.setattr(checkout_tools, "get_user_cart_items", cart)
+    monkeypatch.setattr(checkout_tools, "get_user_tier", tier)
+    monkeypatch.setattr(checkout_tools, "validate_cart_inventory", inventory)
+    monkeypatch.setattr(checkout_tools, "calculate_cart_total", total)
+
+    context = await checkout_tools.get_checkout_context("u1", deadline_ms=1000)
+    assert priced_with == ["gold"]
+    assert context["tier"] == "gold"
+    assert context["total_price"] == 90.0
+    assert context["complete"]
+
+
+async def test_degraded_cart_still_returns(monkeypatch):
+    async def cart(user_id, view=None):
+        raise RuntimeError("down")
+
+    async def tier(user_id):
+        return "silver"
+
+    monkeypatch.setattr(checkout_tools, "get_user_cart_items", cart)
+    monkeypatch.setattr(checkout_tools, "get_user_tier", tier)
+
+    context = await checkout_tools.get_checkout_context("u1", deadline_ms=1000)
+    assert context["degraded"] == {"cart": "error"}
+    assert context["total_price"] == 0
+
+
+async def test_checkout_id_reserves_instead_of_reading(monkeypatch):
+    reserved = []
+
+    async def cart(user_id, view=None):
+        return CART
+
+    async def tier(user_id):
+        return "gold"
+
+    async def validate(cart):
+        raise AssertionError("stock must be reserved, not just read")
+
+    async def reserve(cart, checkout_id):
+        reserved.append(checkout_id)
+        return {"_id": checkout_id, "status": "held"}
+
+    async def total(cart, tier=None):
+        return 90.0
+
+    monkeypatch.setattr(checkout_tools, "get_user_cart_items", cart)
+    monkeypatch.setattr(checkout_tools, "get_user_tier", tier)
+    monkeypatch.setattr(checkout_tools, "validate_cart_inventory", validate)
+    monkeypatch.setattr(checkout_tools, "reserve_cart_inventory", reserve)
+    monkeypatch.setattr(checkout_tools, "calculate_cart_total", total)
+
+    context = await checkout_tools.get_checkout_context("u1", deadline_ms=1000, checkout_id="c1")
+    assert reserved == ["c1"]
+    assert context["reserved"] and context["inventory_valid"]
+    assert context["complete"]
+
+
+async def test_unavailable_stock_is_reported_not_reserved(monkeypatch):
+    from core.exceptions import InventoryUnavailableError
+    missing = [{"product_id": "p1", "requested": 1, "available": 0}]
+
+    async def cart(user_id, view=None):
+        return CART
+
+    async def tier(user_id):
+        return "gold"
+
+    async def reserve(cart, checkout_id):
+        raise InventoryUnavailableError("1 item(s) unavailable: p1", items=missing)
+
+    async def total(cart, tier=None):
+        return 90.0
+
+    monkeypatch.setattr(checkout_tools, "get_user_cart_items", cart)
+    monkeypatch.setattr(checkout_tools, "get_user_tier", tier)
+    monkeypatch.setattr(checkout_tools, "reserve_cart_inventory", reserve)
+    monkeypatch.setattr(checkout_tools, "calculate_cart_total", total)
+
+    context = await checkout_tools.get_checkout_context("u1", deadline_ms=1000, checkout_id="c1")
+    assert context["inventory_valid"] is False
+    assert context["out_of_stock"] == missing
+    assert not context["reserved"]
+    assert context["complete"]
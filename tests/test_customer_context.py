@@ -0,0 +1,47 @@
+from agents.events import bus as bus_module
+from config.settings import settings
+from tools.customer_context import CustomerContextStore
+
+
+def context(customer_id):
+    return {"customer_id": customer_id, "profile": {"total_spent": 0}, "tier": "bronze",
+            "cart": {"items": {}, "totalQty": 0, "totalPrice": 0}, "orders": [], "loaded_at": 0}
+
+
+async def load(customer_id):
+    return context(customer_id)
+
+
+async def test_redelivered_item_added_is_applied_once():
+    store = CustomerContextStore(loader=load, shared=False)
+    await store.get("u1")
+    event = {"user_id": "u1", "product_id": "p1", "qty": 2, "price": 5.0}
+
+    for message_id in ("1-0", "1-0", "2-0"):
+        token = bus_module._message_id.set(message_id)
+        try:
+            await store.handle_cart_item_added(event)
+        finally:
+            bus_module._message_id.reset(token)
+
+    cart = (await store.get("u1"))["cart"]
+    assert cart["items"]["p1"] == {"qty": 4, "price": 20.0}
+    assert (cart["totalQty"], cart["totalPrice"]) == (4, 20.0)
+
+
+async def test_local_copies_expire_quickly_without_redis():
+    store = CustomerContextStore(loader=load, shared=False, ttl_s=1800)
+    assert store.contexts.ttl == settings.customer_context_local_ttl_s
+
+
+async def test_payment_moves_tier_and_empties_cart():
+    store = CustomerContextStore(loader=load, shared=False)
+    await store.get("u1")
+    payment = {"user_id": "u1", "order_id": "o1", "amount": 100_000}
+    await store.handle_payment_completed(payment)
+    await store.handle_payment_completed(payment)
+    updated = await store.get("u1")
+    assert updated["profile"]["total_spent"] == 100_000
+    assert len(updated["orders"]) == 1
+    assert updated["tier"] != "bronze"
+    assert updated["cart"]["totalQty"] == 0
@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+from agents.events.bus import EventBus, dead_letter_stream
+from config.settings import settings
+
+fakeredis = pytest.importorskip("fakeredis")
+
+STREAM = "events:product.viewed"
+
+
+@pytest.fixture
+async def bus(monkeypatch):
+    monkeypatch.setattr(settings, "event_claim_idle_ms", 1)
+    bus = EventBus(group="test", consumer_name="here", batch_size=10, workers_per_stream=1)
+    bus.async_redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    await bus.async_redis.xgroup_create(STREAM, bus.group, id="0", mkstream=True)
+    yield bus
+    await bus._drain()
+
+
+async def deliver(bus, consumer, data='{"user_id": "u1", "product_id": "p1"}'):
+    """Publish one event and read it as `consumer`; its stream entry ID"""
+    await bus.async_redis.xadd(STREAM, {"type": "product.viewed", "data": data})
+    [(_, [(message_id, fields)])] = await bus.async_redis.xreadgroup(bus.group, consumer, {STREAM: ">"})
+    # fakeredis leaves XREADGROUP replies as bytes even with decode_responses
+    return message_id.decode(), {key.decode(): value.decode() for key, value in fields.items()}
+
+
+async def claim(bus):
+    await asyncio.sleep(0.01)  # Past event_claim_idle_ms
+    await bus._claim_stale(STREAM)
+
+
+async def pending(bus):
+    return {entry["message_id"]: entry for entry in
+            await bus.async_redis.xpending_range(STREAM, bus.group, min="-", max="+", count=100)}
+
+
+async def test_claim_leaves_messages_still_in_flight_here(bus, monkeypatch):
+    bus._start_workers({STREAM: ">"})
+    dispatched = []
+
+    async def dispatch(stream, message_id, fields):
+        dispatched.append(message_id)
+
+    ours, _ = await deliver(bus, "here")
+    bus._inflight[STREAM].add(ours)  # Queued or being handled locally
+    theirs, _ = await deliver(bus, "crashed")
+    monkeypatch.setattr(bus, "_dispatch", dispatch)
+
+    await claim(bus)
+    assert dispatched == [theirs]
+    entries = await pending(bus)
+    assert entries[ours]["times_delivered"] == 1
+    assert entries[theirs]["consumer"] == "here"
+
+
+async def test_failed_handler_leaves_the_message_pending_for_a_retry(bus):
+    calls = []
+
+    async def flaky(data):
+        calls.append(data)
+        if len(calls) == 1:
+            raise RuntimeError("transient")
+
+    bus.subscribe("product.viewed", flaky)
+    bus._start_workers({STREAM: ">"})
+    message_id, fields = await deliver(bus, "here")
+
+    await bus._dispatch(STREAM, message_id, fields)
+    await bus._queues[STREAM][0].join()
+    await bus._flush_acks()
+    assert message_id in await pending(bus)
+    assert not bus._inflight[STREAM]
+
+    await claim(bus)
+    await bus._queues[STREAM][0].join()
+    await bus._flush_acks()
+    assert len(calls) == 2
+    assert await pending(bus) == {}
+
+
+async def test_retries_end_in_the_dead_letter_stream(bus, monkeypatch):
+    monkeypatch.setattr(settings, "event_max_deliveries", 1)
+    bus._start_workers({STREAM: ">"})
+    message_id, _ = await deliver(bus, "crashed")
+
+    await claim(bus)
+    [(_, dead)] = await bus.async_redis.xrange(dead_letter_stream(STREAM))
+    assert dead["source_id"] == message_id and dead["deliveries"] == "2"
+    assert await pending(bus) == {}
+
+
+async def test_undecodable_events_are_dead_lettered_with_their_raw_fields(bus):
+    calls = []
+    bus.subscribe("product.viewed", calls.append)
+    bus._start_workers({STREAM: ">"})
+    message_id, fields = await deliver(bus, "here", data="{not json")
+
+    await bus._dispatch(STREAM, message_id, fields)
+    await bus._queues[STREAM][0].join()
+    assert calls == []
+    [(_, dead)] = await bus.async_redis.xrange(dead_letter_stream(STREAM))
+    assert dead["data"] == "{not json" and dead["reason"] == "undecodable"
+    assert dead["source_id"] == message_id
+    assert await pending(bus) == {}
@@ -0,0 +1,45 @@
+import time
+import pytest
+from agents.events import codec
+from agents.events.codec import CodecNegotiator, decode_event, encode_event
+
+pytestmark = pytest.mark.skipif(codec.msgpack is None, reason="msgpack not installed")
+
+
+def advertisement(codecs, age_s=0):
+    return f"{codecs};{int(time.time() - age_s)}"
+
+
+@pytest.mark.parametrize("advertised, binary", [
+    ({}, False),
+    ({"worker-1": advertisement("msgpack,json", age_s=10_000)}, False),
+    ({"worker-1": advertisement("msgpack,json")}, True),
+    ({"worker-1": advertisement("msgpack,json"), "worker-2": advertisement("json")}, False),
+    ({"worker-1": advertisement("msgpack,json"), "worker-2": advertisement("json", age_s=10_000)}, True),
+])
+def test_auto_negotiation(advertised, binary):
+    assert CodecNegotiator("auto")._decide(advertised) is binary
+
+
+def test_msgpack_round_trip_keeps_undeclared_keys():
+    data = {"user_id": "u1", "product_id": "p1", "qty": 2, "price": 9.5, "note": "gift"}
+    fields = encode_event("cart.item.added", data, binary=True)
+    assert fields["codec"] == "msgpack"
+    assert decode_event("cart.item.added", fields) == data
+
+
+@pytest.mark.parametrize("binary", [False, True])
+@pytest.mark.parametrize("data, error", [
+    ({"user_id": "u1", "product_id": "p1", "qty": "2", "price": 9.5}, "qty is str, not int"),
+    ({"user_id": "u1", "product_id": "p1", "qty": True, "price": 9.5}, "qty is bool, not int"),
+    ({"user_id": "u1", "qty": 2, "price": 9.5}, "product_id is missing"),
+    ({"user_id": "u1", "product_id": None, "qty": 2, "price": 9.5}, "product_id is missing"),
+    ({"user_id": "u1", "product_id": "p1", "qty": 2, "price": "9.5"}, "price is str, not int or float"),
+])
+def test_payloads_that_dont_match_the_schema_are_rejected(binary, data, error):
+    with pytest.raises(ValueError, match=error):
+        encode_event("cart.item.added", data, binary=binary)
+
+
+def test_event_types_without_a_schema_are_not_checked():
+    assert decode_event("custom.event", encode_event("custom.event", {"anything": 1})) == {"anything": 1}
@@ -0,0 +1,95 @@
+import base64
+import json
+from datetime import datetime
+import pytest
+from bson import Decimal128, ObjectId
+from tools import pagination
+from tools.pagination import ContinuationToken
+
+mongomock = pytest.importorskip("mongomock")
+
+
+class _Cursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def sort(self, order):
+        return _Cursor(self.cursor.sort(order))
+
+    def limit(self, n):
+        return _Cursor(self.cursor.limit(n))
+
+    async def to_list(self):
+        return list(self.cursor)
+
+
+class _Collection:
+    """Async find() over a mongomock collection, as pagination uses it"""
+
+    def __init__(self, docs):
+        self.collection = mongomock.MongoClient().db.products
+        self.collection.insert_many(docs)
+
+    def find(self, query, projection=None):
+        return _Cursor(self.collection.find(query, projection))
+
+
+def products():
+    # Ties on price, missing and null prices, and ids out of price order
+    prices = [5, None, 3, 5, 7, 3, None, 5, 3, 7, 1]
+    return [{"_id": ObjectId(), "price": price} for price in prices] + [{"_id": ObjectId()}]
+
+
+async def all_pages(collection, sort, descending, page_size=2):
+    seen, token = [], None
+    while True:
+        result = await pagination.page(collection, {}, sort=sort, descending=descending,
+                                       page_size=page_size, token=token)
+        seen += [doc["_id"] for doc in result["items"]]
+        token = result["next_token"]
+        if token is None:
+            return seen
+
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("sort", ["price", "_id"])
+async def test_pages_follow_sort_order_through_nulls_and_ties(sort, descending):
+    docs = products()
+    collection = _Collection(docs)
+    direction = -1 if descending else 1
+    order = [("_id", direction)] if sort == "_id" else [(sort, direction), ("_id", direction)]
+    expected = [doc["_id"] for doc in collection.collection.find({}).sort(order)]
+
+    assert await all_pages(collection, sort, descending) == expected
+    streamed = [doc["_id"] async for doc in pagination.stream(collection, {}, sort=sort,
+                                                               descending=descending, batch_size=3)]
+    assert streamed == expected
+
+
+async def test_pages_sorted_by_date():
+    start = datetime(2026, 1, 1)
+    docs = [{"_id": ObjectId(), "date": start.replace(day=day)} for day in (3, 1, 2, 2, 5, 1)]
+    collection = _Collection(docs)
+    expected = [doc["_id"] for doc in collection.collection.find({}).sort([("date", 1), ("_id", 1)])]
+    assert await all_pages(collection, "date", False) == expected
+
+
+@pytest.mark.parametrize("value", [datetime(2026, 10, 18, 12, 30, 15, 123000), ObjectId(),
+                                   Decimal128("19.99"), None, 12.5, "Linen Shirt"])
+def test_token_round_trips_bson_values(value):
+    last_id = ObjectId()
+    decoded = ContinuationToken.decode(ContinuationToken("price", True, value, last_id).encode())
+    assert (decoded.sort, decoded.descending, decoded.value, decoded.last_id) == ("price", True, value, last_id)
+    assert type(decoded.value) is type(value)
+
+
+def test_tokens_from_the_previous_format_still_decode():
+    last_id = ObjectId()
+    raw = json.dumps(["price", False, 9.5, str(last_id), True]).encode()
+    decoded = ContinuationToken.decode(base64.urlsafe_b64encode(raw).decode().rstrip("="))
+    assert (decoded.value, decoded.last_id) == (9.5, last_id)
+
+
+def test_garbage_tokens_are_rejected():
+    with pytest.raises(ValueError, match="Invalid continuation token"):
+        ContinuationToken.decode("not-a-token")
@@ -0,0 +1,41 @@
+import numpy as np
+from tools import price_history as price_history_module
+from tools.pricing_engine import BatchPricingEngine, PriceBook, tier_multiplier
+
+PRODUCTS = [
+    {"_id": "a", "price": 100.0, "base_price": 100.0, "quantity": 1},
+    {"_id": "b", "price": 50.0, "base_price": 50.0, "quantity": 1},
+    {"_id": "c", "price": 20.0, "base_price": 20.0, "quantity": 500},
+]
+
+
+def test_tier_discount_applies_to_cart():
+    cart = {"items": {"a": {"qty": 2, "price": 200.0, "item": {}}}, "totalPrice": 200.0}
+    priced = BatchPricingEngine().price_cart(cart, tier="gold", promotions=[])
+    assert priced["total"] == round(200.0 * tier_multiplier("gold"), 2)
+
+
+async def test_reprice_skips_products_changed_concurrently(monkeypatch):
+    engine = BatchPricingEngine(low_stock_threshold=10)
+    book = PriceBook.from_documents(PRODUCTS)
+    recorded, published = [], []
+
+    async def persist(ids, old, new):
+        return {"a"}  # "b" was repriced by hand meanwhile
+
+    async def record_many(ticks):
+        recorded.extend(pid for pid, _, _ in ticks)
+
+    async def publish(ids, old, new):
+        published.extend(ids)
+
+    monkeypatch.setattr(engine, "_persist", persist)
+    monkeypatch.setattr(engine, "_publish", publish)
+    monkeypatch.setattr(price_history_module.price_history, "record_many", record_many)
+
+    result = await engine.reprice_catalog(book)
+    assert result["changed"] == 1
+    assert recorded == published == ["a"]
+    assert book.price[0] != 100.0
+    assert book.price[1] == 50.0
+    assert np.isclose(book.price[2], 20.0)
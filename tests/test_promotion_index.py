@@ -0,0 +1,38 @@
+from tools.promotion_index import PromotionIndex
+
+
+def promotion(promotion_id, starts=None, ends=None, **scope):
+    return {"_id": promotion_id, "discount_type": "percent", "value": 10,
+            "starts_at": starts, "ends_at": ends, **scope}
+
+
+def test_ended_promotions_leave_every_index():
+    index = PromotionIndex(clock=lambda: 0)
+    index.add(promotion("scoped", ends=10, product_ids=["p1"], categories=["tops"], tiers=["gold"]))
+    index.add(promotion("sitewide", ends=10))
+    index.add(promotion("flash", starts=5, ends=6, departments=["men"]))
+    index.add(promotion("open"))
+    assert {p.id for p in index.candidates("p1", "tops", "men", "gold", at=1)} == {"scoped", "sitewide", "open"}
+
+    assert {p.id for p in index.candidates("p1", "tops", "men", "gold", at=20)} == {"open"}
+    assert set(index.promotions) == {"open"}
+    assert not index.by_product and not index.by_category and not index.by_department
+    assert not index.by_tier
+    assert index.sitewide == {"open"}
+    assert index.active == {"open"}
+
+
+def test_adding_an_ended_promotion_keeps_nothing():
+    index = PromotionIndex(clock=lambda: 100)
+    index.candidates("p1", at=100)
+    index.add(promotion("old", starts=10, ends=20, product_ids=["p1"]))
+    assert not index.promotions and not index.by_product
+
+
+def test_upcoming_promotion_switches_on_then_off():
+    index = PromotionIndex(clock=lambda: 0)
+    index.add(promotion("later", starts=10, ends=20, categories=["tops"]))
+    assert index.candidates("p1", "tops", at=5) == []
+    assert [p.id for p in index.candidates("p1", "tops", at=15)] == ["later"]
+    assert index.candidates("p1", "tops", at=25) == []
+    assert not index.promotions
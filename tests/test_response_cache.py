@@ -0,0 +1,79 @@
+import pytest
+from agents.response_cache import AgentResponseCache, normalize_query, terms
+from tools.cache import _MISSING
+
+
+async def answer(cache, query, response):
+    async def call():
+        return response
+    return await cache.get_or_call(query, call)
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("show me mens running shoes under 1000", "show me womens running shoes under 1000"),
+    ("is the blue shirt in stock", "is the blue skirt in stock"),
+    ("iphone 15 pro", "iphone 15 pro max"),
+    ("hotels in indiana", "hotels in india"),
+    ("shoes under 1000", "shoes under 2000"),
+])
+async def test_near_match_rejects_different_content_words(cached, asked):
+    cache = AgentResponseCache(ttl_s=60, maxsize=100, similarity=0.8)
+    await answer(cache, cached, "cached")
+    assert cache.lookup(asked) is _MISSING
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("running shoes under 1000", "show me the running shoes under 1000"),
+    ("red dress", "red dresses"),
+    ("Wireless Headphones", "wireless headphone"),
+])
+async def test_near_match_ignores_stopwords_and_plurals(cached, asked):
+    cache = AgentResponseCache(ttl_s=60, maxsize=100, similarity=0.5)
+    await answer(cache, cached, "cached")
+    assert cache.lookup(asked) == "cached"
+    assert cache.stats()["near_hits"] == 1
+
+
+def test_terms_keep_comparisons_and_numbers():
+    assert terms(normalize_query("Shoes UNDER 1000")) == {"shoe", "under", "1000"}
+    assert terms(normalize_query("batteries over 50")) == {"battery", "over", "50"}
+
+
+async def test_exact_match_and_invalidation():
+    cache = AgentResponseCache(ttl_s=60, maxsize=100)
+    await answer(cache, "Red  Dress", "first")
+    assert cache.lookup("red dress") == "first"
+    cache.invalidate()
+    assert cache.lookup("red dress") is _MISSING
+
+
+async def test_a_burst_of_catalog_changes_clears_once():
+    cache = AgentResponseCache(ttl_s=60, maxsize=100)
+    await answer(cache, "red dress", "before")
+    for _ in range(1000):
+        await cache.handle_catalog_changed({"product_id": "p1"})
+    assert cache.lookup("red dress") is _MISSING
+    assert cache.stats()["invalidations"] == 1
+
+    await answer(cache, "red dress", "during")
+    assert cache.lookup("red dress") == "during"
+    await cache.handle_catalog_changed({"product_id": "p2"})
+    assert cache.lookup("red dresses") is _MISSING  # Near match is stale too
+    assert cache.lookup("red dress") is _MISSING
+    assert await answer(cache, "red dress", "after") == "after"
+    assert cache.lookup("red dress") == "after"
+
+
+async def test_stats_are_exported_as_gauges(monkeypatch):
+    from agents import response_cache
+    from core import metrics
+    cache = AgentResponseCache(ttl_s=60, maxsize=100)
+    monkeypatch.setattr(response_cache, "agent_response_cache", response_cache.LazySingleton(lambda: cache))
+    response_cache.agent_response_cache.get()
+    await answer(cache, "red dress", "cached")
+    cache.lookup("red dress")
+
+    await metrics.collect()
+    snapshot = metrics.snapshot()
+    assert snapshot["agent_cache_hit_ratio"]["samples"][0]["value"] == 0.5
+    assert "agent_cache_latency_saved_ms" in snapshot
@@ -0,0 +1,23 @@
+from agents.events.event_types import EventType
+from agents.events.retention import RETENTION_POLICIES, publish_maxlen
+from config.settings import settings
+
+
+def test_age_only_policies_are_not_trimmed_by_count(monkeypatch):
+    for archive_dir in ("", "data/archive"):
+        monkeypatch.setattr(settings, "event_archive_dir", archive_dir)
+        assert publish_maxlen(EventType.PAYMENT_COMPLETED) is None
+        assert publish_maxlen(EventType.PRICE_CHANGED) is None
+
+
+def test_length_policies_cap_xadd(monkeypatch):
+    max_len = RETENTION_POLICIES[EventType.CART_ITEM_ADDED].max_len
+    monkeypatch.setattr(settings, "event_archive_dir", "")
+    assert publish_maxlen(EventType.CART_ITEM_ADDED) == max_len
+    monkeypatch.setattr(settings, "event_archive_dir", "data/archive")
+    assert publish_maxlen(EventType.CART_ITEM_ADDED) == max_len * settings.event_stream_hard_cap_factor
+
+
+def test_types_without_a_policy_use_the_default(monkeypatch):
+    monkeypatch.setattr(settings, "event_archive_dir", "")
+    assert publish_maxlen(EventType.USER_LOGIN) == settings.event_stream_max_len
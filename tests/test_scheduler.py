@@ -0,0 +1,150 @@
+import asyncio
+import pytest
+from agents import scheduler as scheduler_module
+from agents.scheduler import AgentScheduler, Priority, _ModelPool, _Waiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler_module.time, "monotonic", clock)
+    return clock
+
+
+def waiter(user_id="u", priority=Priority.BROWSING, tokens=1):
+    return _Waiter(asyncio.get_running_loop().create_future(), user_id, priority, tokens)
+
+
+def admitted(waiters):
+    return [w for w in waiters if w.future.done()]
+
+
+async def test_bucket_refills_at_rate_up_to_capacity(clock):
+    pool = _ModelPool("m", concurrency=10, tokens_per_minute=600, burst_s=2.0)
+    assert (pool.rate, pool.capacity) == (10.0, 20.0)
+    pool.tokens = 0.0
+    clock.now += 1.5
+    pool.dispatch()
+    assert pool.tokens == pytest.approx(15.0)
+    clock.now += 60
+    pool.dispatch()
+    assert pool.tokens == pool.capacity
+
+
+async def test_waiter_is_admitted_once_tokens_refill(clock):
+    pool = _ModelPool("m", concurrency=10, tokens_per_minute=600, burst_s=1.0)
+    first, second = waiter(tokens=10), waiter(tokens=10)
+    pool.enqueue(first)
+    pool.enqueue(second)
+    assert admitted([first, second]) == [first]
+    assert pool._timer is not None
+    clock.now += 0.5
+    pool.dispatch()
+    assert not second.future.done()
+    clock.now += 0.5
+    pool.dispatch()
+    assert second.future.result() == 10
+    pool._timer.cancel()
+
+
+async def test_oversized_reservation_is_capped_at_capacity(clock):
+    pool = _ModelPool("m", concurrency=10, tokens_per_minute=600, burst_s=1.0)
+    big = waiter(tokens=10_000)
+    pool.enqueue(big)
+    assert big.future.result() == pool.capacity
+
+
+async def test_users_in_a_class_take_turns(clock):
+    pool = _ModelPool("m", concurrency=1, tokens_per_minute=600_000, burst_s=1.0)
+    waiters = [waiter("a"), waiter("a"), waiter("a"), waiter("b"), waiter("c")]
+    order = []
+    for w in waiters:
+        w.future.add_done_callback(lambda _, w=w: order.append(w))
+        pool.enqueue(w)
+    for _ in waiters:
+        await asyncio.sleep(0)
+        pool.release(1, 1, failed=False)
+    await asyncio.sleep(0)
+    assert [w.user_id for w in order] == ["a", "a", "b", "c", "a"]
+
+
+async def test_higher_priority_is_admitted_first(clock):
+    pool = _ModelPool("m", concurrency=1, tokens_per_minute=600_000, burst_s=1.0)
+    running = waiter()
+    pool.enqueue(running)
+    background = waiter("x", Priority.BACKGROUND)
+    browsing = waiter("y", Priority.BROWSING)
+    checkout = waiter("z", Priority.CHECKOUT)
+    for w in (background, browsing, checkout):
+        pool.enqueue(w)
+    assert pool.ahead_of(Priority.BROWSING) == 2
+    pool.release(1, 1, failed=False)
+    assert admitted([background, browsing, checkout]) == [checkout]
+
+
+async def test_release_refunds_overestimates_and_charges_underestimates(clock):
+    pool = _ModelPool("m", concurrency=2, tokens_per_minute=600, burst_s=10.0)
+    call = waiter(tokens=40)
+    pool.enqueue(call)
+    assert pool.tokens == 60
+    pool.release(40, 10, failed=False)
+    assert pool.tokens == 90
+    pool.enqueue(waiter(tokens=50))
+    pool.release(50, 120, failed=False)
+    assert pool.tokens == -30
+    assert pool.stats()["tokens_used"] == 130
+
+
+async def test_discarded_waiter_leaves_the_queue(clock):
+    pool = _ModelPool("m", concurrency=1, tokens_per_minute=600_000, burst_s=1.0)
+    pool.enqueue(waiter("a"))
+    gone = waiter("b")
+    pool.enqueue(gone)
+    pool.discard(gone)
+    assert pool.depth[Priority.BROWSING] == 0
+    assert "b" not in pool.queues[Priority.BROWSING]
+
+
+async def test_full_queue_sheds_to_the_fallback():
+    scheduler = AgentScheduler(limits={"m": {"concurrency": 1}},
+                               queue_max_depth={"browsing": 1})
+    release = asyncio.Event()
+
+    async def call():
+        await release.wait()
+        return "model"
+
+    async def fallback():
+        return "cached"
+
+    running = asyncio.create_task(scheduler.run("m", call))
+    await asyncio.sleep(0)
+    queued = asyncio.create_task(scheduler.run("m", call))
+    await asyncio.sleep(0)
+    assert await scheduler.run("m", call, fallback=fallback) == "cached"
+    release.set()
+    assert await asyncio.gather(running, queued) == ["model", "model"]
+    stats = scheduler.stats()["m"]["priorities"]["browsing"]
+    assert (stats["admitted"], stats["shed"]) == (2, 1)
+
+
+async def test_queue_timeout_raises_without_a_fallback():
+    from core.exceptions import AgentOverloadedError
+    scheduler = AgentScheduler(limits={"m": {"concurrency": 1}},
+                               queue_timeout_ms={"background": 10})
+    release = asyncio.Event()
+    running = asyncio.create_task(scheduler.run("m", release.wait, priority=Priority.BACKGROUND))
+    await asyncio.sleep(0)
+    with pytest.raises(AgentOverloadedError):
+        await scheduler.run("m", release.wait, priority=Priority.BACKGROUND)
+    release.set()
+    await running
+    assert scheduler.pool("m").depth == [0] * len(Priority)
@@ -0,0 +1,115 @@
+import math
+import pytest
+from tools.search_index import FIELD_WEIGHTS, PREFIX_PENALTY, ProductSearchIndex
+
+
+def catalog():
+    return [
+        {"_id": "p1", "title": "Linen shirt", "description": "Breathable summer shirt",
+         "category": "tops", "department": "men"},
+        {"_id": "p2", "title": "Denim jacket", "description": "Pairs well with a linen shirt",
+         "category": "outerwear", "department": "men"},
+        {"_id": "p3", "title": "Linen trousers", "description": "Relaxed fit",
+         "category": "bottoms", "department": "women"},
+        {"_id": "p4", "title": "Shirt dress", "description": "Cotton, knee length",
+         "category": "dresses", "department": "women"},
+        {"_id": "p5", "title": "Wool scarf", "description": "Warm and soft",
+         "category": "accessories", "department": "women"},
+    ]
+
+
+def ids(results):
+    return [doc["_id"] for doc in results]
+
+
+def bm25(index, query_terms, doc_id):
+    """Reference BM25F score computed from the documents, not the postings"""
+    doc = index.docs[doc_id]
+    tf = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        for token in str(doc.get(field) or "").lower().split():
+            tf[token.strip(",.")] = tf.get(token.strip(",."), 0) + weight
+    length = sum(tf.values())
+    avg = sum(index.doc_lengths.values()) / len(index.docs)
+    score = 0.0
+    for term in query_terms:
+        if term not in tf:
+            continue
+        df = sum(1 for other in index.doc_terms.values() if term in other)
+        idf = math.log(1 + (len(index.docs) - df + 0.5) / (df + 0.5))
+        norm = index.k1 * (1 - index.b + index.b * length / avg)
+        score += idf * tf[term] * (index.k1 + 1) / (tf[term] + norm)
+    return score
+
+
+def test_scores_match_bm25():
+    index = ProductSearchIndex()
+    index.add_many(catalog())
+    results = index.search("linen shirt", limit=5)
+    expected = sorted((doc_id for doc_id in index.docs if bm25(index, ["linen", "shirt"], doc_id) > 0),
+                      key=lambda doc_id: -bm25(index, ["linen", "shirt"], doc_id))
+    assert ids(results) == expected
+    assert ids(results)[0] == "p1"  # Both terms in the title
+
+
+def test_title_hits_outrank_description_hits():
+    index = ProductSearchIndex()
+    index.add_many(catalog())
+    assert ids(index.search("jacket")) == ["p2"]
+    assert ids(index.search("linen"))[-1] == "p2"  # Only in its description
+
+
+def test_last_token_matches_as_a_prefix_below_exact_terms():
+    index = ProductSearchIndex()
+    index.add_many(catalog())
+    assert set(ids(index.search("sh"))) == {"p1", "p2", "p4"}
+    # Same length and document frequency: only the prefix penalty separates them
+    index.add({"_id": "knitwear", "title": "Knitwear"})
+    index.add({"_id": "knit", "title": "Knit"})
+    assert ids(index.search("knit")) == ["knit", "knitwear"]
+    assert index._expand("knit") == {"knit": 1.0, "knitwear": PREFIX_PENALTY}
+    assert ids(index.search("scar")) == ["p5"]
+    assert "p5" not in ids(index.search("scar linen"))  # Only the last token is a prefix
+
+
+def test_category_and_department_filters():
+    index = ProductSearchIndex()
+    index.add_many(catalog())
+    assert ids(index.search("shirt", department="women")) == ["p4"]
+    assert ids(index.search("linen shirt", category="Tops")) == ["p1"]
+    assert index.search("shirt", category="tops", department="women") == []
+
+
+def test_incremental_updates_match_a_fresh_build():
+    index = ProductSearchIndex()
+    index.add_many(catalog())
+    index.add({"_id": "p1", "title": "Oxford shirt", "description": "Cotton", "category": "tops",
+               "department": "men"})
+    index.remove("p5")
+    index.add({"_id": "p7", "title": "Linen scarf", "category": "accessories", "department": "women"})
+
+    fresh = ProductSearchIndex()
+    docs = {doc["_id"]: doc for doc in catalog()}
+    docs["p1"] = {"_id": "p1", "title": "Oxford shirt", "description": "Cotton", "category": "tops",
+                  "department": "men"}
+    del docs["p5"]
+    docs["p7"] = {"_id": "p7", "title": "Linen scarf", "category": "accessories", "department": "women"}
+    fresh.add_many(docs.values())
+
+    assert index.vocabulary == fresh.vocabulary
+    assert "wool" not in index.postings and "p5" not in index.by_category["accessories"]
+    assert "breathable" not in index.postings  # p1's old description
+    for query in ("linen", "shirt", "oxford", "scarf", "linen shirt", "cot"):
+        assert ids(index.search(query)) == ids(fresh.search(query)), query
+
+
+def test_impacts_are_reweighted_when_the_average_length_drifts():
+    index = ProductSearchIndex()
+    index.add_many(catalog()[:2])
+    before = index.scoring_length
+    index.add({"_id": "long", "title": "Shirt", "description": " ".join(["word"] * 200)})
+    assert index.scoring_length != before
+    assert index.scoring_length == pytest.approx(sum(index.doc_lengths.values()) / len(index.docs))
+    for doc_id, terms in index.doc_terms.items():
+        for term, tf in terms.items():
+            assert index.postings[term][doc_id] == pytest.approx(index._impact(tf, index.doc_lengths[doc_id]))
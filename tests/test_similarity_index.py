@@ -0,0 +1,66 @@
+import os
+import threading
+import numpy as np
+from tools import similarity_index as similarity_module
+from tools.similarity_index import SimilarityIndex
+
+
+def products(extra=()):
+    docs = [
+        {"_id": "shirt", "title": "blue cotton shirt", "category": "tops", "department": "men", "price": 20},
+        {"_id": "tee", "title": "white cotton tee", "category": "tops", "department": "men", "price": 15},
+        {"_id": "jeans", "title": "slim denim jeans", "category": "bottoms", "department": "men", "price": 50},
+        {"_id": "skirt", "title": "pleated denim skirt", "category": "bottoms", "department": "women", "price": 40},
+    ]
+    return docs + list(extra)
+
+
+def test_rebuild_refolds_affinities_onto_the_new_columns():
+    index = SimilarityIndex(path="", text_dims=64, price_bands=3)
+    index.build(products())
+    index.record("u1", "shirt", at=0)
+    index.record("u1", "tee", at=0)
+
+    index.build(products([{"_id": "parka", "title": "waterproof hooded parka", "category": "coats",
+                           "department": "women", "price": 120}]))
+    expected = index.features[index.rows["shirt"]] + index.features[index.rows["tee"]]
+    assert np.allclose(index.affinities["u1"].vector, expected)
+    assert index.recommend("u1", limit=1)[0]["product_id"] in {"jeans", "skirt", "parka"}
+
+
+async def test_other_processes_reopen_a_newer_saved_build(tmp_path, monkeypatch):
+    monkeypatch.setattr(similarity_module, "RELOAD_CHECK_S", 0.0)
+    path = str(tmp_path / "similarity")
+    builder, reader = SimilarityIndex(path=path), SimilarityIndex(path=path)
+    builder.build(products())
+    builder.save()
+    assert reader.open()
+
+    builder.build(products([{"_id": "parka", "title": "hooded parka", "price": 120}]))
+    builder.save()
+    newer = os.path.getmtime(path + ".json") + 1
+    os.utime(path + ".json", (newer, newer))
+
+    await reader.ensure_loaded()
+    assert "parka" in reader.rows
+
+
+async def test_reopened_builds_are_installed_on_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(similarity_module, "RELOAD_CHECK_S", 0.0)
+    path = str(tmp_path / "similarity")
+    builder, reader = SimilarityIndex(path=path), SimilarityIndex(path=path)
+    builder.build(products())
+    builder.save()
+    reader.build(products())
+    reader.record("u1", "shirt", at=0)
+
+    installed_on = []
+    install = reader._install
+    monkeypatch.setattr(reader, "_install", lambda *built: (installed_on.append(threading.current_thread()),
+                                                            install(*built)))
+    newer = os.path.getmtime(path + ".json") + 1
+    os.utime(path + ".json", (newer, newer))
+
+    await reader.ensure_loaded()
+    assert installed_on == [threading.current_thread()]
+    assert np.allclose(reader.affinities["u1"].vector, reader.features[reader.rows["shirt"]])
@@ -0,0 +1,82 @@
+import asyncio
+import pytest
+from core.singleflight import SingleFlight
+from tools.cache import AsyncTTLCache
+
+
+async def test_concurrent_callers_share_one_load():
+    flight = SingleFlight()
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    assert await asyncio.gather(*(flight.do("k", load) for _ in range(10))) == [1] * 10
+    assert calls == 1
+    assert "k" not in flight
+
+
+async def test_errors_are_shared():
+    flight = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(*(flight.do("k", load) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+async def test_cancelled_leader_hands_over_to_a_waiter():
+    flight = SingleFlight()
+    started = []
+
+    async def load():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return "value"
+
+    leader = asyncio.create_task(flight.do("k", load))
+    await asyncio.sleep(0)
+    waiters = [asyncio.create_task(flight.do("k", load)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await asyncio.gather(*waiters) == ["value"] * 3
+    assert len(started) == 2  # The leader's attempt, then one waiter's
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+async def test_cancelled_waiter_leaves_the_load_running():
+    flight = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0.02)
+        return "value"
+
+    leader = asyncio.create_task(flight.do("k", load))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(flight.do("k", load))
+    await asyncio.sleep(0.005)
+    waiter.cancel()
+    assert await leader == "value"
+
+
+async def test_cache_survives_cancelled_loader():
+    cache = AsyncTTLCache("test", ttl=60, maxsize=10)
+
+    async def load():
+        await asyncio.sleep(0.02)
+        return 42
+
+    leader = asyncio.create_task(cache.get_or_load("k", load))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.get_or_load("k", load))
+    await asyncio.sleep(0.005)
+    leader.cancel()
+    assert await follower == 42
+    assert cache.get("k") == 42
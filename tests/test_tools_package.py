@@ -0,0 +1,11 @@
+import importlib
+import tools
+
+
+def test_client_exports_do_not_depend_on_import_order():
+    from tools import NodeJSClient, get_api_client
+    importlib.import_module("tools.api_client")
+    from tools import api_client
+    assert api_client is importlib.import_module("tools.api_client")
+    assert tools.get_api_client is get_api_client
+    assert NodeJSClient is api_client.NodeJSClient
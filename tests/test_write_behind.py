@@ -0,0 +1,126 @@
+import pytest
+from bson import json_util
+from pymongo.errors import BulkWriteError
+from tools.write_behind import DUPLICATE_KEY, INSERT, UPDATE, WriteBehindSink, _Lane
+
+
+def insert(n):
+    return (INSERT, {"_id": n})
+
+
+def update(n):
+    return (UPDATE, {"_id": n}, {"$inc": {"views": 1}}, True)
+
+
+def error(index, code=121):
+    return {"index": index, "code": code, "errmsg": "failed"}
+
+
+def recording(sink, monkeypatch, failures=()):
+    """Replace _execute; raises the queued failures in turn, then succeeds"""
+    calls, failures = [], list(failures)
+
+    async def execute(collection, batch):
+        calls.append(list(batch))
+        if failures:
+            raise failures.pop(0)
+
+    monkeypatch.setattr(sink, "_execute", execute)
+    return calls
+
+
+def test_unordered_inserts_count_duplicates_as_written():
+    lane = _Lane("agent_logs", 10)
+    batch = [insert(n) for n in range(4)]
+    details = {"writeErrors": [error(1, DUPLICATE_KEY), error(3)]}
+    assert WriteBehindSink._settle(lane, batch, details) == []
+    assert (lane.written, lane.failed) == (3, 1)
+
+
+def test_ordered_batch_resends_writes_after_the_failure():
+    lane = _Lane("promotions", 10)
+    batch = [insert(0), update(1), update(2), update(3)]
+    assert WriteBehindSink._settle(lane, batch, {"writeErrors": [error(1)]}) == batch[2:]
+    assert (lane.written, lane.failed) == (1, 1)
+
+
+def test_ordered_duplicate_insert_is_written_not_failed():
+    lane = _Lane("promotions", 10)
+    batch = [insert(0), update(1)]
+    details = {"writeErrors": [error(0, DUPLICATE_KEY)]}
+    assert WriteBehindSink._settle(lane, batch, details) == batch[1:]
+    assert (lane.written, lane.failed) == (1, 0)
+
+
+def test_duplicate_key_on_upsert_is_a_failure():
+    lane = _Lane("promotions", 10)
+    batch = [update(0), update(1)]
+    details = {"writeErrors": [error(0, DUPLICATE_KEY)]}
+    assert WriteBehindSink._settle(lane, batch, details) == batch[1:]
+    assert (lane.written, lane.failed) == (0, 1)
+
+
+async def test_write_sends_the_remainder_of_an_ordered_batch(monkeypatch):
+    sink = WriteBehindSink(batch_size=10, max_delay_ms=10, spill_path="")
+    batch = [insert(0), update(1), update(2), update(3)]
+    calls = recording(sink, monkeypatch, [BulkWriteError({"writeErrors": [error(1)]})])
+    lane = _Lane("promotions", 10)
+    await sink._write(lane, batch)
+    assert calls == [batch, batch[2:]]
+    assert lane.stats()["written"] == 3
+    assert lane.stats()["failed"] == 1
+    assert lane.flushes == 1
+
+
+async def test_write_spills_after_retries(monkeypatch, tmp_path):
+    path = tmp_path / "spill.jsonl"
+    sink = WriteBehindSink(batch_size=10, max_delay_ms=10, spill_path=str(path), retries=1)
+    calls = recording(sink, monkeypatch, [ConnectionError("down")] * 2)
+
+    async def no_sleep(delay):
+        pass
+
+    monkeypatch.setattr("tools.write_behind.asyncio.sleep", no_sleep)
+    lane = _Lane("agent_logs", 10)
+    batch = [insert(0), insert(1)]
+    await sink._write(lane, batch)
+    assert len(calls) == 2
+    assert (lane.written, lane.spilled) == (0, 2)
+    lines = [json_util.loads(line) for line in path.read_text().splitlines()]
+    assert [line["op"][1]["_id"] for line in lines] == [0, 1]
+    assert {line["collection"] for line in lines} == {"agent_logs"}
+
+
+async def test_close_writes_every_queued_operation_in_order(monkeypatch):
+    sink = WriteBehindSink(batch_size=3, max_delay_ms=1000, spill_path="")
+    calls = recording(sink, monkeypatch)
+    await sink.insert("agent_logs", {"_id": 0})
+    for n in range(1, 7):
+        await sink.update("agent_logs", {"_id": n}, {"$set": {"n": n}})
+    await sink.close()
+    assert all(len(batch) <= 3 for batch in calls)
+    assert [op[1]["_id"] for batch in calls for op in batch] == list(range(7))
+    assert sink.stats()["agent_logs"]["written"] == 7
+    assert sink.stats()["agent_logs"]["queued"] == 0
+
+
+async def test_recover_spill_replays_and_removes_the_file(monkeypatch, tmp_path):
+    path = tmp_path / "spill.jsonl"
+    sink = WriteBehindSink(batch_size=10, max_delay_ms=10, spill_path=str(path))
+    await sink._spill(_Lane("agent_logs", 10), [insert(0), update(1)])
+    calls = recording(sink, monkeypatch)
+    assert await sink.recover_spill() == 2
+    assert calls == [[insert(0), update(1)]]
+    assert not path.exists()
+    assert not (tmp_path / "spill.jsonl.replaying").exists()
+    await sink.close()
+
+
+@pytest.mark.parametrize("size", [1, 3])
+async def test_insert_nowait_drops_when_the_queue_is_full(monkeypatch, size):
+    sink = WriteBehindSink(batch_size=10, max_delay_ms=1000, max_queue=size, spill_path="")
+    recording(sink, monkeypatch)
+    accepted = [sink.insert_nowait("agent_logs", {"_id": n}) for n in range(size + 2)]
+    assert accepted == [True] * size + [False] * 2
+    assert sink.stats()["agent_logs"]["dropped"] == 2
+    await sink.close()
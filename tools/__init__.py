@@ -1,3 +1,13 @@
-from tools.api_client import NodeJSClient, api_client
+import importlib
 
-__all__ = ['NodeJSClient', 'api_client']
+# The API client pulls in httpx, which most tool modules never need, so it is
+# only imported when first referenced. The client instance is reached through
+# get_api_client(): a package attribute named api_client would be replaced by
+# the tools.api_client submodule as soon as anything imports it.
+__all__ = ['NodeJSClient', 'get_api_client']
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        return getattr(importlib.import_module("tools.api_client"), name)
+    raise AttributeError(f"module 'tools' has no attribute {name!r}")
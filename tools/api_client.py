@@ -1,49 +1,159 @@
+import asyncio
+import importlib.util
+import random
 import httpx
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Iterable
 from config.settings import settings
-from core.exceptions import NodeJSAPIError
+from core.lazy import LazySingleton
+from core.metrics import SIZE_BUCKETS, counter, histogram, instrument
+from core.singleflight import SingleFlight
+
+# Statuses worth retrying: the request never reached a healthy handler
+RETRY_STATUSES = {429, 502, 503, 504}
+
+RESPONSE_BYTES = histogram("nodejs_api_response_bytes", "Size of Node.js API response bodies",
+                           ("method",), buckets=SIZE_BUCKETS)
+RESPONSES = counter("nodejs_api_responses_total", "Node.js API responses by status class",
+                    ("method", "status"))
+RETRIES = counter("nodejs_api_retries_total", "Node.js API GETs retried")
+COALESCED = counter("nodejs_api_coalesced_total", "Node.js API GETs answered by an identical request in flight")
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package (pip install httpx[http2])"""
+    return settings.nodejs_api_http2 and importlib.util.find_spec("h2") is not None
+
 
 class NodeJSClient:
-    """HTTP client to call your Node.js Express API"""
+    """HTTP client to call your Node.js Express API
+
+    Connections are pooled and kept alive. GETs are idempotent, so they are
+    retried with jittered backoff, and identical GETs in flight at the same
+    moment share one request. Shared results must be treated as read-only.
+    """
 
-    def __init__(self, base_url: str = None):
+    def __init__(self, base_url: str = None, transport: httpx.AsyncBaseTransport = None):
         self.base_url = base_url or settings.nodejs_api_url
-        self.client = httpx.AsyncClient(base_url=self.base_url, timeout=30.0)
+        self.retries = settings.nodejs_api_retries
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(settings.nodejs_api_timeout_s,
+                                  connect=settings.nodejs_api_connect_timeout_s),
+            limits=httpx.Limits(
+                max_connections=settings.nodejs_api_max_connections,
+                max_keepalive_connections=settings.nodejs_api_max_keepalive,
+                keepalive_expiry=settings.nodejs_api_keepalive_expiry_s
+            ),
+            http2=http2_available(),
+            transport=transport
+        )
+        self._flight = SingleFlight()
+        self.requests = 0
+        self.coalesced = 0
+        self.retried = 0
 
     async def _handle_response(self, response: httpx.Response) -> Any:
         """Handle API response and raise errors if needed"""
+        method = response.request.method
+        RESPONSE_BYTES.labels(method).observe(len(response.content))
+        RESPONSES.labels(method, f"{response.status_code // 100}xx").inc()
         if response.status_code >= 400:
+            from core.exceptions import NodeJSAPIError  # Defers importing agentica
             raise NodeJSAPIError(
                 status_code=response.status_code,
                 message=response.text
             )
         return response.json()
 
+    def _backoff(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Seconds to wait before retrying: full jitter, honouring Retry-After"""
+        cap = settings.nodejs_api_retry_max_backoff_ms / 1000
+        delay = random.uniform(0, min(cap, settings.nodejs_api_retry_backoff_ms / 1000 * 2 ** attempt))
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(cap, float(retry_after)))
+        return delay
+
+    async def _send_get(self, path: str, params: Optional[Dict], headers: Optional[Dict]) -> Any:
+        """GET with retries on connection errors, timeouts and RETRY_STATUSES"""
+        for attempt in range(self.retries + 1):
+            self.requests += 1
+            try:
+                response = await self.client.get(path, params=params, headers=headers)
+            except httpx.TransportError:
+                if attempt == self.retries:
+                    raise
+                response = None
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    return await self._handle_response(response)
+            self.retried += 1
+            RETRIES.inc()
+            await asyncio.sleep(self._backoff(attempt, response))
+
+    async def _get(self, path: str, params: Optional[Dict] = None,
+                   headers: Optional[Dict] = None) -> Any:
+        """Coalesced GET: concurrent identical requests share one response"""
+        # Params as httpx will send them: lists become repeated keys, whose order is kept
+        key = (path,
+               tuple(sorted(httpx.QueryParams(params).multi_items(), key=lambda item: item[0]))
+               if params else (),
+               tuple(sorted(headers.items())) if headers else ())
+        if key in self._flight:
+            self.coalesced += 1
+            COALESCED.inc()
+        return await self._flight.do(key, lambda: self._send_get(path, params, headers))
+
+    @instrument("nodejs_api")
     async def search_products(self, query: str) -> List[Dict]:
         """Call GET /search?query=..."""
-        response = await self.client.get("/search", params={"query": query})
-        data = await self._handle_response(response)
+        data = await self._get("/search", params={"query": query})
         return data.get("products", [])
 
+    @instrument("nodejs_api")
     async def get_products(self, **filters) -> List[Dict]:
         """Call GET /products with filters"""
-        response = await self.client.get("/products", params=filters)
-        data = await self._handle_response(response)
+        data = await self._get("/products", params=filters)
         return data.get("products", [])
 
+    @instrument("nodejs_api")
     async def get_product(self, product_id: str) -> Dict:
         """Call GET /products/:id"""
-        response = await self.client.get(f"/products/{product_id}")
-        data = await self._handle_response(response)
+        data = await self._get(f"/products/{product_id}")
         return data.get("product", {})
 
+    @instrument("nodejs_api")
+    async def get_products_bulk(self, product_ids: Iterable[str],
+                                concurrency: int = None) -> Dict[str, Dict]:
+        """Fetch many products with at most `concurrency` requests in flight.
+
+        Returns {product_id: product}; ids the API doesn't know are left out.
+        """
+        from core.exceptions import NodeJSAPIError
+
+        semaphore = asyncio.Semaphore(concurrency or settings.nodejs_api_bulk_concurrency)
+
+        async def fetch(product_id: str) -> Optional[Dict]:
+            async with semaphore:
+                try:
+                    return await self.get_product(product_id)
+                except NodeJSAPIError as e:
+                    if e.status_code == 404:
+                        return None
+                    raise
+
+        unique_ids = list(dict.fromkeys(product_ids))
+        products = await asyncio.gather(*(fetch(product_id) for product_id in unique_ids))
+        return {product_id: product for product_id, product in zip(unique_ids, products) if product}
+
+    @instrument("nodejs_api")
     async def get_cart(self, user_id: str, token: str) -> Dict:
         """Call GET /users/:userId/cart"""
         headers = {"authorization": token}
-        response = await self.client.get(f"/users/{user_id}/cart", headers=headers)
-        data = await self._handle_response(response)
+        data = await self._get(f"/users/{user_id}/cart", headers=headers)
         return data.get("cart", {})
 
+    @instrument("nodejs_api")
     async def add_to_cart(self, user_id: str, product_id: str, token: str,
                          increase: bool = False, decrease: bool = False) -> Dict:
         """Call POST /users/:userId/cart"""
@@ -57,6 +167,7 @@ class NodeJSClient:
                                          json=payload, headers=headers)
         return await self._handle_response(response)
 
+    @instrument("nodejs_api")
     async def update_cart_variant(self, user_id: str, variant_id: str, token: str) -> Dict:
         """Call PUT /users/:userId/cart to replace with variant"""
         headers = {"authorization": token}
@@ -65,12 +176,14 @@ class NodeJSClient:
                                         headers=headers)
         return await self._handle_response(response)
 
+    @instrument("nodejs_api")
     async def login(self, email: str, password: str) -> Dict:
         """Call POST /users/login"""
         response = await self.client.post("/users/login",
                                          json={"credential": {"email": email, "password": password}})
         return await self._handle_response(response)
 
+    @instrument("nodejs_api")
     async def register(self, fullname: str, email: str, password: str) -> Dict:
         """Call POST /users/signin"""
         response = await self.client.post("/users/signin",
@@ -82,5 +195,10 @@ class NodeJSClient:
         """Close the HTTP client"""
         await self.client.aclose()
 
-# Global API client instance
-api_client = NodeJSClient()
+def get_api_client() -> NodeJSClient:
+    """The process-wide API client, created on first use"""
+    return api_client.get()
+
+
+# Global API client instance (created lazily)
+api_client: NodeJSClient = LazySingleton(NodeJSClient)
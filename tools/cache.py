@@ -0,0 +1,164 @@
+import functools
+import inspect
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Union
+from config.settings import settings
+from core.metrics import add_collector, gauge
+from core.singleflight import SingleFlight
+
+_MISSING = object()
+
+# Seconds, or a callable returning them (resolved lazily, e.g. from settings)
+TTL = Union[float, Callable[[], float]]
+
+
+class AsyncTTLCache:
+    """Size-bounded LRU cache with per-entry TTL and single-flight loading"""
+
+    def __init__(self, name: str, ttl: TTL = None, maxsize: int = None):
+        self.name = name
+        # Defaults are read from settings on first use so decorating at
+        # import time doesn't load them
+        self._ttl = ttl
+        self._maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._flight = SingleFlight()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @property
+    def ttl(self) -> float:
+        if self._ttl is None:
+            return settings.cache_ttl_seconds
+        return self._ttl() if callable(self._ttl) else self._ttl
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize or settings.cache_max_entries
+
+    def get(self, key: Hashable) -> Any:
+        """Return a fresh cached value or _MISSING"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value, or run loader once for all concurrent misses"""
+        value = self.get(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+
+        if key in self._flight:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+
+        async def load():
+            generation = self._generation
+            value = await loader()
+            # Don't store results that raced with an invalidation
+            if generation == self._generation:
+                self.set(key, value)
+            return value
+
+        return await self._flight.do(key, load)
+
+    def loading(self, key: Hashable) -> bool:
+        """True while a get_or_load() for this key is running"""
+        return key in self._flight
+
+    def invalidate(self, key: Hashable):
+        """Drop one key"""
+        self._entries.pop(key, None)
+        self._generation += 1
+
+    def clear(self):
+        """Drop every key"""
+        self._entries.clear()
+        self._generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+
+# All caches created through @cached, by name
+caches: Dict[str, AsyncTTLCache] = {}
+
+
+def cached(ttl: TTL = None, maxsize: int = None, name: str = None):
+    """Cache an async function's results keyed by its bound arguments.
+
+    Cached values are shared between callers and must be treated as read-only.
+    The wrapper exposes ``.cache`` and ``.invalidate(*args, **kwargs)``.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+        cache = AsyncTTLCache(name or fn.__name__, ttl=ttl, maxsize=maxsize)
+        caches[cache.name] = cache
+
+        def make_key(*args, **kwargs) -> Hashable:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            return tuple(bound.arguments.values())
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            key = make_key(*args, **kwargs)
+            return await cache.get_or_load(key, lambda: fn(*args, **kwargs))
+
+        def invalidate(*args, **kwargs):
+            cache.invalidate(make_key(*args, **kwargs))
+
+        wrapper.cache = cache
+        wrapper.invalidate = invalidate
+        return wrapper
+
+    return decorator
+
+
+def invalidate_all(name: Optional[str] = None):
+    """Clear one named cache, or all of them"""
+    for cache_name, cache in caches.items():
+        if name is None or cache_name == name:
+            cache.clear()
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit/miss statistics for every registered cache"""
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+def _collect_cache_metrics():
+    """Export cache_stats() as cache_<stat>{cache} gauges"""
+    for name, stats in cache_stats().items():
+        for stat, value in stats.items():
+            gauge(f"cache_{stat}", f"AsyncTTLCache {stat.replace('_', ' ')}", ("cache",)).labels(name).set(value)
+
+
+add_collector(_collect_cache_metrics)
@@ -1,47 +1,84 @@
 from typing import Dict, List, Optional
 from bson import ObjectId
 from config.mongodb import db
+from core.metrics import instrument
+from tools.views import CART_VIEWS, View
 
-async def get_user_cart_items(user_id: str) -> Dict:
-    """Get cart from MongoDB"""
-    cart = db.carts.find_one({"userId": user_id})
+@instrument("tool")
+async def get_user_cart_items(user_id: str, view: View = None) -> Dict:
+    """Get cart from MongoDB ("summary", "items" or fields)"""
+    cart = await db.aio.carts.find_one({"userId": user_id}, CART_VIEWS.projection(view))
     if not cart:
         return {"items": {}, "totalQty": 0, "totalPrice": 0}
     if "_id" in cart:
         cart["_id"] = str(cart["_id"])
     return cart
 
-async def calculate_cart_total(cart: Dict) -> float:
-    """Calculate cart total with potential discounts"""
+@instrument("tool")
+async def calculate_cart_total(cart: Dict, tier: Optional[str] = None,
+                               promotions: Optional[List[Dict]] = None) -> float:
+    """Calculate cart total with promotion and tier discounts.
+
+    Uses the compiled promotion index unless explicit promotions are given.
+    """
     base_total = cart.get("totalPrice", 0)
-    # Agent can apply dynamic discounts here
-    return base_total
+    if not cart.get("items"):
+        return base_total
+    from tools.pricing_engine import get_pricing_engine, tier_multiplier
+    if promotions is not None:
+        return get_pricing_engine().price_cart(cart, tier, promotions)["total"]
+    from tools.promotion_index import get_best_cart_promotions
+    best = await get_best_cart_promotions(cart, tier)
+    return round((base_total - best["discount"]) * tier_multiplier(tier), 2)
 
+@instrument("tool")
 async def get_cart_item_count(user_id: str) -> int:
     """Get total number of items in cart"""
-    cart = await get_user_cart_items(user_id)
+    cart = await get_user_cart_items(user_id, view="summary")
     return cart.get("totalQty", 0)
 
+@instrument("tool")
 async def validate_cart_inventory(cart: Dict) -> Dict:
     """Check if all cart items are still in stock"""
-    results = {"valid": True, "out_of_stock": []}
-    items = cart.get("items", {})
+    results = await validate_carts_inventory([cart])
+    return results[0]
+
+@instrument("tool")
+async def validate_carts_inventory(carts: List[Dict]) -> List[Dict]:
+    """Check stock for many carts with a single projected $in query"""
+    product_ids = {item_id for cart in carts for item_id in cart.get("items", {})}
+    available = await _load_quantities(product_ids)
+
+    all_results = []
+    for cart in carts:
+        results = {"valid": True, "out_of_stock": []}
+        for item_id, cart_item in cart.get("items", {}).items():
+            quantity = available.get(item_id)
+            if quantity is None or quantity < cart_item.get("qty", 0):
+                results["valid"] = False
+                results["out_of_stock"].append({
+                    "product_id": item_id,
+                    "requested": cart_item.get("qty", 0),
+                    "available": quantity or 0
+                })
+        all_results.append(results)
 
-    for item_id, cart_item in items.items():
-        product = db.products.find_one({"_id": ObjectId(item_id)})
-        if not product or product.get("quantity", 0) < cart_item.get("qty", 0):
-            results["valid"] = False
-            results["out_of_stock"].append({
-                "product_id": item_id,
-                "requested": cart_item.get("qty", 0),
-                "available": product.get("quantity", 0) if product else 0
-            })
+    return all_results
 
-    return results
+async def _load_quantities(product_ids) -> Dict[str, int]:
+    """Map product id -> stock quantity, fetching only the quantity field"""
+    if not product_ids:
+        return {}
+    docs = await db.aio.products.find(
+        {"_id": {"$in": [ObjectId(pid) for pid in product_ids]}},
+        {"quantity": 1}
+    ).to_list()
+    return {str(doc["_id"]): doc.get("quantity", 0) for doc in docs}
 
+@instrument("tool")
 async def get_cart_summary(user_id: str) -> Dict:
     """Get cart summary with details"""
-    cart = await get_user_cart_items(user_id)
+    cart = await get_user_cart_items(user_id, view="items")
     inventory_check = await validate_cart_inventory(cart)
 
     return {
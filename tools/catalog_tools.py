@@ -1,51 +1,196 @@
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional
 from bson import ObjectId
 from config.mongodb import db
-from tools.api_client import api_client
-
-async def search_products_mongodb(query: str, max_results: int = 10) -> List[Dict]:
-    """Search products directly in MongoDB"""
-    regex = {"$regex": query, "$options": "i"}
-    results = db.products.find({
-        "$or": [
-            {"title": regex},
-            {"description": regex},
-            {"category": regex},
-            {"department": regex}
-        ]
-    }).limit(max_results)
-    return [_serialize_doc(doc) for doc in results]
-
-async def get_product_by_id(product_id: str) -> Optional[Dict]:
-    """Get single product from MongoDB"""
-    doc = db.products.find_one({"_id": ObjectId(product_id)})
+from config.settings import settings
+from core.metrics import instrument
+from tools.search_index import product_search_index
+from tools.cache import cached
+from tools import pagination
+from tools.views import PRODUCT_VIEWS, TAXONOMY_VIEWS, VARIANT_VIEWS, View
+
+@instrument("tool")
+async def search_products_mongodb(query: str, max_results: int = 10,
+                                  category: Optional[str] = None,
+                                  department: Optional[str] = None,
+                                  view: View = None) -> List[Dict]:
+    """Search products via the in-memory index built from MongoDB"""
+    await product_search_index.ensure_loaded()
+    results = product_search_index.search(query, limit=max_results,
+                                          category=category, department=department)
+    return [PRODUCT_VIEWS.project(doc, view) for doc in results]
+
+@instrument("tool")
+async def get_product_by_id(product_id: str, view: View = None) -> Optional[Dict]:
+    """Get single product from MongoDB ("summary", "pricing", "inventory" or fields)"""
+    return PRODUCT_VIEWS.project(await _load_product(product_id), view)
+
+@cached(name="get_product_by_id")
+async def _load_product(product_id: str) -> Optional[Dict]:
+    # Cached whole so one invalidation covers every view
+    doc = await db.aio.products.find_one({"_id": ObjectId(product_id)})
     return _serialize_doc(doc) if doc else None
 
-async def get_products_by_category(category: str, limit: int = 50) -> List[Dict]:
+@instrument("tool")
+async def get_products_by_category(category: str, limit: int = 50,
+                                   view: View = None) -> List[Dict]:
     """Filter products by category"""
-    docs = db.products.find({"category": category}).limit(limit)
+    docs = await db.aio.products.find({"category": category},
+                                      PRODUCT_VIEWS.projection(view)).limit(limit).to_list()
     return [_serialize_doc(doc) for doc in docs]
 
-async def get_products_by_department(department: str, limit: int = 50) -> List[Dict]:
+@instrument("tool")
+async def get_products_by_department(department: str, limit: int = 50,
+                                     view: View = None) -> List[Dict]:
     """Filter products by department"""
-    docs = db.products.find({"department": department}).limit(limit)
+    docs = await db.aio.products.find({"department": department},
+                                      PRODUCT_VIEWS.projection(view)).limit(limit).to_list()
     return [_serialize_doc(doc) for doc in docs]
 
-async def get_product_variants(product_id: str) -> List[Dict]:
+@instrument("tool")
+async def get_product_variants(product_id: str, view: View = None) -> List[Dict]:
     """Get all variants for a product"""
-    docs = db.variants.find({"productID": product_id})
+    return [VARIANT_VIEWS.project(doc, view) for doc in await _load_variants(product_id)]
+
+@cached(name="get_product_variants")
+async def _load_variants(product_id: str) -> List[Dict]:
+    docs = await db.aio.variants.find({"productID": product_id}).to_list()
     return [_serialize_doc(doc) for doc in docs]
 
-async def get_departments() -> List[Dict]:
+async def iter_products_by_category(category: str, view: View = None, sort: str = "_id",
+                                    descending: bool = False, batch_size: int = None,
+                                    after: Optional[str] = None) -> AsyncIterator[Dict]:
+    """Stream every product in a category, batch_size documents per query"""
+    async for doc in pagination.stream(db.aio.products, {"category": category},
+                                       PRODUCT_VIEWS.projection(view), sort, descending,
+                                       batch_size, after):
+        yield _serialize_doc(doc)
+
+async def iter_products_by_department(department: str, view: View = None, sort: str = "_id",
+                                      descending: bool = False, batch_size: int = None,
+                                      after: Optional[str] = None) -> AsyncIterator[Dict]:
+    """Stream every product in a department, batch_size documents per query"""
+    async for doc in pagination.stream(db.aio.products, {"department": department},
+                                       PRODUCT_VIEWS.projection(view), sort, descending,
+                                       batch_size, after):
+        yield _serialize_doc(doc)
+
+async def iter_product_variants(product_id: str, view: View = None, sort: str = "_id",
+                                descending: bool = False, batch_size: int = None,
+                                after: Optional[str] = None) -> AsyncIterator[Dict]:
+    """Stream a product's variants without loading them all at once"""
+    async for doc in pagination.stream(db.aio.variants, {"productID": product_id},
+                                       VARIANT_VIEWS.projection(view), sort, descending,
+                                       batch_size, after):
+        yield _serialize_doc(doc)
+
+@instrument("tool")
+async def list_products_by_category(category: str, page_size: int = None,
+                                    token: Optional[str] = None, view: View = None,
+                                    sort: str = "_id", descending: bool = False) -> Dict:
+    """One page of a category: {"items", "next_token"}; pass next_token back for more"""
+    return _serialize_page(await pagination.page(
+        db.aio.products, {"category": category}, PRODUCT_VIEWS.projection(view),
+        sort, descending, page_size, token))
+
+@instrument("tool")
+async def list_products_by_department(department: str, page_size: int = None,
+                                      token: Optional[str] = None, view: View = None,
+                                      sort: str = "_id", descending: bool = False) -> Dict:
+    """One page of a department: {"items", "next_token"}; pass next_token back for more"""
+    return _serialize_page(await pagination.page(
+        db.aio.products, {"department": department}, PRODUCT_VIEWS.projection(view),
+        sort, descending, page_size, token))
+
+@instrument("tool")
+async def list_product_variants(product_id: str, page_size: int = None,
+                                token: Optional[str] = None, view: View = None,
+                                sort: str = "_id", descending: bool = False) -> Dict:
+    """One page of a product's variants: {"items", "next_token"}"""
+    return _serialize_page(await pagination.page(
+        db.aio.variants, {"productID": product_id}, VARIANT_VIEWS.projection(view),
+        sort, descending, page_size, token))
+
+@instrument("tool")
+async def get_departments(view: View = None) -> List[Dict]:
     """Get all departments"""
-    docs = db.departments.find({})
+    return [TAXONOMY_VIEWS.project(doc, view) for doc in await _load_departments()]
+
+@cached(ttl=lambda: settings.taxonomy_cache_ttl_seconds, name="get_departments")
+async def _load_departments() -> List[Dict]:
+    docs = await db.aio.departments.find({}).to_list()
     return [_serialize_doc(doc) for doc in docs]
 
-async def get_categories() -> List[Dict]:
+@instrument("tool")
+async def get_categories(view: View = None) -> List[Dict]:
     """Get all categories"""
-    docs = db.categories.find({})
+    return [TAXONOMY_VIEWS.project(doc, view) for doc in await _load_categories()]
+
+@cached(ttl=lambda: settings.taxonomy_cache_ttl_seconds, name="get_categories")
+async def _load_categories() -> List[Dict]:
+    docs = await db.aio.categories.find({}).to_list()
     return [_serialize_doc(doc) for doc in docs]
 
+@instrument("tool")
+async def get_similar_products(product_id: str, limit: int = 10, same_category: bool = False,
+                               view: View = None) -> List[Dict]:
+    """Products most similar to one product, most similar first"""
+    from tools.similarity_index import get_similarity_index
+    index = get_similarity_index()
+    await index.ensure_loaded()
+    return await _load_ranked(index.similar(product_id, limit, same_category), view)
+
+@instrument("tool")
+async def get_product_recommendations(customer_id: str, context: Optional[Dict] = None,
+                                      limit: int = 10, view: View = None) -> List[Dict]:
+    """Products for a customer from their browsing and cart affinity.
+
+    context may hold "product_id" (the product being viewed), "category",
+    "department" and "max_price".
+    """
+    from tools.similarity_index import get_similarity_index
+    index = get_similarity_index()
+    await index.ensure_loaded()
+    context = context or {}
+    ranked = index.recommend(customer_id, limit, product_id=context.get("product_id"),
+                             category=context.get("category"), department=context.get("department"),
+                             max_price=context.get("max_price"))
+    return await _load_ranked(ranked, view)
+
+async def _load_ranked(ranked: List[Dict], view: View) -> List[Dict]:
+    """Fetch ranked products in one query, keeping rank order and scores"""
+    if not ranked:
+        return []
+    docs = await db.aio.products.find({"_id": {"$in": [ObjectId(r["product_id"]) for r in ranked]}},
+                                      PRODUCT_VIEWS.projection(view)).to_list()
+    by_id = {str(doc["_id"]): _serialize_doc(doc) for doc in docs}
+    return [dict(by_id[r["product_id"]], score=r["score"]) for r in ranked if r["product_id"] in by_id]
+
+async def handle_product_changed(data: Dict):
+    """Drop cached reads for a changed product (or all of them if unspecified)"""
+    product_id = data.get("product_id")
+    if product_id:
+        _load_product.invalidate(product_id)
+        _load_variants.invalidate(product_id)
+    else:
+        _load_product.cache.clear()
+        _load_variants.cache.clear()
+
+def subscribe_catalog_events(bus):
+    """Keep catalog caches, search, promotions and similarity current from bus events"""
+    from agents.events.event_types import EventType
+    from tools.promotion_index import promotion_index
+    from tools.similarity_index import get_similarity_index
+    for event_type in (EventType.PRICE_CHANGED, EventType.PRODUCT_UPDATED,
+                       EventType.PROMOTION_CREATED, EventType.PROMOTION_EXPIRED):
+        bus.subscribe(event_type, handle_product_changed)
+    product_search_index.subscribe(bus)
+    promotion_index.subscribe(bus)
+    get_similarity_index().subscribe(bus)
+
+def _serialize_page(result: Dict) -> Dict:
+    result["items"] = [_serialize_doc(doc) for doc in result["items"]]
+    return result
+
 def _serialize_doc(doc: Dict) -> Dict:
     """Convert MongoDB ObjectId to string"""
     if doc and "_id" in doc:
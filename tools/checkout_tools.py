@@ -0,0 +1,126 @@
+"""
+Checkout context assembly
+
+The cart, the user's tier, inventory and pricing are loaded as a small
+dependency graph instead of one after another: the cart and the tier start
+together, inventory starts as soon as the cart arrives and pricing once both
+the cart and the tier (for the tier discount) are in. Every
+stage has a timeout inside a total deadline; a stage that is slow or fails
+is replaced by a conservative fallback and reported in "degraded", so the
+caller always gets an answer within the budget.
+
+Given a checkout_id, the inventory stage reserves the cart's stock instead
+of only reading it, so two checkouts can't both take the last units. The
+caller then commits the reservation once payment succeeds or releases it;
+an unpaid one is returned to stock by the reservation sweep.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from config.settings import settings
+from core.log import get_logger
+from core.metrics import instrument
+from tools.cart_tools import calculate_cart_total, get_user_cart_items, validate_cart_inventory
+from tools.inventory_reservations import reserve_cart_inventory
+from tools.user_tools import get_user_tier
+
+log = get_logger(__name__)
+
+EMPTY_CART = {"items": {}, "totalQty": 0, "totalPrice": 0}
+
+
+class _StageRunner:
+    """Runs stages under per-stage timeouts bounded by one shared deadline"""
+
+    def __init__(self, deadline_ms: int, stage_timeouts_ms: Dict[str, int]):
+        self.loop = asyncio.get_running_loop()
+        self.deadline = self.loop.time() + deadline_ms / 1000
+        self.stage_timeouts_ms = stage_timeouts_ms
+        self.timings_ms: Dict[str, float] = {}
+        self.degraded: Dict[str, str] = {}
+
+    async def run(self, name: str, fn: Callable[..., Awaitable], *args, fallback: Any = None) -> Any:
+        timeout = min(self.stage_timeouts_ms.get(name, settings.checkout_stage_timeout_ms) / 1000,
+                      self.deadline - self.loop.time())
+        start = time.perf_counter()
+        try:
+            if timeout <= 0:
+                raise asyncio.TimeoutError
+            return await asyncio.wait_for(fn(*args), timeout)
+        except asyncio.TimeoutError:
+            self.degraded[name] = "timeout"
+            return fallback
+        except Exception as e:
+            log.error("checkout stage failed", stage=name, error=e)
+            self.degraded[name] = "error"
+            return fallback
+        finally:
+            self.timings_ms[name] = round((time.perf_counter() - start) * 1000, 2)
+
+
+async def _reserve_inventory(cart: Dict, checkout_id: str) -> Dict:
+    """Reserve the cart's stock, reported like validate_cart_inventory"""
+    from core.exceptions import InventoryUnavailableError
+    try:
+        await reserve_cart_inventory(cart, checkout_id)
+    except InventoryUnavailableError as e:
+        return {"valid": False, "out_of_stock": e.items, "reserved": False}
+    return {"valid": True, "out_of_stock": [], "reserved": True}
+
+
+@instrument("tool")
+async def get_checkout_context(user_id: str, deadline_ms: int = None,
+                               stage_timeouts_ms: Optional[Dict[str, int]] = None,
+                               checkout_id: Optional[str] = None) -> Dict:
+    """Cart, tier, inventory and pricing for checkout within a latency budget.
+
+    With a checkout_id the stock is reserved under it ("reserved" is True):
+    pass the same id to commit_reservation() after payment or to
+    release_reservation() if the order isn't placed. Retrying with the same
+    id returns the existing reservation rather than taking stock twice.
+
+    Degraded stages fall back to: an empty cart, the "guest" tier (no tier
+    discounts), unknown inventory (inventory_valid is None - re-check before
+    placing the order; a reservation cut short is left to the sweep) and the
+    cart's undiscounted total.
+    """
+    stages = _StageRunner(deadline_ms or settings.checkout_deadline_ms, stage_timeouts_ms or {})
+    start = time.perf_counter()
+
+    tier_stage = asyncio.create_task(stages.run("tier", get_user_tier, user_id, fallback="guest"))
+
+    async def pricing(cart):
+        return await stages.run("pricing", calculate_cart_total, cart, await tier_stage,
+                                fallback=cart.get("totalPrice", 0))
+
+    async def cart_branch():
+        cart = await stages.run("cart", get_user_cart_items, user_id, "items", fallback=None)
+        if cart is None:
+            return EMPTY_CART, None, 0
+        if checkout_id is None:
+            inventory_stage = stages.run("inventory", validate_cart_inventory, cart)
+        else:
+            inventory_stage = stages.run("inventory", _reserve_inventory, cart, checkout_id)
+        inventory, total = await asyncio.gather(
+            inventory_stage,
+            pricing(cart)
+        )
+        return cart, inventory, total
+
+    (cart, inventory, total), tier = await asyncio.gather(cart_branch(), tier_stage)
+    stages.timings_ms["total"] = round((time.perf_counter() - start) * 1000, 2)
+
+    return {
+        "user_id": user_id,
+        "cart": cart,
+        "tier": tier,
+        "inventory_valid": inventory["valid"] if inventory else None,
+        "out_of_stock": inventory["out_of_stock"] if inventory else [],
+        "reserved": bool(inventory and inventory.get("reserved")),
+        "total_items": cart.get("totalQty", 0),
+        "total_price": total,
+        "complete": not stages.degraded,
+        "degraded": stages.degraded,
+        "timings_ms": stages.timings_ms
+    }
@@ -0,0 +1,283 @@
+"""
+Per-user customer context for agent turns
+
+Every agent turn needs the customer's profile, tier, cart and recent orders.
+get_customer_context() assembles them once per session (the reads run
+concurrently, and the tier is derived from the profile instead of read
+again) and keeps the result in a bounded in-process LRU, so later turns get
+it from memory with no database trip.
+
+Cached contexts are kept current from events instead of being refetched:
+
+- cart.item.added, cart.updated: the cart's items and totals are patched. If
+  the totals stop matching the items (a delta was missed or arrived out of
+  order), only the cart is reloaded on the next read. Item additions are
+  not idempotent, so the context remembers the stream IDs of the last
+  APPLIED_EVENTS it applied and skips redeliveries.
+- payment.completed: the cart is emptied, the order is added to the recent
+  orders and its amount to total_spent, which can move the tier up.
+- user.login: the context is assembled in the background, ready for the
+  first turn.
+
+Each event is applied only by the worker that consumes it, so in-process
+copies are kept for customer_context_local_ttl_s: other workers pick the
+change up once their copy expires. With customer_context_redis enabled,
+contexts are also written to Redis for customer_context_ttl_s (the session),
+so workers refresh their copies from Redis, where deltas are written back,
+rather than from MongoDB.
+
+Contexts are shared between callers and must be treated as read-only; deltas
+replace them rather than mutating them, so a turn holding one sees a
+consistent snapshot.
+"""
+
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from config.settings import settings
+from core.lazy import LazySingleton
+from core.log import get_logger
+from core.metrics import instrument
+from tools.cache import AsyncTTLCache, _MISSING
+from tools.cart_tools import get_user_cart_items
+from tools.user_tools import get_user_orders, get_user_profile, tier_for_spend
+
+REDIS_PREFIX = "customer_context:"
+APPLIED_EVENTS = 50  # Stream IDs of recent cart.item.added deltas kept per context
+
+log = get_logger(__name__)
+
+
+def _cart_consistent(cart: Dict) -> bool:
+    """True if the cart's item quantities add up to its totalQty"""
+    items = cart.get("items") or {}
+    return sum(item.get("qty", 0) for item in items.values()) == cart.get("totalQty", 0)
+
+
+async def assemble_customer_context(customer_id: str) -> Dict:
+    """Profile, tier, cart and recent orders for a customer, read from MongoDB"""
+    profile, cart, orders = await asyncio.gather(
+        get_user_profile(customer_id),
+        get_user_cart_items(customer_id, view="items"),
+        get_user_orders(customer_id),
+    )
+    profile = profile or {}
+    return {
+        "customer_id": customer_id,
+        "profile": profile,
+        "tier": tier_for_spend(profile.get("total_spent", 0)) if profile else "guest",
+        "cart": cart,
+        "orders": orders[:settings.customer_context_orders],
+        "loaded_at": time.time(),
+    }
+
+
+class CustomerContextStore:
+    """Session-scoped customer contexts: LRU in process, optionally shared through Redis"""
+
+    def __init__(self, loader: Callable[[str], Awaitable[Dict]] = None, redis_client=None,
+                 ttl_s: float = None, maxsize: int = None, shared: bool = None):
+        self.loader = loader or assemble_customer_context
+        self.shared = settings.customer_context_redis if shared is None else shared
+        self._redis = redis_client
+        self.ttl_s = ttl_s or settings.customer_context_ttl_s
+        # Deltas reach one worker only: other workers' copies must not outlive this
+        local_ttl = min(self.ttl_s, settings.customer_context_local_ttl_s)
+        self.contexts = AsyncTTLCache("customer_context", ttl=local_ttl,
+                                      maxsize=maxsize or settings.customer_context_max_entries)
+        self.redis_hits = 0
+        self.deltas = 0
+        self.cart_reloads = 0
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            from agents.events.bus import get_event_bus
+            self._redis = get_event_bus().get_async_redis()
+        return self._redis
+
+    # Reading
+
+    async def get(self, customer_id: str) -> Dict:
+        """The customer's context; only the first turn of a session reads MongoDB"""
+        context = await self.contexts.get_or_load(customer_id, lambda: self._load(customer_id))
+        if context["cart"] is None:
+            context = await self._reload_cart(context)
+        return context
+
+    async def _load(self, customer_id: str) -> Dict:
+        if self.shared:
+            try:
+                raw = await self.redis.get(REDIS_PREFIX + customer_id)
+            except Exception as e:
+                log.warning("customer context Redis read failed", error=e)
+                raw = None
+            if raw:
+                self.redis_hits += 1
+                return json.loads(raw)
+        context = await self.loader(customer_id)
+        await self._share(context)
+        return context
+
+    async def _reload_cart(self, context: Dict) -> Dict:
+        self.cart_reloads += 1
+        cart = await get_user_cart_items(context["customer_id"], view="items")
+        context = {**context, "cart": cart}
+        await self._put(context)
+        return context
+
+    async def warm(self, customer_id: str):
+        """Assemble a context ahead of the first turn"""
+        await self.get(customer_id)
+
+    # Writing
+
+    async def _share(self, context: Dict):
+        if not self.shared:
+            return
+        try:
+            await self.redis.set(REDIS_PREFIX + context["customer_id"],
+                                 json.dumps(context, default=str), ex=int(self.ttl_s))
+        except Exception as e:
+            log.warning("customer context Redis write failed", error=e)
+
+    async def _put(self, context: Dict):
+        self.contexts.set(context["customer_id"], context)
+        await self._share(context)
+
+    async def _cached(self, customer_id: str) -> Optional[Dict]:
+        """The context as this worker or Redis has it, without reading MongoDB"""
+        context = self.contexts.get(customer_id)
+        if context is not _MISSING:
+            return context
+        if self.shared:
+            try:
+                raw = await self.redis.get(REDIS_PREFIX + customer_id)
+            except Exception:
+                raw = None
+            if raw:
+                return json.loads(raw)
+        return None
+
+    async def apply(self, customer_id: Optional[str], delta: Callable[[Dict], Dict]):
+        """Replace a cached context with delta(context); uncached customers are skipped"""
+        if not customer_id:
+            return
+        if self.contexts.loading(customer_id):
+            # The assembly in flight may predate this change; don't keep it
+            self.contexts.invalidate(customer_id)
+            return
+        context = await self._cached(customer_id)
+        if context is None:
+            return
+        self.deltas += 1
+        await self._put(delta(context))
+
+    def invalidate(self, customer_id: str):
+        """Drop a customer's context from this worker (Redis copies expire on their own)"""
+        self.contexts.invalidate(customer_id)
+
+    # Event handlers
+
+    async def handle_cart_item_added(self, data: Dict):
+        product_id = data.get("product_id")
+        if not product_id:
+            return
+        qty = data.get("qty") or 1
+        added = (data.get("price") or 0) * qty
+        from agents.events.bus import current_message_id
+        message_id = current_message_id()
+
+        def delta(context: Dict) -> Dict:
+            cart = context["cart"]
+            if cart is None:
+                return context  # Reloaded on the next read anyway
+            applied = context.get("applied_events", [])
+            if message_id is not None:
+                if message_id in applied:
+                    return context  # Redelivered event
+                applied = [*applied, message_id][-APPLIED_EVENTS:]
+            items = dict(cart.get("items") or {})
+            item = dict(items.get(product_id) or {"qty": 0, "price": 0})
+            item["qty"] = item.get("qty", 0) + qty
+            item["price"] = round(item.get("price", 0) + added, 2)
+            items[product_id] = item
+            return {**context, "applied_events": applied,
+                    "cart": {**cart, "items": items,
+                             "totalQty": cart.get("totalQty", 0) + qty,
+                             "totalPrice": round(cart.get("totalPrice", 0) + added, 2)}}
+
+        await self.apply(data.get("user_id"), delta)
+
+    async def handle_cart_updated(self, data: Dict):
+        total_qty, total_price = data.get("total_qty"), data.get("total_price")
+
+        def delta(context: Dict) -> Dict:
+            cart = context["cart"]
+            if cart is None:
+                return context
+            if total_qty == 0:
+                return {**context, "cart": {**cart, "items": {}, "totalQty": 0, "totalPrice": 0}}
+            cart = {**cart}
+            if total_qty is not None:
+                cart["totalQty"] = total_qty
+            if total_price is not None:
+                cart["totalPrice"] = total_price
+            return {**context, "cart": cart if _cart_consistent(cart) else None}
+
+        await self.apply(data.get("user_id"), delta)
+
+    async def handle_payment_completed(self, data: Dict):
+        order_id, amount = data.get("order_id"), data.get("amount") or 0
+
+        def delta(context: Dict) -> Dict:
+            orders: List[Dict] = context["orders"]
+            if order_id and any(order.get("order_id") == order_id for order in orders):
+                return context  # Redelivered event
+            order = {"order_id": order_id, "amount": amount, "completed_at": time.time()}
+            profile = context["profile"]
+            if profile:
+                profile = {**profile, "total_spent": profile.get("total_spent", 0) + amount}
+            cart = context["cart"] or {}
+            return {**context,
+                    "profile": profile,
+                    "tier": tier_for_spend(profile.get("total_spent", 0)) if profile else context["tier"],
+                    "cart": {**cart, "items": {}, "totalQty": 0, "totalPrice": 0},
+                    "orders": [order, *orders][:settings.customer_context_orders]}
+
+        await self.apply(data.get("user_id"), delta)
+
+    async def handle_user_login(self, data: Dict):
+        if data.get("user_id"):
+            try:
+                await self.warm(data["user_id"])
+            except Exception as e:
+                log.warning("customer context warm-up failed", customer_id=data["user_id"], error=e)
+
+    def subscribe(self, bus):
+        """Keep cached contexts current from cart, payment and login events"""
+        from agents.events.event_types import EventType
+        bus.subscribe(EventType.CART_ITEM_ADDED, self.handle_cart_item_added)
+        bus.subscribe(EventType.CART_UPDATED, self.handle_cart_updated)
+        bus.subscribe(EventType.PAYMENT_COMPLETED, self.handle_payment_completed)
+        bus.subscribe(EventType.USER_LOGIN, self.handle_user_login)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.contexts.stats(), "redis_hits": self.redis_hits,
+                "deltas": self.deltas, "cart_reloads": self.cart_reloads}
+
+
+@instrument("tool")
+async def get_customer_context(customer_id: str) -> Dict:
+    """Profile, tier, cart and recent orders for an agent turn, from the context store"""
+    return await get_customer_context_store().get(customer_id)
+
+
+def get_customer_context_store() -> CustomerContextStore:
+    """The process-wide customer context store, created on first use"""
+    return customer_contexts.get()
+
+
+# Global customer context store (created lazily)
+customer_contexts: CustomerContextStore = LazySingleton(CustomerContextStore)
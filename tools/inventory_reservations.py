@@ -0,0 +1,258 @@
+"""
+Atomic inventory reservations for checkout
+
+validate_cart_inventory() only reads stock, so two checkouts racing for the
+last units both pass it. reserve() takes the stock instead:
+
+- one bulk write per cart, each line a conditional decrement that only
+  matches while quantity >= qty, so stock can never go negative
+- each decremented product is marked with reserved.<key>; if any line
+  doesn't match, exactly the marked lines are put back and
+  InventoryUnavailableError is raised with the failing items
+- the reservation document (_id = the checkout's idempotency key) is
+  inserted first, so a retried checkout gets its existing reservation back
+  instead of taking stock twice
+
+A reservation is held until commit() (payment went through: the stock stays
+taken) or release() (checkout abandoned). Held reservations older than
+inventory_reservation_ttl_s are released by sweep(), which also finishes
+releases interrupted by a crash. Restoring is conditional on the marker, so
+each product is put back at most once whoever does it.
+"""
+
+import asyncio
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from bson import ObjectId
+from config.mongodb import db
+from config.settings import settings
+from core.log import get_logger
+from core.metrics import instrument
+
+RESERVING = "reserving"
+HELD = "held"
+COMMITTED = "committed"
+RELEASED = "released"
+
+log = get_logger(__name__)
+
+# Releases whose restore hasn't finished after this long are redone by sweep()
+RESTORE_GRACE = timedelta(seconds=60)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _marker(checkout_id: str) -> str:
+    """Product field recording a reservation's decrement (keys may contain dots)"""
+    return "reserved." + hashlib.sha1(checkout_id.encode()).hexdigest()[:16]
+
+
+def cart_quantities(cart: Dict) -> Dict[str, int]:
+    """Product id -> quantity for the lines of a cart document"""
+    return {pid: int(item.get("qty", 0)) for pid, item in cart.get("items", {}).items()
+            if item.get("qty", 0) > 0}
+
+
+class InventoryReservations:
+    """Reserves, commits and releases stock with conditional bulk writes"""
+
+    def __init__(self, products: str = "products", reservations: str = "inventory_reservations"):
+        self.products = products
+        self.reservations = reservations
+
+    @property
+    def _products(self):
+        return db.aio.db[self.products]
+
+    @property
+    def _reservations(self):
+        return db.aio.db[self.reservations]
+
+    async def ensure_indexes(self):
+        await self._reservations.create_index([("status", 1), ("expires_at", 1)])
+
+    # Reserving
+
+    async def reserve(self, checkout_id: str, items: Dict[str, int], user_id: Optional[str] = None,
+                      ttl_s: Optional[int] = None) -> Dict:
+        """Take stock for every line or none; safe to retry with the same checkout_id"""
+        from pymongo.errors import DuplicateKeyError
+        items = {pid: int(qty) for pid, qty in items.items() if qty > 0}
+        now = _now()
+        reservation = {
+            "_id": checkout_id,
+            "user_id": user_id,
+            "items": items,
+            "status": RESERVING,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=ttl_s or settings.inventory_reservation_ttl_s),
+        }
+        try:
+            await self._reservations.insert_one(reservation)
+        except DuplicateKeyError:
+            return await self._replay(checkout_id, items, user_id, ttl_s)
+
+        marker = _marker(checkout_id)
+        if items:
+            from pymongo import UpdateOne
+            result = await self._products.bulk_write([
+                UpdateOne({"_id": ObjectId(pid), "quantity": {"$gte": qty}, marker: {"$exists": False}},
+                          {"$inc": {"quantity": -qty}, "$set": {marker: qty}})
+                for pid, qty in items.items()
+            ], ordered=False)
+            if result.modified_count < len(items):
+                unavailable = await self._unavailable(items, marker)
+                await self._restore(checkout_id, items)
+                await self._reservations.delete_one({"_id": checkout_id, "status": RESERVING})
+                from core.exceptions import InventoryUnavailableError
+                raise InventoryUnavailableError(
+                    f"{len(unavailable)} item(s) unavailable: "
+                    + ", ".join(item["product_id"] for item in unavailable), items=unavailable)
+
+        held = await self._reservations.update_one({"_id": checkout_id, "status": RESERVING},
+                                                   {"$set": {"status": HELD}})
+        if held.modified_count == 0:
+            # Swept as expired while we were reserving; make sure nothing stays taken
+            await self._restore(checkout_id, items)
+            from core.exceptions import InventoryUnavailableError
+            raise InventoryUnavailableError(f"Reservation {checkout_id} expired while reserving")
+        reservation["status"] = HELD
+        return reservation
+
+    async def _replay(self, checkout_id: str, items: Dict[str, int], user_id: Optional[str],
+                      ttl_s: Optional[int]) -> Dict:
+        """The outcome of an earlier reserve() with the same checkout_id"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.inventory_reserve_wait_ms / 1000
+        while True:
+            existing = await self._reservations.find_one({"_id": checkout_id})
+            if existing is None:
+                # The first attempt failed and was cleaned up: try again
+                return await self.reserve(checkout_id, items, user_id, ttl_s)
+            if existing["items"] != items:
+                raise ValueError(f"Checkout {checkout_id} was already reserved with different items")
+            if existing["status"] in (HELD, COMMITTED):
+                return existing
+            if existing["status"] == RELEASED:
+                from core.exceptions import InventoryUnavailableError
+                raise InventoryUnavailableError(f"Reservation {checkout_id} was released")
+            if loop.time() >= deadline:
+                from core.exceptions import InventoryUnavailableError
+                raise InventoryUnavailableError(f"Reservation {checkout_id} is still being made")
+            await asyncio.sleep(0.05)
+
+    async def _unavailable(self, items: Dict[str, int], marker: str) -> List[Dict]:
+        """Lines that weren't decremented, with the stock left, like validate_cart_inventory"""
+        docs = await self._products.find(
+            {"_id": {"$in": [ObjectId(pid) for pid in items]}}, {"quantity": 1, marker: 1}
+        ).to_list()
+        found = {str(doc["_id"]): doc for doc in docs}
+        field = marker.split(".", 1)[1]
+        unavailable = []
+        for pid, qty in items.items():
+            doc = found.get(pid)
+            if doc is None or field not in doc.get("reserved", {}):
+                unavailable.append({"product_id": pid, "requested": qty,
+                                    "available": doc.get("quantity", 0) if doc else 0})
+        return unavailable
+
+    async def _restore(self, checkout_id: str, items: Dict[str, int]):
+        """Put back every line still marked for this reservation"""
+        if not items:
+            return
+        from pymongo import UpdateOne
+        marker = _marker(checkout_id)
+        await self._products.bulk_write([
+            UpdateOne({"_id": ObjectId(pid), marker: {"$exists": True}},
+                      {"$inc": {"quantity": qty}, "$unset": {marker: ""}})
+            for pid, qty in items.items()
+        ], ordered=False)
+
+    # Settling
+
+    async def commit(self, checkout_id: str) -> bool:
+        """Payment went through: keep the stock taken. False if the reservation is gone."""
+        reservation = await self._reservations.find_one_and_update(
+            {"_id": checkout_id, "status": HELD},
+            {"$set": {"status": COMMITTED, "committed_at": _now()}})
+        if reservation is None:
+            existing = await self._reservations.find_one({"_id": checkout_id}, {"status": 1})
+            return existing is not None and existing["status"] == COMMITTED
+        if reservation["items"]:
+            from pymongo import UpdateOne
+            marker = _marker(checkout_id)
+            await self._products.bulk_write([
+                UpdateOne({"_id": ObjectId(pid), marker: {"$exists": True}}, {"$unset": {marker: ""}})
+                for pid in reservation["items"]
+            ], ordered=False)
+        return True
+
+    async def release(self, checkout_id: str) -> bool:
+        """Checkout abandoned: put the stock back. False if nothing was held."""
+        return await self._release({"_id": checkout_id, "status": HELD})
+
+    async def _release(self, query: Dict) -> bool:
+        reservation = await self._reservations.find_one_and_update(
+            query, {"$set": {"status": RELEASED, "restored": False, "released_at": _now()}})
+        if reservation is None:
+            return False
+        await self._restore(reservation["_id"], reservation["items"])
+        await self._reservations.update_one({"_id": reservation["_id"]}, {"$set": {"restored": True}})
+        return True
+
+    async def sweep(self, limit: int = 1000) -> int:
+        """Release expired reservations and finish interrupted releases"""
+        now = _now()
+        expired = await self._reservations.find(
+            {"status": {"$in": [RESERVING, HELD]}, "expires_at": {"$lt": now}}, {"_id": 1}
+        ).limit(limit).to_list()
+        released = 0
+        for reservation in expired:
+            released += await self._release({"_id": reservation["_id"], "status": {"$in": [RESERVING, HELD]},
+                                             "expires_at": {"$lt": now}})
+
+        interrupted = await self._reservations.find(
+            {"status": RELEASED, "restored": False, "released_at": {"$lt": now - RESTORE_GRACE}}
+        ).limit(limit).to_list()
+        for reservation in interrupted:
+            await self._restore(reservation["_id"], reservation["items"])
+            await self._reservations.update_one({"_id": reservation["_id"]}, {"$set": {"restored": True}})
+        return released
+
+    async def run(self, interval_s: Optional[float] = None):
+        """Sweep periodically until cancelled"""
+        interval_s = interval_s or settings.inventory_sweep_interval_s
+        while True:
+            try:
+                released = await self.sweep()
+                if released:
+                    log.info("expired inventory reservations released", count=released)
+            except Exception as e:
+                log.error("inventory reservation sweep failed", error=e)
+            await asyncio.sleep(interval_s)
+
+
+@instrument("tool")
+async def reserve_cart_inventory(cart: Dict, checkout_id: str, ttl_s: Optional[int] = None) -> Dict:
+    """Reserve stock for every line of a cart, or raise InventoryUnavailableError"""
+    return await inventory_reservations.reserve(checkout_id, cart_quantities(cart),
+                                                user_id=cart.get("userId"), ttl_s=ttl_s)
+
+
+@instrument("tool")
+async def commit_reservation(checkout_id: str) -> bool:
+    """Keep a checkout's reserved stock once payment has completed"""
+    return await inventory_reservations.commit(checkout_id)
+
+
+@instrument("tool")
+async def release_reservation(checkout_id: str) -> bool:
+    """Return a checkout's reserved stock"""
+    return await inventory_reservations.release(checkout_id)
+
+
+# Global inventory reservation store
+inventory_reservations = InventoryReservations()
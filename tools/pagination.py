@@ -0,0 +1,138 @@
+"""
+Keyset pagination and streaming over MongoDB collections
+
+Listings are read in batches ordered by (sort key, _id). Each batch is a
+fresh query starting after the last document seen, instead of skip/limit,
+so deep pages cost the same as the first one, memory stays at one batch,
+and a listing can resume from an opaque continuation token.
+"""
+
+import base64
+from typing import Any, AsyncIterator, Dict, List, Optional
+from bson import ObjectId, json_util
+from bson.errors import InvalidId
+from config.settings import settings
+
+SORT_KEYS = ("_id", "price", "date", "title")
+
+
+class ContinuationToken:
+    """Position after the last document returned: its sort value and _id.
+
+    Encoded as Extended JSON, so datetimes, ObjectIds and Decimal128 values
+    come back as the same BSON types and compare the way the index does.
+    """
+
+    def __init__(self, sort: str, descending: bool, value: Any, last_id: Any):
+        self.sort = sort
+        self.descending = descending
+        self.value = value
+        self.last_id = last_id
+
+    @classmethod
+    def after(cls, doc: Dict, sort: str, descending: bool) -> 'ContinuationToken':
+        return cls(sort, descending, doc.get(sort), doc["_id"])
+
+    def encode(self) -> str:
+        value = None if self.sort == "_id" else self.value  # Same as last_id
+        raw = json_util.dumps([self.sort, self.descending, value, self.last_id], separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> 'ContinuationToken':
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            fields = json_util.loads(raw)
+            if len(fields) == 5:  # Issued before tokens were Extended JSON
+                sort, descending, value, last_id, is_oid = fields
+                if is_oid:
+                    last_id = ObjectId(last_id)
+            else:
+                sort, descending, value, last_id = fields
+            if sort == "_id":
+                value = last_id
+        except (ValueError, TypeError, InvalidId):
+            raise ValueError("Invalid continuation token")
+        return cls(sort, descending, value, last_id)
+
+    def query(self) -> Dict:
+        """Filter matching only documents after this position"""
+        after = "$lt" if self.descending else "$gt"
+        if self.sort == "_id":
+            return {"_id": {after: self.last_id}}
+        tie = {self.sort: self.value, "_id": {after: self.last_id}}
+        # Missing/null sort keys sort first ascending and last descending
+        if self.value is None:
+            return tie if self.descending else {"$or": [{self.sort: {"$ne": None}}, tie]}
+        later = [{self.sort: {after: self.value}}, tie]
+        if self.descending:
+            later.append({self.sort: None})
+        return {"$or": later}
+
+
+def _check_sort(sort: str):
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Cannot sort by {sort!r}; expected one of {SORT_KEYS}")
+
+
+def _with_sort_key(projection: Optional[Dict[str, int]], sort: str) -> Optional[Dict[str, int]]:
+    """Make sure an inclusion projection keeps the key the token is built from"""
+    if projection and any(projection.values()) and sort not in projection:
+        return {**projection, sort: 1}
+    return projection
+
+
+async def _read_batch(collection, query: Dict, projection: Optional[Dict[str, int]],
+                      sort: str, descending: bool, position: Optional[ContinuationToken],
+                      limit: int) -> List[Dict]:
+    if position is not None:
+        query = {"$and": [query, position.query()]} if query else position.query()
+    direction = -1 if descending else 1
+    order = [("_id", direction)] if sort == "_id" else [(sort, direction), ("_id", direction)]
+    return await collection.find(query, projection).sort(order).limit(limit).to_list()
+
+
+def _resume_from(token: Optional[str], sort: str, descending: bool) -> Optional[ContinuationToken]:
+    if not token:
+        return None
+    position = ContinuationToken.decode(token)
+    if (position.sort, position.descending) != (sort, descending):
+        raise ValueError("Continuation token was issued for a different sort order")
+    return position
+
+
+async def stream(collection, query: Dict, projection: Optional[Dict[str, int]] = None,
+                 sort: str = "_id", descending: bool = False, batch_size: int = None,
+                 after: Optional[str] = None) -> AsyncIterator[Dict]:
+    """Yield raw documents in (sort, _id) order, one batch in memory at a time"""
+    _check_sort(sort)
+    batch_size = batch_size or settings.listing_batch_size
+    projection = _with_sort_key(projection, sort)
+    position = _resume_from(after, sort, descending)
+    while True:
+        docs = await _read_batch(collection, query, projection, sort, descending, position, batch_size)
+        if not docs:
+            return
+        # Taken before yielding: consumers may serialize documents in place
+        position = ContinuationToken.after(docs[-1], sort, descending)
+        for doc in docs:
+            yield doc
+        if len(docs) < batch_size:
+            return
+
+
+async def page(collection, query: Dict, projection: Optional[Dict[str, int]] = None,
+               sort: str = "_id", descending: bool = False, page_size: int = None,
+               token: Optional[str] = None) -> Dict:
+    """One page of raw documents plus the token for the next (None at the end)"""
+    _check_sort(sort)
+    page_size = page_size or settings.listing_page_size
+    projection = _with_sort_key(projection, sort)
+    position = _resume_from(token, sort, descending)
+    # One extra document tells whether another page exists
+    docs = await _read_batch(collection, query, projection, sort, descending, position, page_size + 1)
+    next_token = None
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        next_token = ContinuationToken.after(docs[-1], sort, descending).encode()
+    return {"items": docs, "next_token": next_token}
@@ -0,0 +1,152 @@
+"""
+Time-bucketed price history
+
+Instead of one document per price tick, price_history holds one document
+per product per bucket:
+
+- "hour" buckets keep the raw points ({"t", "p"}) plus their rollup
+- "day" buckets keep only the rollup
+
+A rollup is min, max, sum and count (for the mean) and last, stored as
+{"t", "p"}: BSON compares embedded documents field by field, so $max keeps
+the latest point even if ticks arrive out of order. Each tick is two upserts
+keyed by a deterministic _id, queued through the write-behind sink, so
+recording a price never waits on MongoDB.
+
+Window queries read rollups only: a 30-day window for 1000 products touches
+30,000 small day documents instead of every tick. Windows are aligned to
+bucket boundaries of the chosen resolution.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from config.mongodb import db
+from core.metrics import instrument
+from tools.write_behind import get_write_sink
+
+RESOLUTIONS = {"hour": 3600, "day": 86400}
+POINTS_RESOLUTION = "hour"
+
+
+def bucket_start(at: datetime, resolution: str) -> datetime:
+    """Start of the bucket containing `at` (UTC)"""
+    size = RESOLUTIONS[resolution]
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    epoch = int(at.timestamp()) // size * size
+    return datetime.fromtimestamp(epoch, timezone.utc)
+
+
+def bucket_id(product_id: str, resolution: str, start: datetime) -> str:
+    return f"{product_id}:{resolution}:{int(start.timestamp())}"
+
+
+class PriceHistoryStore:
+    """Records price ticks into buckets and answers windowed rollup queries"""
+
+    def __init__(self, collection: str = "price_history"):
+        self.collection = collection
+
+    @property
+    def _coll(self):
+        return db.aio.db[self.collection]
+
+    async def ensure_indexes(self):
+        await self._coll.create_index([("product_id", 1), ("resolution", 1), ("bucket", 1)])
+
+    def _updates(self, product_id: str, price: float, at: datetime):
+        for resolution in RESOLUTIONS:
+            start = bucket_start(at, resolution)
+            update = {
+                "$setOnInsert": {"product_id": product_id, "resolution": resolution, "bucket": start},
+                "$min": {"min": price},
+                "$max": {"max": price, "last": {"t": at, "p": price}},
+                "$inc": {"sum": price, "count": 1},
+            }
+            if resolution == POINTS_RESOLUTION:
+                update["$push"] = {"points": {"t": at, "p": price}}
+            yield {"_id": bucket_id(product_id, resolution, start)}, update
+
+    async def record(self, product_id: str, price: float, at: Optional[datetime] = None):
+        """Queue one price tick (written behind)"""
+        at = at or datetime.now(timezone.utc)
+        sink = get_write_sink()
+        for filter, update in self._updates(product_id, price, at):
+            await sink.update(self.collection, filter, update)
+
+    async def record_many(self, ticks: Iterable[Tuple[str, float, Optional[datetime]]]):
+        """Queue (product_id, price, at) ticks; at=None means now"""
+        for product_id, price, at in ticks:
+            await self.record(product_id, price, at)
+
+    def _window_match(self, product_ids: List[str], start: datetime, end: datetime,
+                      resolution: str) -> Dict:
+        return {
+            "product_id": {"$in": product_ids},
+            "resolution": resolution,
+            "bucket": {"$gte": bucket_start(start, resolution), "$lt": end},
+        }
+
+    async def windows(self, product_ids: Iterable[str], start: datetime, end: datetime = None,
+                      resolution: str = "day") -> Dict[str, Dict]:
+        """min/max/mean/last/count per product over [start, end), from rollups"""
+        product_ids = list(dict.fromkeys(product_ids))
+        end = end or datetime.now(timezone.utc)
+        pipeline = [
+            {"$match": self._window_match(product_ids, start, end, resolution)},
+            {"$group": {
+                "_id": "$product_id",
+                "min": {"$min": "$min"},
+                "max": {"$max": "$max"},
+                "sum": {"$sum": "$sum"},
+                "count": {"$sum": "$count"},
+                "last": {"$max": "$last"},
+            }},
+        ]
+        cursor = await self._coll.aggregate(pipeline)
+        results = {}
+        for doc in await cursor.to_list():
+            results[doc["_id"]] = {
+                "min": doc["min"],
+                "max": doc["max"],
+                "mean": doc["sum"] / doc["count"] if doc["count"] else None,
+                "last": doc["last"]["p"] if doc.get("last") else None,
+                "last_at": doc["last"]["t"] if doc.get("last") else None,
+                "count": doc["count"],
+            }
+        return results
+
+    async def series(self, product_id: str, start: datetime, end: datetime = None,
+                     resolution: str = "day", points: bool = False) -> List[Dict]:
+        """Per-bucket rollups (and raw points for hour buckets) in time order"""
+        end = end or datetime.now(timezone.utc)
+        projection = {"_id": 0, "bucket": 1, "min": 1, "max": 1, "sum": 1, "count": 1, "last": 1}
+        if points:
+            projection["points"] = 1
+        docs = await self._coll.find(self._window_match([product_id], start, end, resolution),
+                                     projection).sort("bucket", 1).to_list()
+        for doc in docs:
+            doc["mean"] = doc.pop("sum") / doc["count"] if doc.get("count") else None
+            doc["last"] = doc["last"]["p"] if doc.get("last") else None
+        return docs
+
+
+# Global price history store
+price_history = PriceHistoryStore()
+
+
+@instrument("tool")
+async def get_pricing_history(product_id: str, days: int = 30) -> Dict:
+    """Daily min/max/mean/last prices for a product over the last `days` days"""
+    start = datetime.now(timezone.utc) - timedelta(days=days)
+    daily = await price_history.series(product_id, start)
+    summary = (await price_history.windows([product_id], start)).get(product_id)
+    return {"product_id": product_id, "days": days, "summary": summary, "daily": daily}
+
+
+@instrument("tool")
+async def get_price_windows(product_ids: List[str], days: int = 7,
+                            resolution: str = "day") -> Dict[str, Dict]:
+    """Price rollups over the last `days` days for many products in one query"""
+    start = datetime.now(timezone.utc) - timedelta(days=days)
+    return await price_history.windows(product_ids, start, resolution=resolution)
@@ -0,0 +1,288 @@
+"""
+Vectorized batch pricing
+
+The catalog is loaded once into a PriceBook: column arrays of base price,
+current price, stock quantity, demand and category/department codes, one row
+per product. Every pricing rule is an array operation over the whole book
+instead of a Python loop per product:
+
+1. dynamic price  = base x demand factor x scarcity premium, clipped to the
+                    product's bounds (min_price/max_price, else floor/ceiling
+                    ratios of base)
+2. promotions     = per-rule scope masks; the best single discount wins
+3. tier discount  = one multiplier for the whole book (TIER_DISCOUNTS)
+
+Discounted prices never drop below a product's min_price. reprice_catalog()
+compares dynamic prices with the current ones and publishes PRICE_CHANGED for
+every product that moved by more than pricing_change_threshold, in pipelined
+chunks.
+
+A promotion is a plain document:
+
+    {"_id": ..., "discount_type": "percent" | "fixed", "value": 10,
+     "product_ids": [...], "categories": [...], "departments": [...],
+     "tiers": [...]}
+
+Empty or missing scope lists match everything.
+"""
+
+import asyncio
+from typing import Dict, Iterable, List, Optional, Set
+import numpy as np
+from bson import ObjectId
+from config.mongodb import db
+from config.settings import settings
+from core.lazy import LazySingleton
+from tools import pagination
+
+# Fraction taken off for each get_user_tier() tier
+TIER_DISCOUNTS = {"guest": 0.0, "bronze": 0.0, "silver": 0.02, "gold": 0.05, "vip": 0.10}
+
+PRICE_FIELDS = {"price": 1, "base_price": 1, "min_price": 1, "max_price": 1,
+                "quantity": 1, "category": 1, "department": 1}
+EVENT_CHUNK = 1000
+
+
+def tier_multiplier(tier: Optional[str]) -> float:
+    return 1.0 - TIER_DISCOUNTS.get(tier or "guest", 0.0)
+
+
+class PriceBook:
+    """Column arrays of pricing inputs, one row per product"""
+
+    def __init__(self, ids: List[str], base: np.ndarray, price: np.ndarray, quantity: np.ndarray,
+                 category: np.ndarray, department: np.ndarray, categories: List[str],
+                 departments: List[str], min_price: np.ndarray, max_price: np.ndarray,
+                 demand: Optional[np.ndarray] = None):
+        self.ids = ids
+        self.base = base
+        self.price = price
+        self.quantity = quantity
+        self.category = category  # Codes into self.categories
+        self.department = department
+        self.categories = categories
+        self.departments = departments
+        self.min_price = min_price  # NaN where the product sets no bound
+        self.max_price = max_price
+        self.demand = np.ones(len(ids)) if demand is None else demand
+        self._rows: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def rows(self) -> Dict[str, int]:
+        if self._rows is None:
+            self._rows = {product_id: row for row, product_id in enumerate(self.ids)}
+        return self._rows
+
+    @classmethod
+    def from_documents(cls, docs: Iterable[Dict], demand: Optional[Dict[str, float]] = None) -> 'PriceBook':
+        """Build from product documents; demand maps product id -> signal (1.0 is normal)"""
+        ids, base, price, quantity, min_price, max_price = [], [], [], [], [], []
+        category_names, department_names = [], []
+        for doc in docs:
+            current = float(doc.get("price") or 0.0)
+            ids.append(str(doc["_id"]))
+            price.append(current)
+            base.append(float(doc.get("base_price") or current))
+            quantity.append(float(doc.get("quantity") or 0))
+            min_price.append(doc.get("min_price", np.nan))
+            max_price.append(doc.get("max_price", np.nan))
+            category_names.append(doc.get("category") or "")
+            department_names.append(doc.get("department") or "")
+        categories, category = np.unique(np.array(category_names, dtype=object), return_inverse=True)
+        departments, department = np.unique(np.array(department_names, dtype=object), return_inverse=True)
+        book = cls(ids, np.array(base), np.array(price), np.array(quantity),
+                   category.astype(np.int32), department.astype(np.int32),
+                   list(categories), list(departments),
+                   np.array(min_price, dtype=float), np.array(max_price, dtype=float))
+        if demand:
+            book.set_demand(demand)
+        return book
+
+    @classmethod
+    async def load(cls, query: Optional[Dict] = None, demand: Optional[Dict[str, float]] = None) -> 'PriceBook':
+        """Stream the pricing fields of matching products into a book"""
+        docs = [doc async for doc in pagination.stream(db.aio.products, query or {}, PRICE_FIELDS,
+                                                       batch_size=5000)]
+        return cls.from_documents(docs, demand)
+
+    def set_demand(self, demand: Dict[str, float]):
+        rows = self.rows
+        for product_id, signal in demand.items():
+            row = rows.get(product_id)
+            if row is not None:
+                self.demand[row] = signal
+
+    def scope_mask(self, promotion: Dict) -> np.ndarray:
+        """Rows a promotion applies to (all rows when it has no scope)"""
+        mask = np.ones(len(self), dtype=bool)
+        if promotion.get("product_ids"):
+            rows = [self.rows[pid] for pid in map(str, promotion["product_ids"]) if pid in self.rows]
+            mask = np.zeros(len(self), dtype=bool)
+            mask[rows] = True
+        if promotion.get("categories"):
+            codes = [i for i, name in enumerate(self.categories) if name in promotion["categories"]]
+            mask &= np.isin(self.category, codes)
+        if promotion.get("departments"):
+            codes = [i for i, name in enumerate(self.departments) if name in promotion["departments"]]
+            mask &= np.isin(self.department, codes)
+        return mask
+
+
+class BatchPricingEngine:
+    """Applies demand, scarcity, promotions, tier discounts and bounds to a PriceBook"""
+
+    def __init__(self, demand_sensitivity: float = None, low_stock_threshold: int = None,
+                 scarcity_premium: float = None, floor_ratio: float = None,
+                 ceiling_ratio: float = None, change_threshold: float = None):
+        self.demand_sensitivity = settings.pricing_demand_sensitivity if demand_sensitivity is None else demand_sensitivity
+        self.low_stock_threshold = low_stock_threshold or settings.pricing_low_stock_threshold
+        self.scarcity_premium = settings.pricing_scarcity_premium if scarcity_premium is None else scarcity_premium
+        self.floor_ratio = floor_ratio or settings.pricing_floor_ratio
+        self.ceiling_ratio = ceiling_ratio or settings.pricing_ceiling_ratio
+        self.change_threshold = settings.pricing_change_threshold if change_threshold is None else change_threshold
+
+    def bounds(self, book: PriceBook):
+        lower = np.where(np.isnan(book.min_price), book.base * self.floor_ratio, book.min_price)
+        upper = np.where(np.isnan(book.max_price), book.base * self.ceiling_ratio, book.max_price)
+        return lower, np.maximum(upper, lower)
+
+    def dynamic_prices(self, book: PriceBook) -> np.ndarray:
+        """Base price adjusted for demand and low stock, within bounds"""
+        demand = 1.0 + self.demand_sensitivity * (book.demand - 1.0)
+        shortfall = np.clip(1.0 - book.quantity / self.low_stock_threshold, 0.0, 1.0)
+        scarcity = 1.0 + self.scarcity_premium * shortfall
+        lower, upper = self.bounds(book)
+        return np.clip(book.base * demand * scarcity, lower, upper)
+
+    @staticmethod
+    def promotion_discounts(book: PriceBook, prices: np.ndarray, promotions: Iterable[Dict],
+                            tier: Optional[str] = None) -> np.ndarray:
+        """Best single promotion discount (an amount) per row; promotions don't stack"""
+        best = np.zeros(len(book))
+        for promotion in promotions:
+            if promotion.get("tiers") and tier not in promotion["tiers"]:
+                continue
+            mask = book.scope_mask(promotion)
+            value = float(promotion.get("value") or 0.0)
+            if promotion.get("discount_type") == "fixed":
+                discount = np.where(mask, value, 0.0)
+            else:
+                discount = np.where(mask, prices * (value / 100.0), 0.0)
+            np.maximum(best, discount, out=best)
+        return best
+
+    def price(self, book: PriceBook, promotions: Iterable[Dict] = (), tier: Optional[str] = None,
+              dynamic: bool = True) -> np.ndarray:
+        """Final prices for every row, rounded to cents"""
+        prices = self.dynamic_prices(book) if dynamic else book.price.copy()
+        prices -= self.promotion_discounts(book, prices, promotions, tier)
+        prices *= tier_multiplier(tier)
+        # Discounts may go below the dynamic floor but never below a product's
+        # own min_price, or zero
+        np.maximum(prices, np.nan_to_num(book.min_price, nan=0.0), out=prices)
+        return np.round(prices, 2)
+
+    def changes(self, book: PriceBook, new_prices: np.ndarray) -> np.ndarray:
+        """Rows whose price moved by more than change_threshold"""
+        old = book.price
+        moved = np.abs(new_prices - old) > self.change_threshold * np.maximum(old, 0.01)
+        return np.flatnonzero(moved)
+
+    async def reprice_catalog(self, book: PriceBook, persist: bool = True, publish: bool = True,
+                              record_history: bool = True) -> Dict:
+        """Apply dynamic prices to the catalog and announce the changes"""
+        new_prices = self.dynamic_prices(book).round(2)
+        rows = self.changes(book, new_prices)
+        ids = [book.ids[row] for row in rows]
+        old = book.price[rows].tolist()
+        new = new_prices[rows].tolist()
+
+        if persist and ids:
+            applied = await self._persist(ids, old, new)
+            # Products changed by hand meanwhile kept their price: nothing to
+            # record or announce for them, and the book no longer knows their price
+            keep = [i for i, pid in enumerate(ids) if pid in applied]
+            if len(keep) < len(ids):
+                rows = rows[keep]
+                ids = [ids[i] for i in keep]
+                old = [old[i] for i in keep]
+                new = [new[i] for i in keep]
+        if record_history and ids:
+            from tools.price_history import price_history
+            await price_history.record_many((pid, price, None) for pid, price in zip(ids, new))
+        if publish and ids:
+            await self._publish(ids, old, new)
+
+        book.price[rows] = new_prices[rows]
+        return {"products": len(book), "changed": len(ids)}
+
+    @staticmethod
+    async def _persist(ids: List[str], old: List[float], new: List[float]) -> Set[str]:
+        """Write the new prices; returns the ids that were actually updated"""
+        from pymongo import UpdateOne
+        applied: Set[str] = set()
+        # Only update products still at the price the book was loaded with,
+        # so a concurrent manual change isn't overwritten
+        for start in range(0, len(ids), EVENT_CHUNK):
+            chunk = ids[start:start + EVENT_CHUNK]
+            prices = new[start:start + EVENT_CHUNK]
+            result = await db.aio.products.bulk_write([
+                UpdateOne({"_id": ObjectId(pid), "price": old_price},
+                          [{"$set": {"base_price": {"$ifNull": ["$base_price", "$price"]}, "price": price}}])
+                for pid, old_price, price in zip(chunk, old[start:start + EVENT_CHUNK], prices)
+            ], ordered=False)
+            if result.matched_count == len(chunk):
+                applied.update(chunk)
+                continue
+            # Some were skipped: the updated ones are those now at their new price
+            expected = dict(zip(chunk, prices))
+            docs = await db.aio.products.find(
+                {"_id": {"$in": [ObjectId(pid) for pid in chunk]}}, {"price": 1}).to_list()
+            applied.update(str(doc["_id"]) for doc in docs if doc.get("price") == expected[str(doc["_id"])])
+        return applied
+
+    @staticmethod
+    async def _publish(ids: List[str], old: List[float], new: List[float]):
+        from agents.events.bus import event_bus
+        from agents.events.event_types import EventType
+        events = [(EventType.PRICE_CHANGED, {"product_id": pid, "old_price": old_price, "new_price": price})
+                  for pid, old_price, price in zip(ids, old, new)]
+        for start in range(0, len(events), EVENT_CHUNK):
+            await asyncio.to_thread(event_bus.publish_many, events[start:start + EVENT_CHUNK])
+
+    def price_cart(self, cart: Dict, tier: Optional[str] = None,
+                   promotions: Iterable[Dict] = ()) -> Dict:
+        """Discounted line and cart totals for a cart document"""
+        items = cart.get("items", {})
+        if not items:
+            return {"subtotal": 0.0, "discount": 0.0, "total": 0.0, "lines": {}}
+        docs, quantities = [], []
+        for product_id, cart_item in items.items():
+            product = cart_item.get("item") or {}
+            qty = cart_item.get("qty", 0)
+            unit = cart_item.get("price", 0) / qty if qty else product.get("price", 0)
+            docs.append({**product, "_id": product_id, "price": unit, "base_price": unit})
+            quantities.append(qty)
+        book = PriceBook.from_documents(docs)
+        qty = np.array(quantities, dtype=float)
+        unit = self.price(book, promotions, tier, dynamic=False)
+        subtotal = float((book.price * qty).sum())
+        total = float(np.round((unit * qty).sum(), 2))
+        return {
+            "subtotal": round(subtotal, 2),
+            "discount": round(subtotal - total, 2),
+            "total": total,
+            "lines": {pid: {"qty": int(q), "unit_price": float(u)} for pid, q, u in zip(book.ids, qty, unit)},
+        }
+
+
+def get_pricing_engine() -> BatchPricingEngine:
+    """The process-wide pricing engine, created on first use"""
+    return pricing_engine.get()
+
+
+# Global batch pricing engine (created lazily)
+pricing_engine: BatchPricingEngine = LazySingleton(BatchPricingEngine)
@@ -0,0 +1,310 @@
+"""
+Compiled promotion index
+
+Active promotions are compiled into inverted indexes instead of being
+scanned for every cart line:
+
+- scope: product id, category and department -> promotion ids, plus the
+  sitewide promotions that have no scope at all
+- tier:  tier -> promotion ids, plus the promotions open to every tier
+- time:  a heap of pending start times and a heap of active end times. The
+  active set is swept forward as the clock advances, so promotions switch on
+  and off on schedule without waiting for an event. A promotion that ends is
+  dropped from every index, so lookups and memory follow the promotions that
+  are live or upcoming, and queries about the past only see those.
+
+Matching a cart line unions a handful of small sets and intersects them with
+the active and tier-eligible sets: the cost follows the promotions that could
+apply, not the size of the promotions collection.
+
+PROMOTION_CREATED re-reads and recompiles one promotion, PROMOTION_EXPIRED
+drops it. Promotions use the document shape of tools.pricing_engine, plus:
+
+    "starts_at"/"ends_at"  datetimes, missing means unbounded
+    "priority"             int, default 0; only the highest-priority
+                           applicable promotions compete for a line
+    "exclusive"            bool; an exclusive promotion claims the line over
+                           non-exclusive ones. Two exclusive promotions at
+                           the same priority on one line are a conflict and
+                           raise PricingConflictError.
+"""
+
+import asyncio
+import heapq
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+from config.mongodb import db
+from core.metrics import instrument
+
+
+def _timestamp(value, default: float) -> float:
+    if value is None:
+        return default
+    if isinstance(value, datetime):
+        if value.tzinfo is None:  # pymongo returns naive UTC datetimes
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+    return float(value)
+
+
+class CompiledPromotion:
+    """A promotion document reduced to what matching needs"""
+
+    __slots__ = ("id", "doc", "discount_type", "value", "priority", "exclusive",
+                 "starts", "ends", "tiers", "product_ids", "categories", "departments")
+
+    def __init__(self, doc: Dict):
+        self.id = str(doc["_id"])
+        self.doc = doc
+        self.discount_type = doc.get("discount_type", "percent")
+        self.value = float(doc.get("value") or 0.0)
+        self.priority = int(doc.get("priority") or 0)
+        self.exclusive = bool(doc.get("exclusive"))
+        self.starts = _timestamp(doc.get("starts_at"), -math.inf)
+        self.ends = _timestamp(doc.get("ends_at"), math.inf)
+        self.tiers = set(doc.get("tiers") or ())
+        self.product_ids = {str(pid) for pid in doc.get("product_ids") or ()}
+        self.categories = set(doc.get("categories") or ())
+        self.departments = set(doc.get("departments") or ())
+
+    @property
+    def sitewide(self) -> bool:
+        return not (self.product_ids or self.categories or self.departments)
+
+    def applies_to(self, product_id: str, category: str, department: str) -> bool:
+        """Every scope the promotion sets must match, like PriceBook.scope_mask"""
+        return ((not self.product_ids or product_id in self.product_ids)
+                and (not self.categories or category in self.categories)
+                and (not self.departments or department in self.departments))
+
+    def discount(self, unit_price: float) -> float:
+        """Discount per unit, never more than the price itself"""
+        if self.discount_type == "fixed":
+            return min(self.value, unit_price)
+        return unit_price * self.value / 100.0
+
+
+class PromotionIndex:
+    """Inverted indexes over active promotions for cart-line matching"""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.promotions: Dict[str, CompiledPromotion] = {}
+        self.by_product: Dict[str, Set[str]] = defaultdict(set)
+        self.by_category: Dict[str, Set[str]] = defaultdict(set)
+        self.by_department: Dict[str, Set[str]] = defaultdict(set)
+        self.sitewide: Set[str] = set()
+        self.by_tier: Dict[str, Set[str]] = defaultdict(set)
+        self.all_tiers: Set[str] = set()
+        # Interval index: (start, id) not yet started, (end, id) started
+        self._pending: List = []
+        self._ending: List = []
+        self.active: Set[str] = set()
+        self._swept_at = -math.inf
+        self.loaded = False
+        self._load_lock = asyncio.Lock()
+
+    # Building
+
+    async def load(self):
+        """(Re)compile every promotion that hasn't ended"""
+        now = datetime.fromtimestamp(self.clock(), timezone.utc)
+        docs = await db.aio.promotions.find(
+            {"$or": [{"ends_at": {"$gt": now}}, {"ends_at": None}]}
+        ).to_list()
+        self.clear()
+        for doc in docs:
+            self._add(doc)
+        self.loaded = True
+
+    async def ensure_loaded(self):
+        """Compile once, even with concurrent first callers"""
+        if self.loaded:
+            return
+        async with self._load_lock:
+            if not self.loaded:
+                await self.load()
+
+    def clear(self):
+        self.promotions.clear()
+        self.by_product.clear()
+        self.by_category.clear()
+        self.by_department.clear()
+        self.sitewide.clear()
+        self.by_tier.clear()
+        self.all_tiers.clear()
+        self._pending = []
+        self._ending = []
+        self.active.clear()
+        self._swept_at = -math.inf
+
+    def add(self, doc: Dict):
+        """Compile or recompile a single promotion"""
+        self._add(doc)
+
+    def _add(self, doc: Dict):
+        promotion = CompiledPromotion(doc)
+        self.remove(promotion.id)
+        self.promotions[promotion.id] = promotion
+
+        for product_id in promotion.product_ids:
+            self.by_product[product_id].add(promotion.id)
+        for category in promotion.categories:
+            self.by_category[category].add(promotion.id)
+        for department in promotion.departments:
+            self.by_department[department].add(promotion.id)
+        if promotion.sitewide:
+            self.sitewide.add(promotion.id)
+        for tier in promotion.tiers:
+            self.by_tier[tier].add(promotion.id)
+        if not promotion.tiers:
+            self.all_tiers.add(promotion.id)
+
+        if promotion.starts > self._swept_at:
+            heapq.heappush(self._pending, (promotion.starts, promotion.id))
+        elif promotion.ends > self._swept_at:
+            self.active.add(promotion.id)
+            heapq.heappush(self._ending, (promotion.ends, promotion.id))
+        else:
+            self.remove(promotion.id)  # Already over
+
+    def remove(self, promotion_id: str):
+        """Drop a promotion; stale heap entries are skipped when swept"""
+        promotion = self.promotions.pop(promotion_id, None)
+        if promotion is None:
+            return
+        for index, keys in ((self.by_product, promotion.product_ids),
+                            (self.by_category, promotion.categories),
+                            (self.by_department, promotion.departments),
+                            (self.by_tier, promotion.tiers)):
+            for key in keys:
+                index[key].discard(promotion_id)
+                if not index[key]:
+                    del index[key]
+        self.sitewide.discard(promotion_id)
+        self.all_tiers.discard(promotion_id)
+        self.active.discard(promotion_id)
+
+    def _sweep(self, now: float):
+        """Advance the active set to `now`"""
+        if now < self._swept_at:
+            return
+        while self._pending and self._pending[0][0] <= now:
+            _, promotion_id = heapq.heappop(self._pending)
+            promotion = self.promotions.get(promotion_id)
+            if promotion is None or promotion.starts > now:
+                continue  # Removed or rescheduled since it was pushed
+            if promotion.ends > now:
+                self.active.add(promotion_id)
+                heapq.heappush(self._ending, (promotion.ends, promotion_id))
+            else:
+                self.remove(promotion_id)  # Started and ended between sweeps
+        while self._ending and self._ending[0][0] <= now:
+            _, promotion_id = heapq.heappop(self._ending)
+            promotion = self.promotions.get(promotion_id)
+            if promotion is not None and promotion.ends <= now:
+                self.remove(promotion_id)
+        self._swept_at = now
+
+    # Matching
+
+    def candidates(self, product_id: str, category: str = "", department: str = "",
+                   tier: Optional[str] = None, at: Optional[float] = None) -> List[CompiledPromotion]:
+        """Active promotions that apply to one product for a tier"""
+        now = self.clock() if at is None else at
+        self._sweep(now)
+        ids = (self.by_product.get(product_id, set()) | self.by_category.get(category, set())
+               | self.by_department.get(department, set()) | self.sitewide)
+        if not ids:
+            return []
+        tier_ids = self.by_tier.get(tier, ())
+        eligible = []
+        for promotion_id in ids:
+            if promotion_id not in self.all_tiers and promotion_id not in tier_ids:
+                continue
+            promotion = self.promotions[promotion_id]
+            if now < self._swept_at:  # Asked about the past: check the interval itself
+                if not promotion.starts <= now < promotion.ends:
+                    continue
+            elif promotion_id not in self.active:
+                continue
+            if promotion.applies_to(product_id, category, department):
+                eligible.append(promotion)
+        return eligible
+
+    def best(self, product_id: str, unit_price: float, category: str = "", department: str = "",
+             tier: Optional[str] = None, at: Optional[float] = None) -> Optional[CompiledPromotion]:
+        """The promotion that wins a line, or None"""
+        candidates = self.candidates(product_id, category, department, tier, at)
+        if not candidates:
+            return None
+        top = max(promotion.priority for promotion in candidates)
+        candidates = [promotion for promotion in candidates if promotion.priority == top]
+        exclusive = [promotion for promotion in candidates if promotion.exclusive]
+        if len(exclusive) > 1:
+            from core.exceptions import PricingConflictError
+            names = ", ".join(sorted(promotion.id for promotion in exclusive))
+            raise PricingConflictError(
+                f"Exclusive promotions {names} all apply to product {product_id} at priority {top}")
+        if exclusive:
+            return exclusive[0]
+        return max(candidates, key=lambda promotion: (promotion.discount(unit_price), promotion.id))
+
+    def best_for_cart(self, cart: Dict, tier: Optional[str] = None, at: Optional[float] = None) -> Dict:
+        """Winning promotion and discount for every cart line"""
+        lines, total_discount = {}, 0.0
+        for product_id, cart_item in cart.get("items", {}).items():
+            product = cart_item.get("item") or {}
+            qty = cart_item.get("qty", 0)
+            unit_price = cart_item.get("price", 0) / qty if qty else product.get("price", 0)
+            promotion = self.best(product_id, unit_price, product.get("category") or "",
+                                  product.get("department") or "", tier, at)
+            if promotion is None:
+                continue
+            discount = round(promotion.discount(unit_price) * qty, 2)
+            lines[product_id] = {"promotion_id": promotion.id, "discount": discount}
+            total_discount += discount
+        return {"discount": round(total_discount, 2), "lines": lines,
+                "promotions": sorted({line["promotion_id"] for line in lines.values()})}
+
+    # Events
+
+    async def handle_promotion_created(self, data: Dict):
+        """Event bus handler for promotion.created: compile the new promotion"""
+        if not self.loaded or not data.get("promotion_id"):
+            return
+        doc = await db.aio.promotions.find_one({"_id": _promotion_key(data["promotion_id"])})
+        if doc is None:
+            self.remove(data["promotion_id"])
+        else:
+            self.add(doc)
+
+    async def handle_promotion_expired(self, data: Dict):
+        """Event bus handler for promotion.expired"""
+        if data.get("promotion_id"):
+            self.remove(str(data["promotion_id"]))
+
+    def subscribe(self, bus):
+        """Keep the index current from promotion events on the given bus"""
+        from agents.events.event_types import EventType
+        bus.subscribe(EventType.PROMOTION_CREATED, self.handle_promotion_created)
+        bus.subscribe(EventType.PROMOTION_EXPIRED, self.handle_promotion_expired)
+
+
+def _promotion_key(promotion_id: str):
+    from bson import ObjectId
+    return ObjectId(promotion_id) if ObjectId.is_valid(promotion_id) else promotion_id
+
+
+# Global promotion index instance
+promotion_index = PromotionIndex()
+
+
+@instrument("tool")
+async def get_best_cart_promotions(cart: Dict, tier: Optional[str] = None) -> Dict:
+    """Best applicable promotion per cart line and the total discount"""
+    await promotion_index.ensure_loaded()
+    return promotion_index.best_for_cart(cart, tier)
@@ -0,0 +1,225 @@
+import asyncio
+import heapq
+import math
+import re
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+from bson import ObjectId
+from config.mongodb import db
+
+# Field weights for BM25F-style scoring: a hit in the title counts more than
+# one buried in the description.
+FIELD_WEIGHTS = {"title": 3.0, "category": 2.0, "department": 2.0, "description": 1.0}
+
+# Score multiplier for terms that only match a query token as a prefix
+PREFIX_PENALTY = 0.5
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens"""
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+class ProductSearchIndex:
+    """In-memory inverted index over the products collection with BM25 ranking"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[str, Dict] = {}
+        # term -> {doc_id: precomputed BM25 term impact}
+        self.postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self.doc_terms: Dict[str, Dict[str, float]] = {}
+        self.doc_lengths: Dict[str, float] = {}
+        self.by_category: Dict[str, Set[str]] = defaultdict(set)
+        self.by_department: Dict[str, Set[str]] = defaultdict(set)
+        self.vocabulary: List[str] = []
+        self.total_length = 0.0
+        self.scoring_length = 0.0  # Average length the impacts were computed with
+        self.loaded = False
+        self._load_lock = asyncio.Lock()
+
+    async def load(self):
+        """(Re)build the index from the products collection"""
+        docs = await db.aio.products.find({}).to_list()
+        self.clear()
+        self.add_many(docs)
+        self.loaded = True
+
+    async def ensure_loaded(self):
+        """Build the index once, even with concurrent first callers"""
+        if self.loaded:
+            return
+        async with self._load_lock:
+            if not self.loaded:
+                await self.load()
+
+    def clear(self):
+        self.docs.clear()
+        self.postings.clear()
+        self.doc_terms.clear()
+        self.doc_lengths.clear()
+        self.by_category.clear()
+        self.by_department.clear()
+        self.vocabulary = []
+        self.total_length = 0.0
+        self.scoring_length = 0.0
+
+    def add_many(self, docs):
+        """Bulk index documents, computing term impacts once at the end"""
+        for doc in docs:
+            self._add(doc)
+        self._reweight()
+
+    def add(self, doc: Dict):
+        """Index or re-index a single product document"""
+        self._add(doc)
+        self._check_drift()
+
+    def _add(self, doc: Dict):
+        doc_id = str(doc["_id"])
+        if doc_id in self.docs:
+            self._remove(doc_id)
+
+        doc = dict(doc, _id=doc_id)
+        terms: Dict[str, float] = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(str(doc.get(field) or "")):
+                terms[token] += weight
+
+        length = sum(terms.values())
+        for term, tf in terms.items():
+            if term not in self.postings:
+                insort(self.vocabulary, term)
+            self.postings[term][doc_id] = self._impact(tf, length)
+
+        self.docs[doc_id] = doc
+        self.doc_terms[doc_id] = terms
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+        self.by_category[str(doc.get("category", "")).lower()].add(doc_id)
+        self.by_department[str(doc.get("department", "")).lower()].add(doc_id)
+
+    def remove(self, doc_id: str):
+        """Drop a product from the index"""
+        self._remove(doc_id)
+        self._check_drift()
+
+    def _remove(self, doc_id: str):
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return
+        for term in self.doc_terms.pop(doc_id):
+            postings = self.postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+                del self.vocabulary[bisect_left(self.vocabulary, term)]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        self.by_category[str(doc.get("category", "")).lower()].discard(doc_id)
+        self.by_department[str(doc.get("department", "")).lower()].discard(doc_id)
+
+    def _impact(self, tf: float, length: float) -> float:
+        """BM25 term-frequency component, independent of the query"""
+        avg_length = self.scoring_length or length or 1.0
+        norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+        return tf * (self.k1 + 1) / (tf + norm)
+
+    def _check_drift(self):
+        """Recompute impacts once the average length moves by more than 10%"""
+        avg_length = self.total_length / len(self.docs) if self.docs else 0.0
+        if abs(avg_length - self.scoring_length) > 0.1 * self.scoring_length:
+            self._reweight()
+
+    def _reweight(self):
+        self.scoring_length = self.total_length / len(self.docs) if self.docs else 0.0
+        for doc_id, terms in self.doc_terms.items():
+            length = self.doc_lengths[doc_id]
+            for term, tf in terms.items():
+                self.postings[term][doc_id] = self._impact(tf, length)
+
+    def _expand(self, token: str) -> Dict[str, float]:
+        """Vocabulary terms starting with a query token, with their match weight"""
+        matches = {}
+        position = bisect_left(self.vocabulary, token)
+        while position < len(self.vocabulary) and self.vocabulary[position].startswith(token):
+            term = self.vocabulary[position]
+            matches[term] = 1.0 if term == token else PREFIX_PENALTY
+            position += 1
+        return matches
+
+    def _allowed(self, category: Optional[str], department: Optional[str]) -> Optional[Set[str]]:
+        allowed = None
+        if category is not None:
+            allowed = self.by_category.get(category.lower(), set())
+        if department is not None:
+            dept = self.by_department.get(department.lower(), set())
+            allowed = dept if allowed is None else allowed & dept
+        return allowed
+
+    def search(self, query: str, limit: int = 10, category: Optional[str] = None,
+               department: Optional[str] = None) -> List[Dict]:
+        """Rank products for a free-text query; the last token matches as a prefix"""
+        allowed = self._allowed(category, department)
+        tokens = tokenize(query)
+        if not tokens:
+            ids = self.docs.keys() if allowed is None else allowed
+            return [dict(self.docs[doc_id]) for doc_id in list(ids)[:limit]]
+
+        n_docs = len(self.docs)
+        weighted = []
+        expansions = [{token: 1.0} if token in self.postings else {} for token in tokens[:-1]]
+        expansions.append(self._expand(tokens[-1]))
+        for matches in expansions:
+            for term, match_weight in matches.items():
+                postings = self.postings[term]
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                weighted.append((match_weight * idf, postings))
+
+        if len(weighted) == 1 and allowed is None:
+            # Single term: rank straight off the posting list
+            postings = weighted[0][1]
+            best = heapq.nlargest(limit, postings, key=postings.__getitem__)
+            return [dict(self.docs[doc_id]) for doc_id in best]
+
+        scores: Dict[str, float] = defaultdict(float)
+        for weight, postings in weighted:
+            if allowed is not None and len(allowed) < len(postings):
+                for doc_id in allowed:
+                    impact = postings.get(doc_id)
+                    if impact is not None:
+                        scores[doc_id] += weight * impact
+                continue
+            for doc_id, impact in postings.items():
+                if allowed is None or doc_id in allowed:
+                    scores[doc_id] += weight * impact
+
+        best = heapq.nlargest(limit, scores, key=scores.__getitem__)
+        return [dict(self.docs[doc_id]) for doc_id in best]
+
+    async def refresh_product(self, product_id: str):
+        """Reload one product from MongoDB after it changed"""
+        doc = await db.aio.products.find_one({"_id": ObjectId(product_id)})
+        if doc:
+            self.add(doc)
+        else:
+            self.remove(product_id)
+
+    async def handle_product_event(self, data: Dict):
+        """Event bus handler for price.changed / product.updated"""
+        if not self.loaded or not data.get("product_id"):
+            return
+        await self.refresh_product(data["product_id"])
+
+    def subscribe(self, bus):
+        """Keep the index current from product events on the given bus"""
+        from agents.events.event_types import EventType
+        bus.subscribe(EventType.PRICE_CHANGED, self.handle_product_event)
+        bus.subscribe(EventType.PRODUCT_UPDATED, self.handle_product_event)
+
+
+# Global search index instance
+product_search_index = ProductSearchIndex()
@@ -0,0 +1,414 @@
+"""
+Precomputed similar-product and recommendation index
+
+Every product becomes one L2-normalised float32 feature row:
+
+- text:        TF-IDF of title, description and its variants' titles,
+               colors and sizes. Vocabularies wider than
+               similarity_text_dims are randomly projected down to that width
+               (Johnson-Lindenstrauss), which keeps cosine similarity close
+               to the full vectors'.
+- category, department: one-hot
+- price band:  one-hot over price quantiles, with half weight on the
+               neighbouring bands so nearby prices still count as close
+
+Similarity is a dot product against the feature matrix, batched for many
+products at once, and top-k is an argpartition over the scores.
+
+The matrix is saved as a .npy file next to a JSON file with ids and taxonomy
+codes, and opened with mmap_mode="r": worker processes on one host share the
+same page-cache copy instead of each building or loading their own.
+Events are spread across the workers of the shared consumer group, so only
+the process that receives a product.updated marks its index stale and
+rebuilds; it saves the new build, and every other process reopens the saved
+files once they are newer than the copy it has (checked every
+RELOAD_CHECK_S). Without a path, each process only rebuilds on the events it
+consumes itself.
+
+User affinities are the sum of the feature rows of products a user viewed or
+added to their cart (cart adds weigh more), decayed with a half-life, and
+updated from product.viewed / cart.item.added events as they arrive. They
+are per process and only cover the events that process consumed, so with
+several workers each holds part of a user's history. Every build re-derives
+the feature columns (vocabulary, projection, price bands), so after a
+rebuild or reopen each affinity is re-folded from the user's recent
+products.
+
+Building and loading run in a worker thread but only produce the new
+arrays; they are installed, and affinities re-folded, on the event loop, so
+queries and event handlers never see a half-swapped index.
+"""
+
+import asyncio
+import json
+import math
+import os
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from config.mongodb import db
+from config.settings import settings
+from core.lazy import LazySingleton
+from tools.search_index import tokenize
+
+# Relative weight of each feature block in the cosine similarity
+FEATURE_WEIGHTS = {"text": 1.0, "category": 0.6, "department": 0.3, "price": 0.4}
+
+# How much one event moves a user's affinity
+EVENT_WEIGHTS = {"viewed": 1.0, "cart": 3.0}
+
+RECENT_PRODUCTS = 50  # Per user, excluded from their recommendations
+RELOAD_CHECK_S = 5.0  # How often to look for a build saved by another process
+QUERY_CHUNK = 256  # Query rows scored per matrix product
+
+# features, ids, categories, departments, category, department, price
+_Build = Tuple[np.ndarray, List[str], List[str], List[str], np.ndarray, np.ndarray, np.ndarray]
+
+
+def _product_text(product: Dict, variants: List[Dict]) -> List[str]:
+    tokens = tokenize(product.get("title") or "") + tokenize(product.get("description") or "")
+    for variant in variants:
+        for field in ("title", "color", "size"):
+            tokens += tokenize(str(variant.get(field) or ""))
+    return tokens
+
+
+class _Affinity:
+    __slots__ = ("vector", "updated", "recent")
+
+    def __init__(self, width: int, now: float):
+        self.vector = np.zeros(width, dtype=np.float32)
+        self.updated = now
+        self.recent: Deque[str] = deque(maxlen=RECENT_PRODUCTS)
+
+
+class SimilarityIndex:
+    """Product feature matrix with batched top-k cosine queries and user affinities"""
+
+    def __init__(self, path: str = None, text_dims: int = None, price_bands: int = None,
+                 half_life_s: float = None):
+        self.path = settings.similarity_index_path if path is None else path
+        self.text_dims = text_dims or settings.similarity_text_dims
+        self.price_bands = price_bands or settings.similarity_price_bands
+        self.half_life = half_life_s or settings.similarity_affinity_half_life_s
+        self.features: Optional[np.ndarray] = None
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.categories: List[str] = []
+        self.departments: List[str] = []
+        self.category: Optional[np.ndarray] = None
+        self.department: Optional[np.ndarray] = None
+        self.price: Optional[np.ndarray] = None
+        self.affinities: Dict[str, _Affinity] = {}
+        self.built_at = 0.0
+        self.stale = False
+        self._saved_mtime = 0.0  # Of the saved build this process has
+        self._checked_at = 0.0
+        self._load_lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.features is not None
+
+    # Building
+
+    def build(self, products: Iterable[Dict], variants: Iterable[Dict] = ()):
+        """Compute the feature matrix from product and variant documents"""
+        self._install(*self._compute(products, variants))
+
+    def _compute(self, products: Iterable[Dict], variants: Iterable[Dict]) -> _Build:
+        """The arrays of a build, without touching the installed index (thread-safe)"""
+        by_product: Dict[str, List[Dict]] = {}
+        for variant in variants:
+            by_product.setdefault(str(variant.get("productID")), []).append(variant)
+        products = list(products)
+        ids = [str(product["_id"]) for product in products]
+        texts = [_product_text(product, by_product.get(pid, [])) for product, pid in zip(products, ids)]
+
+        categories, category = np.unique(np.array([p.get("category") or "" for p in products], dtype=object),
+                                         return_inverse=True)
+        departments, department = np.unique(np.array([p.get("department") or "" for p in products], dtype=object),
+                                            return_inverse=True)
+        price = np.array([float(p.get("price") or 0.0) for p in products])
+
+        blocks = [
+            FEATURE_WEIGHTS["text"] * self._text_features(texts),
+            FEATURE_WEIGHTS["category"] * np.eye(len(categories), dtype=np.float32)[category],
+            FEATURE_WEIGHTS["department"] * np.eye(len(departments), dtype=np.float32)[department],
+            FEATURE_WEIGHTS["price"] * self._price_features(price),
+        ]
+        features = np.hstack(blocks).astype(np.float32)
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        features /= np.maximum(norms, 1e-12)
+
+        return (features, ids, list(categories), list(departments),
+                category.astype(np.int32), department.astype(np.int32), price)
+
+    def _text_features(self, texts: List[List[str]]) -> np.ndarray:
+        """TF-IDF rows, projected to text_dims columns when the vocabulary is wider"""
+        counts = [Counter(tokens) for tokens in texts]
+        df = Counter(term for terms in counts for term in terms)
+        vocabulary = {term: column for column, term in enumerate(sorted(df))}
+        n_docs = max(len(texts), 1)
+        idf = np.array([math.log((1 + n_docs) / (1 + df[term])) + 1.0 for term in sorted(df)],
+                       dtype=np.float32)
+        width = min(len(vocabulary), self.text_dims)
+        out = np.zeros((len(texts), width), dtype=np.float32)
+        if not vocabulary:
+            return out
+        projection = None
+        if len(vocabulary) > self.text_dims:
+            rng = np.random.default_rng(0)
+            projection = (rng.standard_normal((len(vocabulary), width), dtype=np.float32)
+                          / np.float32(math.sqrt(width)))
+        for row, terms in enumerate(counts):
+            if not terms:
+                continue
+            columns = np.fromiter((vocabulary[term] for term in terms), dtype=np.int64, count=len(terms))
+            weights = np.fromiter(terms.values(), dtype=np.float32, count=len(terms))
+            weights = weights / weights.sum() * idf[columns]
+            weights /= np.linalg.norm(weights)
+            if projection is None:
+                out[row, columns] = weights
+            else:
+                out[row] = weights @ projection[columns]
+        return out
+
+    def _price_features(self, price: np.ndarray) -> np.ndarray:
+        edges = np.unique(np.quantile(price, np.linspace(0, 1, self.price_bands + 1)[1:-1])) \
+            if len(price) else np.array([])
+        band = np.searchsorted(edges, price, side="right")
+        width = len(edges) + 1
+        out = np.zeros((len(price), width), dtype=np.float32)
+        rows = np.arange(len(price))
+        out[rows, band] = 1.0
+        out[rows[band > 0], band[band > 0] - 1] = 0.5
+        out[rows[band < width - 1], band[band < width - 1] + 1] = 0.5
+        return out
+
+    def _install(self, features: np.ndarray, ids: List[str], categories: List[str],
+                 departments: List[str], category: np.ndarray, department: np.ndarray,
+                 price: np.ndarray):
+        rebuilt = self.features is not None
+        self.features = features
+        self.ids = ids
+        self.rows = {product_id: row for row, product_id in enumerate(ids)}
+        self.categories, self.departments = categories, departments
+        self.category, self.department, self.price = category, department, price
+        self.built_at = time.time()
+        self.stale = False
+        if rebuilt:
+            self._refold_affinities()
+
+    def _refold_affinities(self):
+        """Rebuild affinity vectors (which index the previous build's columns) from recent products"""
+        width = self.features.shape[1]
+        for affinity in self.affinities.values():
+            rows = [self.rows[pid] for pid in affinity.recent if pid in self.rows]
+            affinity.vector = (np.asarray(self.features[rows]).sum(axis=0, dtype=np.float32) if rows
+                               else np.zeros(width, dtype=np.float32))
+
+    # Persistence
+
+    def save(self):
+        """Write features (.npy) and metadata (.json) atomically"""
+        self._saved_mtime = self._write(*self._snapshot())
+
+    def _snapshot(self) -> Tuple[np.ndarray, Dict[str, Any]]:
+        return self.features, {
+            "ids": self.ids, "categories": self.categories, "departments": self.departments,
+            "category": self.category.tolist(), "department": self.department.tolist(),
+            "price": self.price.tolist(), "built_at": self.built_at}
+
+    def _write(self, features: np.ndarray, meta: Dict[str, Any]) -> float:
+        """Write a snapshot; the mtime of the saved metadata (thread-safe)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path + ".npy.tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(features))
+        with open(self.path + ".json.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(self.path + ".npy.tmp", self.path + ".npy")
+        os.replace(self.path + ".json.tmp", self.path + ".json")
+        return os.path.getmtime(self.path + ".json")
+
+    def open(self) -> bool:
+        """Memory-map a saved index; False if there is none"""
+        saved = self._load()
+        if saved is None:
+            return False
+        self._adopt(*saved)
+        return True
+
+    def _load(self) -> Optional[Tuple[_Build, float, float]]:
+        """A saved build with its built_at and mtime, or None (thread-safe)"""
+        if not os.path.exists(self.path + ".npy") or not os.path.exists(self.path + ".json"):
+            return None
+        mtime = os.path.getmtime(self.path + ".json")
+        with open(self.path + ".json", encoding="utf-8") as f:
+            meta = json.load(f)
+        features = np.load(self.path + ".npy", mmap_mode="r")
+        if features.shape[0] != len(meta["ids"]):
+            return None  # Caught between the two renames; rebuild instead
+        built = (features, meta["ids"], meta["categories"], meta["departments"],
+                 np.array(meta["category"], dtype=np.int32),
+                 np.array(meta["department"], dtype=np.int32), np.array(meta["price"]))
+        return built, meta["built_at"], mtime
+
+    def _adopt(self, built: _Build, built_at: float, mtime: float):
+        self._install(*built)
+        self.built_at = built_at
+        self._saved_mtime = mtime
+
+    async def rebuild(self):
+        """Build from MongoDB and save for other processes"""
+        products = await db.aio.products.find(
+            {}, {"title": 1, "description": 1, "category": 1, "department": 1, "price": 1}).to_list()
+        variants = await db.aio.variants.find({}, {"productID": 1, "title": 1, "color": 1, "size": 1}).to_list()
+        self._install(*await asyncio.to_thread(self._compute, products, variants))
+        if self.path:
+            self._saved_mtime = await asyncio.to_thread(self._write, *self._snapshot())
+
+    def _due_for_rebuild(self) -> bool:
+        return self.stale and time.time() - self.built_at >= settings.similarity_rebuild_interval_s
+
+    def _saved_newer(self) -> bool:
+        """Another process saved a newer build (looked for every RELOAD_CHECK_S)"""
+        now = time.monotonic()
+        if not self.path or now - self._checked_at < RELOAD_CHECK_S:
+            return False
+        self._checked_at = now
+        try:
+            return os.path.getmtime(self.path + ".json") > self._saved_mtime
+        except OSError:
+            return False
+
+    async def ensure_loaded(self):
+        """Open the saved index or build one; reopen newer saved builds; rebuild when
+        stale and old enough"""
+        reopen = self.loaded and self._saved_newer()
+        if self.loaded and not reopen and not self._due_for_rebuild():
+            return
+        async with self._load_lock:
+            if self.path and (not self.loaded or reopen):
+                saved = await asyncio.to_thread(self._load)
+                if saved is not None:
+                    self._adopt(*saved)
+            if not self.loaded or self._due_for_rebuild():
+                await self.rebuild()
+
+    # Queries
+
+    def _top(self, scores: np.ndarray, limit: int) -> np.ndarray:
+        limit = min(limit, scores.shape[-1])
+        if limit <= 0:
+            return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+        top = np.argpartition(-scores, limit - 1, axis=-1)[..., :limit]
+        order = np.take_along_axis(scores, top, axis=-1).argsort(axis=-1)[..., ::-1]
+        return np.take_along_axis(top, order, axis=-1)
+
+    def _mask(self, category: Optional[str], department: Optional[str],
+              max_price: Optional[float]) -> Optional[np.ndarray]:
+        mask = None
+        if category is not None:
+            code = self.categories.index(category) if category in self.categories else -1
+            mask = self.category == code
+        if department is not None:
+            code = self.departments.index(department) if department in self.departments else -1
+            mask = (self.department == code) if mask is None else mask & (self.department == code)
+        if max_price is not None:
+            mask = (self.price <= max_price) if mask is None else mask & (self.price <= max_price)
+        return mask
+
+    def similar_many(self, product_ids: List[str], limit: int = 10,
+                     same_category: bool = False) -> Dict[str, List[Dict]]:
+        """Top-k similar products for many products, scored in batches"""
+        known = [pid for pid in product_ids if pid in self.rows]
+        results = {pid: [] for pid in product_ids}
+        for start in range(0, len(known), QUERY_CHUNK):
+            chunk = known[start:start + QUERY_CHUNK]
+            rows = np.array([self.rows[pid] for pid in chunk])
+            scores = self.features[rows] @ self.features.T
+            scores[np.arange(len(rows)), rows] = -np.inf  # Not similar to itself
+            if same_category:
+                scores[self.category[rows][:, None] != self.category[None, :]] = -np.inf
+            for pid, row_scores, top in zip(chunk, scores, self._top(scores, limit)):
+                results[pid] = [{"product_id": self.ids[i], "score": round(float(row_scores[i]), 4)}
+                                for i in top if np.isfinite(row_scores[i])]
+        return results
+
+    def similar(self, product_id: str, limit: int = 10, same_category: bool = False) -> List[Dict]:
+        return self.similar_many([product_id], limit, same_category)[product_id]
+
+    def recommend(self, user_id: str, limit: int = 10, product_id: Optional[str] = None,
+                  category: Optional[str] = None, department: Optional[str] = None,
+                  max_price: Optional[float] = None) -> List[Dict]:
+        """Products closest to a user's affinity, optionally blended with a product being viewed"""
+        query = np.zeros(self.features.shape[1], dtype=np.float32)
+        affinity = self.affinities.get(user_id)
+        if affinity is not None and affinity.vector.any():
+            query += affinity.vector / np.linalg.norm(affinity.vector)
+        if product_id in self.rows:
+            query += self.features[self.rows[product_id]]
+        if not query.any():
+            return []
+        scores = self.features @ query
+        mask = self._mask(category, department, max_price)
+        if mask is not None:
+            scores[~mask] = -np.inf
+        recent = affinity.recent if affinity is not None else ()
+        exclude = [self.rows[pid] for pid in recent if pid in self.rows]
+        if product_id in self.rows:
+            exclude.append(self.rows[product_id])
+        scores[exclude] = -np.inf
+        return [{"product_id": self.ids[i], "score": round(float(scores[i]), 4)}
+                for i in self._top(scores, limit) if np.isfinite(scores[i])]
+
+    # Affinities
+
+    def record(self, user_id: str, product_id: str, weight: float = 1.0, at: Optional[float] = None):
+        """Fold one interaction into a user's affinity vector"""
+        row = self.rows.get(product_id)
+        if row is None:
+            return
+        now = time.time() if at is None else at
+        affinity = self.affinities.get(user_id)
+        if affinity is None:
+            affinity = self.affinities[user_id] = _Affinity(self.features.shape[1], now)
+        elif now > affinity.updated:
+            affinity.vector *= np.float32(0.5 ** ((now - affinity.updated) / self.half_life))
+            affinity.updated = now
+        affinity.vector += weight * self.features[row]
+        if product_id in affinity.recent:
+            affinity.recent.remove(product_id)
+        affinity.recent.append(product_id)
+
+    async def handle_product_viewed(self, data: Dict):
+        if self.loaded and data.get("user_id") and data.get("product_id"):
+            self.record(data["user_id"], data["product_id"], EVENT_WEIGHTS["viewed"])
+
+    async def handle_cart_item_added(self, data: Dict):
+        if self.loaded and data.get("user_id") and data.get("product_id"):
+            self.record(data["user_id"], data["product_id"], EVENT_WEIGHTS["cart"])
+
+    async def handle_product_updated(self, data: Dict):
+        """Catalog changed: rebuild on a later query, at most every rebuild interval"""
+        self.stale = True
+
+    def subscribe(self, bus):
+        """Keep affinities current and mark the index stale from bus events"""
+        from agents.events.event_types import EventType
+        bus.subscribe(EventType.PRODUCT_VIEWED, self.handle_product_viewed)
+        bus.subscribe(EventType.CART_ITEM_ADDED, self.handle_cart_item_added)
+        bus.subscribe(EventType.PRODUCT_UPDATED, self.handle_product_updated)
+
+
+def get_similarity_index() -> SimilarityIndex:
+    """The process-wide similarity index, created on first use"""
+    return similarity_index.get()
+
+
+# Global similarity index (created lazily)
+similarity_index: SimilarityIndex = LazySingleton(SimilarityIndex)
@@ -1,46 +1,59 @@
 from typing import Dict, Optional, List
 from bson import ObjectId
 from config.mongodb import db
+from core.metrics import instrument
+from tools.views import USER_VIEWS, View
 
-async def get_user_profile(user_id: str) -> Optional[Dict]:
-    """Get user from MongoDB"""
-    user = db.users.find_one({"_id": ObjectId(user_id)})
+def _user_projection(view: View) -> Dict[str, int]:
+    # The password hash never needs to leave the database
+    return USER_VIEWS.projection(view) or {"password": 0}
+
+@instrument("tool")
+async def get_user_profile(user_id: str, view: View = None) -> Optional[Dict]:
+    """Get user from MongoDB ("summary", "tier" or fields)"""
+    user = await db.aio.users.find_one({"_id": ObjectId(user_id)}, _user_projection(view))
     if user:
         # Don't return password hash
         user.pop("password", None)
         user["_id"] = str(user["_id"])
     return user
 
-async def get_user_by_email(email: str) -> Optional[Dict]:
+@instrument("tool")
+async def get_user_by_email(email: str, view: View = None) -> Optional[Dict]:
     """Find user by email"""
-    user = db.users.find_one({"email": email})
+    user = await db.aio.users.find_one({"email": email}, _user_projection(view))
     if user:
         user.pop("password", None)
         user["_id"] = str(user["_id"])
     return user
 
+@instrument("tool")
 async def get_user_orders(user_id: str) -> List[Dict]:
     """Get user's order history (placeholder - extend as needed)"""
     # This would connect to an orders collection once implemented
     return []
 
+@instrument("tool")
 async def update_user_preferences(user_id: str, preferences: Dict) -> bool:
     """Update user preferences"""
-    result = db.users.update_one(
+    result = await db.aio.users.update_one(
         {"_id": ObjectId(user_id)},
         {"$set": {"preferences": preferences}}
     )
     return result.modified_count > 0
 
+@instrument("tool")
 async def get_user_tier(user_id: str) -> str:
     """Get user tier based on total spent (placeholder logic)"""
-    user = await get_user_profile(user_id)
+    user = await get_user_profile(user_id, view="tier")
     if not user:
         return "guest"
 
-    # This is placeholder logic - extend based on your business rules
-    total_spent = user.get("total_spent", 0)
+    return tier_for_spend(user.get("total_spent", 0))
 
+def tier_for_spend(total_spent: float) -> str:
+    """Tier for a lifetime spend (placeholder logic)"""
+    # This is placeholder logic - extend based on your business rules
     if total_spent > 1000:
         return "vip"
     elif total_spent > 500:
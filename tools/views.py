@@ -0,0 +1,124 @@
+"""
+Named field projections ("views") for tool functions
+
+Every read tool takes a `view` argument:
+
+- None: the full document (the default, unchanged behaviour)
+- a view name such as "summary", "pricing" or "inventory"
+- a list of field names, or a MongoDB projection dict
+
+Named views are declared as TypedDicts, so the record an agent gets back is
+typed and contains only the fields it asked for; MongoDB sends only those
+fields, which saves bytes on the wire, BSON decoding and memory per result.
+"""
+
+from typing import Dict, Iterable, Optional, Type, TypedDict, Union
+
+View = Union[None, str, Iterable[str], Dict[str, int]]
+
+
+class ProductSummary(TypedDict, total=False):
+    _id: str
+    title: str
+    price: float
+    quantity: int
+
+
+class ProductPricing(TypedDict, total=False):
+    _id: str
+    price: float
+    category: str
+    department: str
+
+
+class ProductInventory(TypedDict, total=False):
+    _id: str
+    quantity: int
+
+
+class VariantSummary(TypedDict, total=False):
+    _id: str
+    productID: str
+    title: str
+    color: str
+    size: str
+    price: float
+    quantity: int
+
+
+class VariantPricing(TypedDict, total=False):
+    _id: str
+    productID: str
+    price: float
+
+
+class VariantInventory(TypedDict, total=False):
+    _id: str
+    productID: str
+    quantity: int
+
+
+class CartSummary(TypedDict, total=False):
+    _id: str
+    userId: str
+    totalQty: int
+    totalPrice: float
+
+
+class CartItems(CartSummary, total=False):
+    items: Dict[str, Dict]
+
+
+class UserSummary(TypedDict, total=False):
+    _id: str
+    fullname: str
+    email: str
+
+
+class UserTier(TypedDict, total=False):
+    _id: str
+    total_spent: float
+
+
+class Views:
+    """The named views of one collection"""
+
+    def __init__(self, collection: str, **views: Type[TypedDict]):
+        self.collection = collection
+        self.records = views
+        self.fields = {name: tuple(record.__annotations__) for name, record in views.items()}
+
+    def projection(self, view: View) -> Optional[Dict[str, int]]:
+        """MongoDB projection for a view (None: whole document)"""
+        if view is None:
+            return None
+        if isinstance(view, dict):
+            return view
+        if isinstance(view, str):
+            if view not in self.fields:
+                raise ValueError(f"Unknown {self.collection} view {view!r}; "
+                                 f"expected one of {sorted(self.fields)} or a list of fields")
+            view = self.fields[view]
+        return {field: 1 for field in view}
+
+    def project(self, doc: Optional[Dict], view: View) -> Optional[Dict]:
+        """Apply a view to a document already in memory (cached or indexed)"""
+        projection = self.projection(view)
+        if doc is None or projection is None:
+            return doc
+        included = [field for field, flag in projection.items() if flag]
+        if not included:  # Exclusion projection
+            return {key: value for key, value in doc.items() if key not in projection}
+        record = {field: doc[field] for field in included if field in doc}
+        if "_id" in doc and projection.get("_id", 1):
+            record["_id"] = doc["_id"]
+        return record
+
+
+PRODUCT_VIEWS = Views("products", summary=ProductSummary, pricing=ProductPricing,
+                      inventory=ProductInventory)
+VARIANT_VIEWS = Views("variants", summary=VariantSummary, pricing=VariantPricing,
+                      inventory=VariantInventory)
+CART_VIEWS = Views("carts", summary=CartSummary, items=CartItems)
+USER_VIEWS = Views("users", summary=UserSummary, tier=UserTier)
+TAXONOMY_VIEWS = Views("taxonomy")  # Field lists only
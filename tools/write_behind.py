@@ -0,0 +1,268 @@
+"""
+Write-behind sink for high-volume agent collections
+
+Agent steps (agent_logs), price ticks (price_history) and promotion updates
+are queued in memory and written in the background, so hot paths never wait
+on a MongoDB round trip. Each collection has its own bounded queue and
+flusher: a batch is written when it reaches write_behind_batch_size or when
+its oldest write has waited write_behind_max_delay_ms. Pure insert batches go
+through unordered insert_many; batches containing updates use an ordered
+bulk_write so updates to one document apply in the order they were queued.
+An ordered batch stops at its first failing write: that write is counted as
+failed and the writes after it are sent again.
+
+A batch that still fails after write_behind_retries is appended to a local
+spill file (JSON lines, extended JSON) and written back by recover_spill()
+once MongoDB is reachable again. close() drains every queue.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from bson import json_util
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from config.mongodb import db
+from config.settings import settings
+from core.lazy import LazySingleton
+from core.log import get_logger
+
+INSERT = "insert"
+UPDATE = "update"
+DUPLICATE_KEY = 11000
+
+log = get_logger(__name__)
+
+# (INSERT, document) or (UPDATE, filter, update, upsert)
+Operation = Tuple[Any, ...]
+
+
+class _Lane:
+    """Queue, flusher task and counters for one collection"""
+
+    def __init__(self, name: str, max_queue: int):
+        self.name = name
+        self.queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self.batch: List[Operation] = []  # Taken off the queue, not yet written
+        self.lock = asyncio.Lock()
+        self.task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.failed = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.latencies: Deque[float] = deque(maxlen=256)
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        return {
+            "queued": self.queue.qsize() + len(self.batch),
+            "written": self.written,
+            "failed": self.failed,
+            "spilled": self.spilled,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "flush_p50_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else 0.0,
+            "flush_p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2) if latencies else 0.0,
+            "flush_max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        }
+
+
+class WriteBehindSink:
+    """Batches inserts and updates per collection and writes them in the background"""
+
+    def __init__(self, batch_size: int = None, max_delay_ms: int = None, max_queue: int = None,
+                 spill_path: str = None, retries: int = None):
+        self.batch_size = batch_size or settings.write_behind_batch_size
+        self.max_delay = (max_delay_ms or settings.write_behind_max_delay_ms) / 1000
+        self.max_queue = max_queue or settings.write_behind_queue_size
+        self.spill_path = settings.write_behind_spill_path if spill_path is None else spill_path
+        self.retries = settings.write_behind_retries if retries is None else retries
+        self._lanes: Dict[str, _Lane] = {}
+        self._spill_lock = asyncio.Lock()
+
+    # Writing
+
+    async def insert(self, collection: str, document: Dict):
+        """Queue an insert; waits only while the collection's queue is full"""
+        await self._lane(collection).queue.put((INSERT, document))
+
+    async def update(self, collection: str, filter: Dict, update: Dict, upsert: bool = True):
+        """Queue an update_one (an upsert by default)"""
+        await self._lane(collection).queue.put((UPDATE, filter, update, upsert))
+
+    def insert_nowait(self, collection: str, document: Dict) -> bool:
+        """Queue an insert without waiting; False (and counted as dropped) when full"""
+        lane = self._lane(collection)
+        try:
+            lane.queue.put_nowait((INSERT, document))
+        except asyncio.QueueFull:
+            lane.dropped += 1
+            return False
+        return True
+
+    def _lane(self, collection: str) -> _Lane:
+        lane = self._lanes.get(collection)
+        if lane is None:
+            lane = self._lanes[collection] = _Lane(collection, self.max_queue)
+        if lane.task is None or lane.task.done():
+            lane.task = asyncio.create_task(self._run(lane))
+        return lane
+
+    # Flushing
+
+    async def _run(self, lane: _Lane):
+        loop = asyncio.get_running_loop()
+        while True:
+            lane.batch.append(await lane.queue.get())
+            deadline = loop.time() + self.max_delay
+            while len(lane.batch) < self.batch_size:
+                try:
+                    lane.batch.append(lane.queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    lane.batch.append(await asyncio.wait_for(lane.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            async with lane.lock:
+                batch, lane.batch = lane.batch, []
+                if batch:  # flush() may have written it meanwhile
+                    await self._write(lane, batch)
+
+    async def _execute(self, collection: str, batch: List[Operation]):
+        target = db.aio.db[collection]
+        if all(op[0] == INSERT for op in batch):
+            await target.insert_many([op[1] for op in batch], ordered=False)
+        else:
+            await target.bulk_write([InsertOne(op[1]) if op[0] == INSERT else
+                                     UpdateOne(op[1], op[2], upsert=op[3]) for op in batch],
+                                    ordered=True)
+
+    async def _write(self, lane: _Lane, batch: List[Operation]):
+        start = time.perf_counter()
+        attempt = 0
+        while batch:
+            try:
+                await self._execute(lane.name, batch)
+            except BulkWriteError as e:
+                # Per-document errors aren't retryable; write what never ran
+                batch = self._settle(lane, batch, e.details)
+            except Exception as e:
+                if attempt < self.retries:
+                    await asyncio.sleep(min(2.0, 0.1 * 2 ** attempt))
+                    attempt += 1
+                    continue
+                log.error("write-behind flush failed", collection=lane.name, error=e)
+                await self._spill(lane, batch)
+                break
+            else:
+                lane.written += len(batch)
+                break
+        lane.flushes += 1
+        lane.latencies.append(time.perf_counter() - start)
+
+    @staticmethod
+    def _settle(lane: _Lane, batch: List[Operation], details: Dict) -> List[Operation]:
+        """Count a partially applied batch; returns the operations that never ran"""
+        errors = details.get("writeErrors", [])
+        # A duplicate key on an insert means an earlier attempt already wrote
+        # the document; on an upsert it is a real failure
+        failed = [error for error in errors
+                  if error.get("code") != DUPLICATE_KEY or batch[error["index"]][0] != INSERT]
+        if failed:
+            log.error("write-behind writes failed", collection=lane.name, count=len(failed),
+                      errmsg=failed[0].get("errmsg"))
+        lane.failed += len(failed)
+        if all(op[0] == INSERT for op in batch):
+            # Unordered: every document was attempted
+            lane.written += len(batch) - len(failed)
+            return []
+        # Ordered: everything before the error was applied, nothing after it ran
+        index = errors[0]["index"] if errors else len(batch) - 1
+        lane.written += index + (len(errors) - len(failed))
+        return batch[index + 1:]
+
+    async def flush(self):
+        """Write everything queued so far"""
+        for lane in list(self._lanes.values()):
+            async with lane.lock:
+                await self._drain(lane)
+
+    async def _drain(self, lane: _Lane):
+        while not lane.queue.empty():
+            lane.batch.append(lane.queue.get_nowait())
+        while lane.batch:
+            batch = lane.batch[:self.batch_size]
+            del lane.batch[:self.batch_size]
+            await self._write(lane, batch)
+
+    async def close(self):
+        """Drain every queue and stop the flushers"""
+        for lane in list(self._lanes.values()):
+            async with lane.lock:
+                # Holding the lock guarantees the flusher isn't mid-write;
+                # whatever it had collected stays in lane.batch
+                if lane.task is not None:
+                    lane.task.cancel()
+                    await asyncio.gather(lane.task, return_exceptions=True)
+                    lane.task = None
+                await self._drain(lane)
+
+    # Spilling
+
+    async def _spill(self, lane: _Lane, batch: List[Operation]):
+        if not self.spill_path:
+            lane.dropped += len(batch)
+            return
+        lines = "".join(json_util.dumps({"collection": lane.name, "op": list(op)}) + "\n"
+                        for op in batch)
+        async with self._spill_lock:
+            await asyncio.to_thread(self._append, self.spill_path, lines)
+        lane.spilled += len(batch)
+        log.warning("write-behind writes spilled", collection=lane.name, count=len(batch), path=self.spill_path)
+
+    @staticmethod
+    def _append(path: str, lines: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    async def recover_spill(self) -> int:
+        """Queue spilled writes again; returns how many were recovered"""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return 0
+        async with self._spill_lock:
+            # New spills go to a fresh file while this one is replayed
+            replaying = self.spill_path + ".replaying"
+            os.replace(self.spill_path, replaying)
+        with open(replaying, encoding="utf-8") as f:
+            entries = [json_util.loads(line) for line in f if line.strip()]
+        for entry in entries:
+            await self._lane(entry["collection"]).queue.put(tuple(entry["op"]))
+        await self.flush()
+        os.remove(replaying)
+        if entries:
+            log.info("spilled writes recovered", count=len(entries))
+        return len(entries)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Queue depth, outcome counters and flush latency per collection"""
+        return {name: lane.stats() for name, lane in self._lanes.items()}
+
+
+def get_write_sink() -> WriteBehindSink:
+    """The process-wide write-behind sink, created on first use"""
+    return write_sink.get()
+
+
+# Global write-behind sink (created lazily)
+write_sink: WriteBehindSink = LazySingleton(WriteBehindSink)